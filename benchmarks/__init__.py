@@ -0,0 +1,4 @@
+"""Benchmarks of database commands on synthetic tables.
+
+Run with ``python -m benchmarks`` (or ``make bench``); see runner.py.
+"""
@@ -0,0 +1,73 @@
+"""python -m benchmarks [--sizes 10000,100000] [--cases core.] [--save-baseline]"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.runner import (
+    BASELINE_FILEPATH,
+    DEFAULT_REPEAT,
+    DEFAULT_SIZES,
+    REGRESSION_THRESHOLD,
+    RESULTS_FILEPATH,
+    compare,
+    format_regressions,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Замеры производительности базы данных")
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="размеры таблиц через запятую"
+    )
+    parser.add_argument("--cases", default="", help="запускать только сценарии, имя которых начинается так")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="число замеров времени")
+    parser.add_argument("--output", default=RESULTS_FILEPATH, help="файл результатов JSON")
+    parser.add_argument("--baseline", default=BASELINE_FILEPATH, help="файл базовых результатов JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="допустимый рост, доля")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как базовые")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    home = tempfile.mkdtemp(prefix="primitive_db_bench_")
+    # Set before src is imported: data paths are resolved once from the environment.
+    os.environ["PRIMITIVE_DB_HOME"] = home
+    try:
+        from benchmarks.cases import ALL_CASES
+        from src.decorators import set_auto_confirm
+
+        set_auto_confirm(True)
+        cases = [case for case in ALL_CASES if case.name.startswith(args.cases)]
+        document = run_benchmarks(cases, sizes, args.repeat)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    save_results(args.output, document)
+    print(f"Результаты записаны в {args.output}.")
+    if args.save_baseline:
+        save_results(args.baseline, document)
+        print(f"Базовые результаты записаны в {args.baseline}.")
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline is None:
+        print(f"Базовых результатов нет ({args.baseline}), сравнение пропущено.")
+        return 0
+    regressions = compare(document, baseline, args.threshold)
+    if not regressions:
+        print(f"Регрессий больше {args.threshold:.0%} нет.")
+        return 0
+    print(f"Регрессии больше {args.threshold:.0%}:")
+    print(format_regressions(regressions))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Benchmark cases: the same operations through the core API, the Database API and the engine commands.
+
+A case has a setup that builds fresh state for a table size (not timed)
+and a run that performs the measured work on it. Core cases work on
+in-memory tables; database cases use a Database in a directory of its own;
+engine cases run REPL commands against a database in the PRIMITIVE_DB_HOME
+directory, restored from a prepared copy before each run.
+"""
+import os
+import random
+import shutil
+
+from benchmarks.data import BENCH_COLUMNS, BENCH_SCHEMA, BENCH_TABLE, generate_records, write_csv
+from src.constants import DATA_DIR, META_FILEPATH, PRIMITIVE_DB_DIR
+from src.primitive_db import core, engine
+from src.primitive_db.database import Database
+from src.primitive_db.parser import parse_where_clause
+
+POINT_LOOKUPS = 1000
+# Matches about 1% of rows (age is uniform in 0..INT_RANGE).
+UPDATE_WHERE = "age < 1000"
+# Matches almost nothing, so a select reads every row but prints next to nothing.
+SCAN_WHERE = "score = 7"
+# Joined with the bench table on ID; holds its first tenth of rows.
+JOIN_TABLE = "bench_small"
+# Directory of the database used by the Database API cases.
+DATABASE_DIR = os.path.join(PRIMITIVE_DB_DIR, "bench_database")
+
+
+class Case:
+    """A named benchmark: setup(size) -> state, run(state); operations(size) is the work count."""
+
+    __slots__ = ("name", "setup", "run", "operations")
+
+    def __init__(self, name, setup, run, operations=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.operations = operations or (lambda size: size)
+
+
+_records = {}
+_templates = {}
+
+
+def _generated_records(size):
+    if size not in _records:
+        _records.clear()
+        _records[size] = list(generate_records(BENCH_SCHEMA, size))
+    return _records[size]
+
+
+def _lookup_ids(size):
+    rng = random.Random(size)
+    return [rng.randint(1, size) for _ in range(POINT_LOOKUPS)]
+
+
+def _core_table(size):
+    metadata = core.create_table({}, BENCH_TABLE, BENCH_COLUMNS)
+    table_data = core.insert_many(metadata, BENCH_TABLE, _generated_records(size), [])
+    return metadata, table_data
+
+
+def _core_point_select(state):
+    table_data, stats, wheres = state
+    for where in wheres:
+        list(core.iter_select(table_data, where, stats=stats))
+
+
+def _core_full_scan(state):
+    table_data, stats, where = state
+    list(core.iter_select(table_data, where, stats=stats))
+
+
+def _with_stats(size, where):
+    metadata, table_data = _core_table(size)
+    return table_data, core.get_table_stats(metadata, BENCH_TABLE), where
+
+
+def _core_join_sides(size):
+    metadata, table_data = _core_table(size)
+    metadata = core.create_table(metadata, JOIN_TABLE, BENCH_COLUMNS)
+    small_data = core.insert_many(metadata, JOIN_TABLE, _generated_records(size)[:max(1, size // 10)], [])
+    return (
+        core.JoinSide(JOIN_TABLE, metadata[JOIN_TABLE], small_data, "ID"),
+        core.JoinSide(BENCH_TABLE, metadata[BENCH_TABLE], table_data, "ID"),
+    )
+
+
+CORE_CASES = [
+    Case(
+        "core.create_table",
+        lambda size: None,
+        lambda state: core.create_table({}, BENCH_TABLE, BENCH_COLUMNS),
+        lambda size: 1,
+    ),
+    Case(
+        "core.bulk_insert",
+        lambda size: (core.create_table({}, BENCH_TABLE, BENCH_COLUMNS), _generated_records(size)),
+        lambda state: core.insert_many(state[0], BENCH_TABLE, state[1], []),
+    ),
+    Case(
+        "core.point_select",
+        lambda size: _with_stats(size, [parse_where_clause(f"ID = {i}") for i in _lookup_ids(size)]),
+        _core_point_select,
+        lambda size: POINT_LOOKUPS,
+    ),
+    Case(
+        "core.full_scan",
+        lambda size: _with_stats(size, parse_where_clause(SCAN_WHERE)),
+        _core_full_scan,
+    ),
+    Case(
+        "core.update",
+        lambda size: _with_stats(size, parse_where_clause(UPDATE_WHERE)),
+        lambda state: core.update(state[0], {"active": True}, state[2], stats=state[1]),
+    ),
+    Case(
+        "core.delete",
+        lambda size: _with_stats(size, parse_where_clause(UPDATE_WHERE)),
+        lambda state: core.delete(state[0], state[2], stats=state[1]),
+    ),
+    Case(
+        "core.hash_join",
+        _core_join_sides,
+        lambda sides: sum(1 for _ in core.iter_join(*sides)),
+    ),
+]
+
+
+def _database_table(size=0):
+    """Open a fresh autocommit Database holding the bench table with size rows."""
+    shutil.rmtree(DATABASE_DIR, ignore_errors=True)
+    table = Database(DATABASE_DIR, autocommit=True).create_table(BENCH_TABLE, BENCH_COLUMNS)
+    if size:
+        table.insert_many(_generated_records(size))
+    return table
+
+
+def _database_point_select(state):
+    table, ids = state
+    for record_id in ids:
+        table.get(record_id)
+
+
+DATABASE_CASES = [
+    Case(
+        "database.bulk_insert",
+        lambda size: (_database_table(), _generated_records(size)),
+        lambda state: state[0].insert_many(state[1]),
+    ),
+    Case(
+        "database.point_select",
+        lambda size: (_database_table(size), _lookup_ids(size)),
+        _database_point_select,
+        lambda size: POINT_LOOKUPS,
+    ),
+    Case(
+        "database.update",
+        _database_table,
+        lambda table: table.update({"active": True}, UPDATE_WHERE),
+    ),
+]
+
+
+def _clear_home():
+    engine.get_pool().clear()
+    if os.path.exists(META_FILEPATH):
+        os.remove(META_FILEPATH)
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+def _csv_path(size):
+    return os.path.join(PRIMITIVE_DB_DIR, f"{BENCH_TABLE}_{size}.csv")
+
+
+def _engine_empty(size):
+    _clear_home()
+    engine.execute_command(f"create_table {BENCH_TABLE} {' '.join(BENCH_COLUMNS)}")
+    if not os.path.exists(_csv_path(size)):
+        write_csv(_csv_path(size), BENCH_SCHEMA, size)
+    return _csv_path(size)
+
+
+def _engine_loaded(size):
+    """Restore the database with a loaded table of size rows and warm the table pool."""
+    template = _templates.get(size)
+    if template is None:
+        csv_path = _engine_empty(size)
+        engine.execute_command(f"import {BENCH_TABLE} from {csv_path}")
+        template = os.path.join(PRIMITIVE_DB_DIR, f"template_{size}")
+        shutil.rmtree(template, ignore_errors=True)
+        os.makedirs(template)
+        shutil.copy2(META_FILEPATH, template)
+        shutil.copytree(DATA_DIR, os.path.join(template, "data"))
+        _templates[size] = template
+    _clear_home()
+    shutil.copy2(os.path.join(template, os.path.basename(META_FILEPATH)), META_FILEPATH)
+    shutil.copytree(os.path.join(template, "data"), DATA_DIR)
+    engine.execute_command(f"select from {BENCH_TABLE} where ID = 1")
+    return size
+
+
+def _engine_segmented(size):
+    """Restore the loaded table, convert it to segments and drop it from the pool, so a scan reads the files."""
+    _engine_loaded(size)
+    engine.execute_command(f"convert_table {BENCH_TABLE} segmented")
+    engine.get_pool().evict(BENCH_TABLE)
+    return size
+
+
+def _engine_commands(commands):
+    for command in commands:
+        engine.execute_command(command)
+
+
+ENGINE_CASES = [
+    Case(
+        "engine.create_table",
+        lambda size: _clear_home(),
+        lambda state: engine.execute_command(f"create_table {BENCH_TABLE} {' '.join(BENCH_COLUMNS)}"),
+        lambda size: 1,
+    ),
+    Case(
+        "engine.bulk_insert",
+        _engine_empty,
+        lambda csv_path: engine.execute_command(f"import {BENCH_TABLE} from {csv_path}"),
+    ),
+    Case(
+        "engine.point_select",
+        lambda size: [f"select from {BENCH_TABLE} where ID = {i}" for i in _lookup_ids(_engine_loaded(size))],
+        _engine_commands,
+        lambda size: POINT_LOOKUPS,
+    ),
+    Case(
+        "engine.full_scan",
+        _engine_loaded,
+        lambda state: engine.execute_command(f"select from {BENCH_TABLE} where {SCAN_WHERE}"),
+    ),
+    Case(
+        "engine.update",
+        _engine_loaded,
+        lambda state: engine.execute_command(f"update {BENCH_TABLE} set active = true where {UPDATE_WHERE}"),
+    ),
+    Case(
+        "engine.delete",
+        _engine_loaded,
+        lambda state: engine.execute_command(f"delete from {BENCH_TABLE} where {UPDATE_WHERE}"),
+    ),
+    Case(
+        "engine.segmented_scan",
+        _engine_segmented,
+        lambda state: engine.execute_command(f"select from {BENCH_TABLE} where {SCAN_WHERE}"),
+    ),
+    Case(
+        "engine.segmented_update",
+        _engine_segmented,
+        lambda size: engine.execute_command(f"update {BENCH_TABLE} set active = true where ID = {size // 2}"),
+        lambda size: 1,
+    ),
+]
+
+ALL_CASES = CORE_CASES + DATABASE_CASES + ENGINE_CASES
@@ -0,0 +1,64 @@
+"""Synthetic rows for benchmark tables, generated from a schema of real column types."""
+import csv
+import random
+import string
+
+from src.constants import TYPE_BOOL, TYPE_INT, TYPE_STR
+
+BENCH_TABLE = "bench"
+# Column specs as given to create_table.
+BENCH_COLUMNS = ["name:str", "age:int", "city:str", "active:bool", "score:int"]
+BENCH_SCHEMA = dict(spec.split(":") for spec in BENCH_COLUMNS)
+
+INT_RANGE = 100_000
+STR_LENGTH = (5, 20)
+# Distinct strings per str column, so equality filters have realistic selectivity.
+STR_CARDINALITY = 1000
+
+
+def _int_values(rng):
+    while True:
+        yield rng.randrange(INT_RANGE)
+
+
+def _str_values(rng):
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(*STR_LENGTH))) for _ in range(STR_CARDINALITY)
+    ]
+    while True:
+        yield rng.choice(vocabulary)
+
+
+def _bool_values(rng):
+    while True:
+        yield rng.random() < 0.5
+
+
+_VALUE_GENERATORS = {
+    TYPE_INT: _int_values,
+    TYPE_STR: _str_values,
+    TYPE_BOOL: _bool_values,
+}
+
+
+def generate_values(schema, count, seed=0):
+    """Yield count tuples of values in schema order (without ID), reproducibly for a seed."""
+    rng = random.Random(seed)
+    generators = [_VALUE_GENERATORS[column_type](rng) for column_type in schema.values()]
+    for _ in range(count):
+        yield tuple(next(generator) for generator in generators)
+
+
+def generate_records(schema, count, seed=0):
+    """Yield count records (dicts without ID) for schema."""
+    columns = list(schema)
+    for values in generate_values(schema, count, seed):
+        yield dict(zip(columns, values))
+
+
+def write_csv(filepath, schema, count, seed=0):
+    """Write count generated rows with a header to a CSV file for import."""
+    with open(filepath, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(schema)
+        writer.writerows(generate_values(schema, count, seed))
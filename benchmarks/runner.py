@@ -0,0 +1,123 @@
+"""Run benchmark cases, write JSON results and compare them with a baseline.
+
+Each case is timed `repeat` times on fresh state (the best time counts)
+and then run once more under tracemalloc for its peak memory, so tracing
+does not slow down the timed runs. Results look like:
+
+    {"python": "3.12.1", "sizes": [10000], "results": [
+        {"case": "core.point_select", "size": 10000, "seconds": 0.012,
+         "operations": 1000, "per_operation": 1.2e-05, "peak_memory": 52344}]}
+
+A result is a regression when its time or peak memory grew by more than
+the threshold share compared with the same case and size in the baseline.
+"""
+import contextlib
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+from prettytable import PrettyTable
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_REPEAT = 3
+REGRESSION_THRESHOLD = 0.25
+# Timings and peaks below these are too noisy to flag as regressions.
+NOISE_FLOOR = {"seconds": 0.005, "peak_memory": 64 * 1024}
+BENCHMARKS_DIR = os.path.dirname(__file__)
+RESULTS_FILEPATH = os.path.join(BENCHMARKS_DIR, "results.json")
+BASELINE_FILEPATH = os.path.join(BENCHMARKS_DIR, "baseline.json")
+METRICS = ("seconds", "peak_memory")
+
+
+def _quietly(func, *args):
+    """Call func with stdout discarded (commands print their results)."""
+    with open(os.devnull, "w", encoding="utf-8") as sink, contextlib.redirect_stdout(sink):
+        return func(*args)
+
+
+def measure(case, size, repeat=DEFAULT_REPEAT):
+    """Return the result dict of one case at one table size."""
+    best = None
+    for _ in range(repeat):
+        state = _quietly(case.setup, size)
+        gc.collect()
+        start = time.perf_counter()
+        _quietly(case.run, state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    state = _quietly(case.setup, size)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _quietly(case.run, state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    operations = case.operations(size)
+    return {
+        "case": case.name,
+        "size": size,
+        "seconds": round(best, 6),
+        "operations": operations,
+        "per_operation": best / operations if operations else None,
+        "peak_memory": peak,
+    }
+
+
+def run_benchmarks(cases, sizes, repeat=DEFAULT_REPEAT, progress=print):
+    """Measure every case at every size. Returns the results document."""
+    results = []
+    for size in sizes:
+        for case in cases:
+            result = measure(case, size, repeat)
+            memory = result["peak_memory"] / 1024
+            progress(f"{case.name:<22} {size:>9} строк: {result['seconds']:.4f} с, пик памяти {memory:.0f} КБ")
+            results.append(result)
+    return {"python": platform.python_version(), "sizes": list(sizes), "results": results}
+
+
+def save_results(filepath, document):
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(filepath):
+    """Return a saved results document or None if the file does not exist."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def compare(document, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return rows (case, size, metric, baseline value, new value, ratio) for every regression."""
+    previous = {(result["case"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in document["results"]:
+        old = previous.get((result["case"], result["size"]))
+        if old is None:
+            continue
+        for metric in METRICS:
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            if max(before, after) < NOISE_FLOOR[metric]:
+                continue
+            ratio = after / before
+            if ratio > 1 + threshold:
+                regressions.append((result["case"], result["size"], metric, before, after, ratio))
+    return regressions
+
+
+def format_regressions(regressions):
+    table = PrettyTable()
+    table.field_names = ["Сценарий", "Строк", "Метрика", "Было", "Стало", "Рост"]
+    for case, size, metric, before, after, ratio in regressions:
+        table.add_row([case, size, metric, before, after, f"x{ratio:.2f}"])
+    return table.get_string()
@@ -2,7 +2,9 @@ import os
 
 
 SRC_DIR = os.path.dirname(__file__)
-PRIMITIVE_DB_DIR = os.path.join(SRC_DIR, "primitive_db")
+# Directory of db_meta.json and data/; the PRIMITIVE_DB_HOME environment variable moves it elsewhere.
+DB_HOME_ENV = "PRIMITIVE_DB_HOME"
+PRIMITIVE_DB_DIR = os.environ.get(DB_HOME_ENV) or os.path.join(SRC_DIR, "primitive_db")
 
 TYPE_INT = "int"
 TYPE_STR = "str"
@@ -11,12 +13,99 @@ ALLOWED_TYPES = {TYPE_INT, TYPE_STR, TYPE_BOOL}
 
 RESERVED_ID_NAME = "ID"
 
+META_TABLES_INFO_KEY = "__tables_info__"
+LAYOUT_ROWS = "rows"
+LAYOUT_COLUMNAR = "columnar"
+TABLE_LAYOUTS = {LAYOUT_ROWS, LAYOUT_COLUMNAR}
+
+INDEX_HASH = "hash"
+INDEX_SORTED = "sorted"
+
+OP_EQ = "="
+OP_NE = "!="
+OP_LT = "<"
+OP_LE = "<="
+OP_GT = ">"
+OP_GE = ">="
+OP_BETWEEN = "between"
+RANGE_OPERATORS = {OP_LT, OP_LE, OP_GT, OP_GE, OP_BETWEEN}
+RANGE_TYPES = {TYPE_INT, TYPE_STR}
+
+AGG_COUNT = "count"
+AGG_SUM = "sum"
+AGG_MIN = "min"
+AGG_MAX = "max"
+AGG_AVG = "avg"
+AGGREGATE_FUNCTIONS = {AGG_COUNT, AGG_SUM, AGG_MIN, AGG_MAX, AGG_AVG}
+# Aggregates that need an int column (count works on any column, min/max on RANGE_TYPES).
+NUMERIC_AGGREGATES = {AGG_SUM, AGG_AVG}
+
 META_FILENAME = "db_meta.json"
 META_FILEPATH = os.path.join(PRIMITIVE_DB_DIR, META_FILENAME)
 
 DATA_DIRECTORY_NAME = "data"
 DATA_DIR = os.path.join(PRIMITIVE_DB_DIR, DATA_DIRECTORY_NAME)
 TABLE_FILE_EXTENSION = ".json"
+TABLE_LOG_EXTENSION = ".jsonl"
+BINARY_TABLE_EXTENSION = ".bin"
+BINARY_HEAP_EXTENSION = ".heap"
+BINARY_MAGIC = b"PDB2"
+# Files written before rows carried null flags; they are read and rewritten on the next change.
+BINARY_LEGACY_MAGIC = b"PDBT"
+SEGMENTS_DIR_EXTENSION = ".segments"
+
+STORAGE_JSON = "json"
+STORAGE_BINARY = "binary"
+STORAGE_SEGMENTED = "segmented"
+TABLE_STORAGES = {STORAGE_JSON, STORAGE_BINARY, STORAGE_SEGMENTED}
+
+CSV_FILE_EXTENSION = ".csv"
+JSONL_FILE_EXTENSION = ".jsonl"
+
+LOG_OP_INSERT = "insert"
+LOG_OP_UPDATE = "update"
+LOG_OP_DELETE = "delete"
+LOG_COMPACTION_RATIO = 2
+LOG_COMPACTION_MIN_ENTRIES = 1000
+# Write-ahead log of a committing transaction, stored next to the metadata file.
+COMMIT_LOG_EXTENSION = ".wal"
+
+# Segmented tables: rows per segment file, and scans reading at least this many segments
+# from disk spread them over SEGMENT_SCAN_WORKERS processes.
+SEGMENT_MAX_ROWS = 100_000
+SEGMENT_PARALLEL_MIN_SEGMENTS = 2
+SEGMENT_SCAN_WORKERS = os.cpu_count() or 1
+
+TABLE_POOL_MEMORY_BUDGET = 256 * 1024 * 1024
+TABLE_POOL_SIZE_SAMPLE = 100
 
 CONFIRMATION_POSITIVE_ANSWER = "y"
 
+SELECT_CACHE_MAX_ENTRIES = 128
+SELECT_CACHE_MAX_ROWS = 1_000_000
+SELECT_PAGE_SIZE = 100
+# Parsed and validated commands kept by their text (see engine._get_statement).
+STATEMENT_CACHE_MAX_ENTRIES = 256
+
+
+# Planner costs are in units of "evaluate the WHERE on one scanned row".
+PLANNER_SCAN_ROW_COST = 1.0
+PLANNER_MASK_ROW_COST = 0.1
+PLANNER_LOOKUP_ROW_COST = 3.0
+# A row a join fetches through an index for one probe row, compared with a hash table probe.
+PLANNER_JOIN_LOOKUP_ROW_COST = 10.0
+PLANNER_DEFAULT_EQ_SELECTIVITY = 0.05
+PLANNER_DEFAULT_RANGE_SELECTIVITY = 0.25
+
+# Latency histogram buckets grow by this factor (percentiles are accurate to about 10%).
+METRICS_BUCKET_GROWTH = 1.1
+METRICS_PROFILE_TOP_ENTRIES = 25
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7878
+# Longest request line the server accepts (a bulk insert is one line).
+SERVER_MAX_LINE = 16 * 1024 * 1024
+# Threads answering reads of the server side by side.
+SERVER_READ_WORKERS = 4
+CLIENT_POOL_SIZE = 4
+CLIENT_TIMEOUT = 30
@@ -1,8 +1,30 @@
-import time
+import threading
+from collections import OrderedDict
 from functools import wraps
 
 from src.constants import CONFIRMATION_POSITIVE_ANSWER
 
+# Shared by the REPL, the server and scripts: whether dangerous operations
+# are confirmed without asking.
+_session = {"auto_confirm": False}
+# Errors reported so far, counted per thread: server threads run commands side by side.
+_errors = threading.local()
+
+
+def report_error(message):
+    """Print an error message and count it, so callers can tell a command failed."""
+    _errors.count = get_error_count() + 1
+    print(message)
+
+
+def get_error_count():
+    return getattr(_errors, "count", 0)
+
+
+def set_auto_confirm(enabled):
+    """Answer "y" to every confirm_action prompt (non-interactive modes)."""
+    _session["auto_confirm"] = enabled
+
 
 def handle_db_errors(func):
     @wraps(func)
@@ -10,13 +32,13 @@ def handle_db_errors(func):
         try:
             return func(*args, **kwargs)
         except FileNotFoundError:
-            print("Ошибка: Файл данных не найден. Возможно, база данных не инициализирована.")
+            report_error("Ошибка: Файл данных не найден. Возможно, база данных не инициализирована.")
         except KeyError as error:
-            print(f"Ошибка: Таблица или столбец {error} не найден.")
+            report_error(f"Ошибка: Таблица или столбец {error} не найден.")
         except ValueError as error:
-            print(f"Ошибка валидации: {error}")
+            report_error(f"Ошибка валидации: {error}")
         except Exception as error:
-            print(f"Произошла непредвиденная ошибка: {error}")
+            report_error(f"Произошла непредвиденная ошибка: {error}")
 
     return wrapper
 
@@ -25,9 +47,15 @@ def confirm_action(action_name):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            answer = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ').strip().lower()
+            if _session["auto_confirm"]:
+                return func(*args, **kwargs)
+            try:
+                answer = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ').strip().lower()
+            except EOFError:
+                answer = ""
             if answer != CONFIRMATION_POSITIVE_ANSWER:
-                print("Операция отменена.")
+                # A declined operation counts as failed, so scripts and batches see it.
+                report_error("Операция отменена.")
                 return args[0] if args else None
             return func(*args, **kwargs)
 
@@ -36,33 +64,86 @@ def confirm_action(action_name):
     return decorator
 
 
-def log_time(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start = time.monotonic()
-        try:
-            return func(*args, **kwargs)
-        finally:
-            duration = time.monotonic() - start
-            print(f"Функция {func.__name__} выполнилась за {duration:.3f} секунд.")
-
-    return wrapper
-
-
-def create_cacher():
-    cache = {}
+def create_cacher(max_entries=None, max_rows=None):
+    """Create an LRU cache of computed values.
+
+    Keys are tuples whose first element names a group (a table), so all
+    entries of one group can be invalidated at once. The cache is bounded by
+    entry count and by the total len() of cached values; hit, miss and
+    eviction counters are available through cache_result.info(). Besides the
+    get-or-compute call, cache_result.get/put serve callers that produce
+    values incrementally.
+    """
+    cache = OrderedDict()
+    sizes = {}
+    keys_by_group = {}
+    counters = {"hits": 0, "misses": 0, "evictions": 0, "rows": 0}
+    # Server threads share caches; a value is computed outside the lock.
+    lock = threading.RLock()
+
+    def _forget(key):
+        cache.pop(key)
+        counters["rows"] -= sizes.pop(key)
+        group_keys = keys_by_group.get(key[0])
+        if group_keys is not None:
+            group_keys.discard(key)
+            if not group_keys:
+                del keys_by_group[key[0]]
+
+    def get(key, default=None):
+        with lock:
+            if key in cache:
+                counters["hits"] += 1
+                cache.move_to_end(key)
+                return cache[key]
+            counters["misses"] += 1
+            return default
+
+    def put(key, value):
+        size = len(value) if hasattr(value, "__len__") else 1
+        if max_rows is not None and size > max_rows:
+            return
+        with lock:
+            if key in cache:
+                _forget(key)
+            cache[key] = value
+            sizes[key] = size
+            counters["rows"] += size
+            keys_by_group.setdefault(key[0], set()).add(key)
+            while (max_entries is not None and len(cache) > max_entries) or (
+                max_rows is not None and counters["rows"] > max_rows
+            ):
+                _forget(next(iter(cache)))
+                counters["evictions"] += 1
 
     def cache_result(key, value_func):
-        if key in cache:
-            return cache[key]
+        missing = object()
+        value = get(key, missing)
+        if value is not missing:
+            return value
         value = value_func()
-        cache[key] = value
+        put(key, value)
         return value
 
-    def clear():
-        cache.clear()
+    def invalidate(group):
+        with lock:
+            for key in list(keys_by_group.get(group, ())):
+                _forget(key)
 
+    def clear():
+        with lock:
+            cache.clear()
+            sizes.clear()
+            keys_by_group.clear()
+            counters["rows"] = 0
+
+    def info():
+        with lock:
+            return dict(counters, entries=len(cache))
+
+    cache_result.get = get
+    cache_result.put = put
+    cache_result.invalidate = invalidate
     cache_result.clear = clear
+    cache_result.info = info
     return cache_result
-
-
@@ -0,0 +1,128 @@
+"""Aggregate functions folded over rows in a single pass.
+
+A select item is (function, column): function is one of AGGREGATE_FUNCTIONS
+or None for a plain column, column is "*" only in count(*). Rows are fed
+through one accumulator per aggregate, per group, so no result list is
+ever built.
+"""
+from src.constants import AGG_AVG, AGG_COUNT, AGG_MAX, AGG_MIN, AGG_SUM
+
+ALL_COLUMNS = "*"
+
+
+def item_label(item):
+    """Column title of a select item: the column name or e.g. sum(age)."""
+    function, column = item
+    return column if function is None else f"{function}({column})"
+
+
+class _Count:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def add(self, value):
+        if value is not None:
+            self.value += 1
+
+    def result(self):
+        return self.value
+
+
+class _Sum:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if value is not None:
+            self.value = value if self.value is None else self.value + value
+
+    def result(self):
+        return self.value
+
+
+class _Min:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if value is not None and (self.value is None or value < self.value):
+            self.value = value
+
+    def result(self):
+        return self.value
+
+
+class _Max:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if value is not None and (self.value is None or value > self.value):
+            self.value = value
+
+    def result(self):
+        return self.value
+
+
+class _Avg:
+    __slots__ = ("total", "count")
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        if value is not None:
+            self.total += value
+            self.count += 1
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+ACCUMULATORS = {
+    AGG_COUNT: _Count,
+    AGG_SUM: _Sum,
+    AGG_MIN: _Min,
+    AGG_MAX: _Max,
+    AGG_AVG: _Avg,
+}
+
+
+def aggregate_rows(records, items, group_by=None):
+    """Fold records and yield result rows keyed by item labels.
+
+    Without group_by there is exactly one result row (count 0 and None for
+    the other aggregates on no rows). With group_by there is one row per
+    distinct value of that column, in order of first appearance; plain
+    column items may only name the group column.
+    """
+    aggregates = [item for item in items if item[0] is not None]
+    columns = [column for _, column in aggregates]
+    factories = [ACCUMULATORS[function] for function, _ in aggregates]
+    groups = {}
+    for record in records:
+        key = record.get(group_by) if group_by is not None else None
+        accumulators = groups.get(key)
+        if accumulators is None:
+            accumulators = groups[key] = [factory() for factory in factories]
+        for accumulator, column in zip(accumulators, columns):
+            accumulator.add(True if column == ALL_COLUMNS else record.get(column))
+    if group_by is None and not groups:
+        groups[None] = [factory() for factory in factories]
+
+    labels = [item_label(item) for item in aggregates]
+    output_labels = [item_label(item) for item in items]
+    for key, accumulators in groups.items():
+        row = {label: accumulator.result() for label, accumulator in zip(labels, accumulators)}
+        if group_by is not None:
+            row[group_by] = key
+        yield {label: row[label] for label in output_labels}
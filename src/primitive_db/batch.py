@@ -0,0 +1,176 @@
+"""Non-interactive execution of commands and script files.
+
+Each statement produces one JSON line on stdout:
+
+    {"statement": 1, "command": "...", "ok": true, "output": "...", ["columns": [...], "rows": [...]]}
+
+By default the whole batch runs as one transaction that is committed once at
+the end and rolled back on the first failing statement; statements that
+would end that transaction or can't run inside one fail there. Runs of
+single-row inserts into one table are inserted together.
+"""
+import json
+import sys
+import time
+
+from src.constants import RESERVED_ID_NAME
+from src.decorators import set_auto_confirm
+from src.primitive_db.engine import capture_output, execute_captured, get_pool, insert_rows, recover
+from src.primitive_db.parser import InsertStatement, parse_statement
+
+COMMENT_PREFIXES = ("--", "#")
+# Commands that end the batch transaction or refuse to run inside one; they need --autocommit.
+AUTOCOMMIT_ONLY_COMMANDS = ("begin", "commit", "rollback", "compact", "convert_table", "set_layout", "alter_table")
+
+
+def split_statements(text):
+    """Split script text into statements.
+
+    A statement ends at a newline or at a ';' outside double quotes. Blank
+    lines and lines starting with -- or # are skipped.
+    """
+    statements = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith(COMMENT_PREFIXES):
+            continue
+        if ";" not in stripped:
+            statements.append(stripped)
+            continue
+        current = []
+        in_string = False
+        for char in stripped:
+            if char == '"':
+                in_string = not in_string
+            if char == ";" and not in_string:
+                statements.append("".join(current).strip())
+                current = []
+            else:
+                current.append(char)
+        statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def _emit(out, result):
+    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def _parse_single_insert(command):
+    """Return (table_name, values) of a single-row insert, or None for anything else."""
+    if command[:len("insert")].lower() != "insert":
+        return None
+    try:
+        statement = parse_statement(command)
+    except ValueError:
+        return None
+    if not isinstance(statement, InsertStatement) or len(statement.rows) != 1:
+        return None
+    return statement.table, statement.rows[0]
+
+
+def _run_inserts(pending, out, stop_on_error):
+    """Run buffered single-row inserts into one table. Returns the number of failed statements.
+
+    All rows go in as one batch; if any of them is invalid, the statements
+    are run one by one instead so each gets its own result and error.
+    """
+    table_name = pending[0][2]
+    ids = insert_rows(table_name, [values for _, _, _, values in pending])
+    if ids is not None:
+        for (number, command, _, _), record_id in zip(pending, ids):
+            output = f"Запись с {RESERVED_ID_NAME}={record_id} успешно добавлена в таблицу \"{table_name}\".\n"
+            _emit(out, {"statement": number, "command": command, "ok": True, "output": output})
+        return 0
+    failed = 0
+    for number, command, _, _ in pending:
+        result = execute_captured(command)
+        _emit(out, {"statement": number, "command": command, **result})
+        if not result["ok"]:
+            failed += 1
+            if stop_on_error:
+                break
+    return failed
+
+
+def _refusal(command):
+    """Return the output of a command that can't run in a one-transaction batch, or None."""
+    name = command.split(maxsplit=1)[0].lower()
+    if name not in AUTOCOMMIT_ONLY_COMMANDS:
+        return None
+    return f"Команда {name} недоступна в пакете, выполняемом одной транзакцией. Используйте --autocommit.\n"
+
+
+def _abort(pool, out):
+    if pool.in_transaction:
+        pool.rollback()
+    _emit(out, {"ok": False, "rolled_back": True})
+    return 1
+
+
+def run_batch(statements, auto_confirm=False, autocommit=False, out=None):
+    """Run statements and write JSON lines to out. Returns the process exit code.
+
+    Without autocommit all statements run in one transaction: nothing is
+    written until the end, and the first failure rolls everything back
+    (exit code 1). Statements in AUTOCOMMIT_ONLY_COMMANDS count as failures
+    there, so the transaction is never ended early. With autocommit every statement is persisted on its own,
+    all of them are run and the exit code is 1 if any failed.
+    """
+    out = out if out is not None else sys.stdout
+    set_auto_confirm(auto_confirm)
+    capture_output(recover)
+    pool = get_pool()
+    start = time.monotonic()
+    if not autocommit:
+        pool.begin()
+
+    failed = 0
+    pending = []
+    for number, command in enumerate(statements, start=1):
+        insert = _parse_single_insert(command)
+        if pending and (insert is None or insert[0] != pending[0][2]):
+            failed += _run_inserts(pending, out, not autocommit)
+            pending = []
+            if failed and not autocommit:
+                return _abort(pool, out)
+        if insert is not None:
+            pending.append((number, command, *insert))
+            continue
+        refusal = None if autocommit else _refusal(command)
+        if refusal is not None:
+            _emit(out, {"statement": number, "command": command, "ok": False, "output": refusal})
+            return _abort(pool, out)
+        result = execute_captured(command)
+        _emit(out, {"statement": number, "command": command, **result})
+        if not result["ok"]:
+            failed += 1
+            if not autocommit:
+                return _abort(pool, out)
+    if pending:
+        failed += _run_inserts(pending, out, not autocommit)
+        if failed and not autocommit:
+            return _abort(pool, out)
+
+    if not autocommit:
+        tables, changes = pool.commit()
+        _emit(out, {
+            "ok": True,
+            "committed": True,
+            "statements": len(statements),
+            "tables": tables,
+            "changes": changes,
+            "duration": round(time.monotonic() - start, 3),
+        })
+    return 1 if failed else 0
+
+
+def run_script(filepath, auto_confirm=False, autocommit=False, out=None):
+    """Run a script file as a batch. Returns the process exit code (2 if the file can't be read)."""
+    out = out if out is not None else sys.stdout
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            statements = split_statements(f.read())
+    except (OSError, UnicodeDecodeError) as error:
+        _emit(out, {"ok": False, "output": f"Ошибка чтения файла {filepath}: {error}\n"})
+        return 2
+    return run_batch(statements, auto_confirm, autocommit, out)
@@ -0,0 +1,313 @@
+import copy
+import json
+import mmap
+import os
+import struct
+
+from src.constants import (
+    BINARY_HEAP_EXTENSION,
+    BINARY_LEGACY_MAGIC,
+    BINARY_MAGIC,
+    BINARY_TABLE_EXTENSION,
+    DATA_DIR,
+    LOG_OP_INSERT,
+    RESERVED_ID_NAME,
+    TYPE_BOOL,
+    TYPE_INT,
+    TYPE_STR,
+)
+from src.primitive_db.metrics import PHASE_FILE_WRITE, PHASE_SERIALIZATION, measured, phase
+from src.primitive_db.rows import row_class
+from src.primitive_db.utils import write_atomic
+
+# Header: magic, row count, length of the JSON schema that follows it.
+_HEADER = struct.Struct("<4sQI")
+_ROW_COUNT_OFFSET = 4
+_COUNT = struct.Struct("<Q")
+_ID = struct.Struct("<q")
+# Field layouts: int -> int64, bool -> 1 byte, str -> (heap offset, byte length).
+_FIELD_FORMATS = {
+    TYPE_INT: "q",
+    TYPE_BOOL: "?",
+    TYPE_STR: "QI",
+}
+# What a None is packed as; its null flag tells it apart.
+_NULL_FIELDS = {
+    TYPE_INT: (0,),
+    TYPE_BOOL: (False,),
+    TYPE_STR: (0, 0),
+}
+
+
+def get_binary_filepath(table_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{table_name}{BINARY_TABLE_EXTENSION}")
+
+
+def get_heap_filepath(table_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{table_name}{BINARY_HEAP_EXTENSION}")
+
+
+class _RowCodec:
+    """Packs records into fixed-width little-endian rows and back.
+
+    A row ends with null flags, one bit per column in schema order, set
+    where the value is None (legacy files, null_flags=False, have none).
+    With columns given, unpack decodes only those fields: the others are
+    read as pad bytes, so their values (and strings) are never built.
+    Columns the file schema lacks (added by alter_table after the file was
+    written) get their defaults. Decoded records are rows of row_class (see
+    rows.py).
+    """
+
+    def __init__(self, schema, columns=None, defaults=None, null_flags=True):
+        self.columns = list(schema.items())
+        self.null_flags = null_flags
+        self._no_nulls = bytes((len(self.columns) + 7) // 8) if null_flags else b""
+        flags_format = f"{len(self._no_nulls)}s" if null_flags else ""
+        self.struct = struct.Struct(
+            "<" + "".join(_FIELD_FORMATS[column_type] for _, column_type in self.columns) + flags_format
+        )
+        self.size = self.struct.size
+        if columns is None:
+            self._decoded = self.columns
+            self._reader = self.struct
+        else:
+            wanted = set(columns)
+            self._decoded = [(name, column_type) for name, column_type in self.columns if name in wanted]
+            self._reader = struct.Struct("<" + "".join(
+                _FIELD_FORMATS[column_type] if name in wanted
+                else f"{struct.calcsize('<' + _FIELD_FORMATS[column_type])}x"
+                for name, column_type in self.columns
+            ) + flags_format)
+        positions = {name: position for position, (name, _) in enumerate(self.columns)}
+        self._flag_positions = [positions[name] for name, _ in self._decoded]
+        missing = [] if columns is None else [column for column in columns if column not in schema]
+        self._fill = tuple((defaults or {}).get(column) for column in missing)
+        self.row_class = row_class(tuple(name for name, _ in self._decoded) + tuple(missing))
+
+    def pack(self, record, heap, heap_offset):
+        """Return packed row; str values are appended to the heap bytearray."""
+        fields = []
+        flags = bytearray(self._no_nulls)
+        for position, (name, column_type) in enumerate(self.columns):
+            value = record[name]
+            if value is None:
+                flags[position >> 3] |= 1 << (position & 7)
+                fields.extend(_NULL_FIELDS[column_type])
+            elif column_type == TYPE_STR:
+                encoded = value.encode("utf-8")
+                fields.append(heap_offset + len(heap))
+                fields.append(len(encoded))
+                heap += encoded
+            else:
+                fields.append(value)
+        if self.null_flags:
+            fields.append(bytes(flags))
+        return self.struct.pack(*fields)
+
+    def unpack(self, buffer, offset, heap):
+        fields = self._reader.unpack_from(buffer, offset)
+        values = []
+        position = 0
+        for _, column_type in self._decoded:
+            if column_type == TYPE_STR:
+                start, length = fields[position], fields[position + 1]
+                values.append(str(heap[start:start + length], "utf-8"))
+                position += 2
+            else:
+                values.append(fields[position])
+                position += 1
+        if self.null_flags and fields[-1] != self._no_nulls:
+            flags = fields[-1]
+            for index, flag_position in enumerate(self._flag_positions):
+                if flags[flag_position >> 3] >> (flag_position & 7) & 1:
+                    values[index] = None
+        return self.row_class(*values, *self._fill)
+
+
+def _header_bytes(schema, row_count):
+    schema_bytes = json.dumps(list(schema.items())).encode("utf-8")
+    header = _HEADER.pack(BINARY_MAGIC, row_count, len(schema_bytes)) + schema_bytes
+    return header + b"\x00" * (-len(header) % 8)
+
+
+def _map_file(filepath):
+    """Return a read-only mmap of a file, or empty bytes for an empty file."""
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class BinaryTable:
+    """Lazy view of a binary table file.
+
+    Only the header is parsed on open; rows are decoded from the memory
+    map on access, so len() is free and an ID lookup is a binary search over
+    fixed-width rows. Behaves like a list of records; appended records are
+    kept in memory until the table is written.
+
+    schema is the file schema. Given the current table schema, rows are
+    decoded to its columns: columns dropped since the file was written are
+    skipped and added ones get their defaults.
+    """
+
+    def __init__(self, table_name, data_dir=DATA_DIR, table_schema=None, defaults=None):
+        self._buffer = _map_file(get_binary_filepath(table_name, data_dir))
+        self._heap = memoryview(_map_file(get_heap_filepath(table_name, data_dir)))
+        magic, self._row_count, schema_length = _HEADER.unpack_from(self._buffer, 0)
+        if magic not in (BINARY_MAGIC, BINARY_LEGACY_MAGIC):
+            raise ValueError(f"Некорректный формат файла таблицы {table_name}.")
+        self._null_flags = magic == BINARY_MAGIC
+        schema_start = _HEADER.size
+        columns = json.loads(bytes(self._buffer[schema_start:schema_start + schema_length]))
+        self.schema = dict(columns)
+        self._columns = None if table_schema is None or list(table_schema) == list(self.schema) else list(table_schema)
+        self._defaults = defaults
+        self._codec = _RowCodec(self.schema, self._columns, defaults, self._null_flags)
+        self._data_offset = schema_start + schema_length + (-(schema_start + schema_length) % 8)
+        self._appended = []
+        self._projection = None
+
+    def with_columns(self, columns):
+        """Return a view of the same rows that decodes only the given columns."""
+        view = copy.copy(self)
+        view._codec = _RowCodec(self.schema, columns, self._defaults, self._null_flags)
+        view._projection = list(columns)
+        return view
+
+    def __len__(self):
+        return self._row_count + len(self._appended)
+
+    @property
+    def row_class(self):
+        """Class of the records this view yields."""
+        return self._codec.row_class
+
+    def row(self, position):
+        if position >= self._row_count:
+            record = self._appended[position - self._row_count]
+            if self._projection is not None:
+                return self.row_class.from_mapping(record)
+            return record
+        return self._codec.unpack(self._buffer, self._data_offset + position * self._codec.size, self._heap)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.row(position) for position in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self.row(item)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.row(position)
+
+    def append(self, record):
+        self._appended.append(record)
+
+    def _id_at(self, position):
+        if position >= self._row_count:
+            return self._appended[position - self._row_count][RESERVED_ID_NAME]
+        return _ID.unpack_from(self._buffer, self._data_offset + position * self._codec.size)[0]
+
+    def position_of(self, record_id):
+        """Binary-search the ID field of the rows; return the position or -1."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._id_at(middle) < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._id_at(low) == record_id:
+            return low
+        return -1
+
+    def materialize(self):
+        return list(self)
+
+
+def load_binary_table(table_name, data_dir=DATA_DIR, table_schema=None, defaults=None):
+    """Open a binary table view, or return [] if the table file is missing."""
+    try:
+        return BinaryTable(table_name, data_dir, table_schema, defaults)
+    except FileNotFoundError:
+        return []
+
+
+def save_binary_table(table_name, schema, records, data_dir=DATA_DIR):
+    """Write all records as a fresh binary table file and string heap."""
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+    codec = _RowCodec(schema)
+    heap = bytearray()
+    rows = bytearray(_header_bytes(schema, len(records)))
+    with phase(PHASE_SERIALIZATION):
+        for record in records:
+            rows += codec.pack(record, heap, 0)
+    # Write aside and rename, so open memory maps keep seeing the old files.
+    write_atomic(get_heap_filepath(table_name, data_dir), heap, sync_directory=False)
+    write_atomic(get_binary_filepath(table_name, data_dir), rows)
+
+
+def remove_binary_table(table_name, data_dir=DATA_DIR):
+    for filepath in (get_binary_filepath(table_name, data_dir), get_heap_filepath(table_name, data_dir)):
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+
+
+def _file_header(filepath):
+    """Return the magic and the schema recorded in the header of a binary table file."""
+    with open(filepath, "rb") as f:
+        magic, _, schema_length = _HEADER.unpack(f.read(_HEADER.size))
+        return magic, dict(json.loads(f.read(schema_length)))
+
+
+def _write_synced(filepath, offset, data):
+    with open(filepath, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+@measured(PHASE_FILE_WRITE)
+def save_binary_changes(table_name, schema, entries, records, data_dir=DATA_DIR):
+    """Apply log entries to the binary files.
+
+    Inserts are appended: first their strings to the heap, then the rows,
+    and the row count in the header last, each write fsynced. A crash in
+    between leaves rows past the old count (overwritten by the next append)
+    or unused heap bytes, never a row pointing past the end of the heap.
+    Updates and deletes would change rows that open memory maps still read,
+    and rows of a file written before alter_table, or without null flags,
+    have another width, so in these cases the table is rewritten from records.
+    """
+    filepath = get_binary_filepath(table_name, data_dir)
+    magic, file_schema = _file_header(filepath) if os.path.exists(filepath) else (None, None)
+    if (
+        magic != BINARY_MAGIC
+        or any(entry["op"] != LOG_OP_INSERT for entry in entries)
+        or list(file_schema.items()) != list(schema.items())
+    ):
+        save_binary_table(table_name, schema, records, data_dir)
+        return
+
+    codec = _RowCodec(schema)
+    heap_filepath = get_heap_filepath(table_name, data_dir)
+    heap_offset = os.path.getsize(heap_filepath)
+    heap = bytearray()
+    appended = bytearray()
+    for entry in entries:
+        appended += codec.pack(entry["row"], heap, heap_offset)
+    with open(filepath, "rb") as f:
+        _, row_count, schema_length = _HEADER.unpack(f.read(_HEADER.size))
+    data_offset = _HEADER.size + schema_length + (-(_HEADER.size + schema_length) % 8)
+    _write_synced(heap_filepath, heap_offset, heap)
+    _write_synced(filepath, data_offset + row_count * codec.size, appended)
+    _write_synced(filepath, _ROW_COUNT_OFFSET, _COUNT.pack(row_count + len(entries)))
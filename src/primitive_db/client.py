@@ -0,0 +1,92 @@
+"""Client for the database server (see server.py) with connection reuse.
+
+    with DatabaseClient(port=7878) as client:
+        client.execute('insert into users values ("Ann", 30, true)')
+        rows = client.select("select from users where age > 25")
+
+Connections are kept open between calls and shared through a small pool,
+so a client can be used from several threads.
+"""
+import json
+import socket
+from queue import Empty, Full, LifoQueue
+
+from src.constants import CLIENT_POOL_SIZE, CLIENT_TIMEOUT, SERVER_HOST, SERVER_PORT
+
+
+class _Connection:
+    __slots__ = ("sock", "stream", "next_id")
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.stream = self.sock.makefile("rb")
+        self.next_id = 1
+
+    def request(self, command):
+        request_id = self.next_id
+        self.next_id += 1
+        payload = json.dumps({"id": request_id, "command": command}, ensure_ascii=False) + "\n"
+        self.sock.sendall(payload.encode("utf-8"))
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        response = json.loads(line)
+        if response.get("id") != request_id:
+            raise ConnectionError("response does not match the request")
+        return response
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+class DatabaseClient:
+    """Send REPL commands to a database server and get JSON responses back."""
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, pool_size=CLIENT_POOL_SIZE, timeout=CLIENT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = LifoQueue(maxsize=pool_size)
+
+    def execute(self, command):
+        """Run a command. Returns the response: ok, output and, for select, columns and rows.
+
+        A connection that fails is dropped; the error (ConnectionError or
+        another OSError) is raised, since the command may have been applied.
+        """
+        try:
+            connection = self._idle.get_nowait()
+        except Empty:
+            connection = _Connection(self.host, self.port, self.timeout)
+        try:
+            response = connection.request(command)
+        except (OSError, ValueError):
+            connection.close()
+            raise
+        try:
+            self._idle.put_nowait(connection)
+        except Full:
+            connection.close()
+        return response
+
+    def select(self, command):
+        """Run a select and return rows as dicts. Raises ValueError with the server message on error."""
+        response = self.execute(command)
+        if not response["ok"]:
+            raise ValueError(response["output"].strip())
+        columns = response["columns"]
+        return [dict(zip(columns, row)) for row in response["rows"]]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,364 @@
+import operator
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+
+from src.constants import (
+    OP_BETWEEN,
+    OP_EQ,
+    OP_GE,
+    OP_GT,
+    OP_LE,
+    OP_LT,
+    OP_NE,
+    RESERVED_ID_NAME,
+    TYPE_BOOL,
+    TYPE_INT,
+    TYPE_STR,
+)
+from src.primitive_db.expressions import NODE_AND, NODE_BETWEEN, NODE_IN, NODE_NOT, NODE_OR
+
+_INVERT = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+
+
+def and_masks(left, right):
+    """Combine two 0/1 byte masks of equal length with a single big-int AND."""
+    combined = int.from_bytes(left, "little") & int.from_bytes(right, "little")
+    return bytearray(combined.to_bytes(len(left), "little"))
+
+
+def or_masks(left, right):
+    combined = int.from_bytes(left, "little") | int.from_bytes(right, "little")
+    return bytearray(combined.to_bytes(len(left), "little"))
+
+
+def invert_mask(mask):
+    return bytearray(mask.translate(_INVERT))
+
+
+_COMPARATORS = {
+    OP_LT: operator.lt,
+    OP_LE: operator.le,
+    OP_GT: operator.gt,
+    OP_GE: operator.ge,
+}
+# Dictionary-encoded columns keep one-byte codes until this many distinct values.
+_BYTE_CODES_LIMIT = 256
+
+
+def _compare_mask(values, op, operand):
+    """Evaluate `value <op> operand` over an iterable with a C-level map."""
+    if op == OP_BETWEEN:
+        low, high = operand
+        return and_masks(_compare_mask(values, OP_GE, low), _compare_mask(values, OP_LE, high))
+    comparator = _COMPARATORS.get(op, operator.eq)
+    return bytearray(map(comparator, values, repeat(operand)))
+
+
+def mask_positions(mask):
+    """Return positions of set bytes; sparse masks are walked with bytearray.find."""
+    count = mask.count(1)
+    if count * 64 >= len(mask):
+        return list(compress(range(len(mask)), mask))
+    positions = []
+    position = mask.find(1)
+    while position != -1:
+        positions.append(position)
+        position = mask.find(1, position + 1)
+    return positions
+
+
+def _null_mask(values):
+    """Return a 0/1 bytearray marking the None values of a list, or None if there are none."""
+    if None not in values:
+        return None
+    return bytearray(value is None for value in values)
+
+
+class _NullableColumn:
+    """None support of the typed columns.
+
+    A None is stored as 0 and its row is set in nulls, a 0/1 bytearray
+    created on the first None, so a column without nulls pays nothing.
+    Like a comparison with None in a row predicate, a null row matches no
+    condition: mask() results are cleared at null rows.
+    """
+
+    nulls = None
+
+    def _set_nulls(self, values):
+        """Record the nulls of a list of values; returns the values to store."""
+        self.nulls = _null_mask(values)
+        if self.nulls is None:
+            return values
+        return [0 if value is None else value for value in values]
+
+    def _mark(self, position, is_null):
+        if self.nulls is None:
+            if not is_null:
+                return
+            self.nulls = bytearray(len(self.data))
+        if position == len(self.nulls):
+            self.nulls.append(is_null)
+        else:
+            self.nulls[position] = is_null
+
+    def _is_null(self, position):
+        return self.nulls is not None and self.nulls[position]
+
+    def _not_null(self, mask):
+        return mask if self.nulls is None else and_masks(mask, invert_mask(self.nulls))
+
+    def _keep_nulls(self, column, keep_mask):
+        if self.nulls is not None and 1 in self.nulls:
+            column.nulls = bytearray(compress(self.nulls, keep_mask))
+        return column
+
+    def _nulls_size(self):
+        return 0 if self.nulls is None else sys.getsizeof(self.nulls)
+
+
+class IntColumn(_NullableColumn):
+    """int values packed into a signed 64-bit array."""
+
+    def __init__(self, values=()):
+        self.data = array("q", self._set_nulls(list(values)))
+
+    def append(self, value):
+        self._mark(len(self.data), value is None)
+        self.data.append(0 if value is None else value)
+
+    def get(self, position):
+        return None if self._is_null(position) else self.data[position]
+
+    def set(self, position, value):
+        self._mark(position, value is None)
+        self.data[position] = 0 if value is None else value
+
+    def mask(self, expected):
+        if isinstance(expected, tuple):
+            return self._not_null(_compare_mask(self.data, *expected))
+        return self._not_null(_compare_mask(self.data, None, expected))
+
+    def keep(self, keep_mask):
+        column = IntColumn()
+        column.data = array("q", compress(self.data, keep_mask))
+        return self._keep_nulls(column, keep_mask)
+
+    def memory_size(self):
+        return sys.getsizeof(self.data) + self._nulls_size()
+
+
+class BoolColumn(_NullableColumn):
+    """bool values stored one byte per row (0/1), filtered with bytes.translate."""
+
+    def __init__(self, values=()):
+        self.data = bytearray(self._set_nulls(list(values)))
+
+    def append(self, value):
+        self._mark(len(self.data), value is None)
+        self.data.append(1 if value else 0)
+
+    def get(self, position):
+        return None if self._is_null(position) else bool(self.data[position])
+
+    def set(self, position, value):
+        self._mark(position, value is None)
+        self.data[position] = 1 if value else 0
+
+    def mask(self, expected):
+        if isinstance(expected, tuple):
+            return self._not_null(_compare_mask(self.data, *expected))
+        return self._not_null(bytearray(self.data) if expected else invert_mask(self.data))
+
+    def keep(self, keep_mask):
+        column = BoolColumn()
+        column.data = bytearray(compress(self.data, keep_mask))
+        return self._keep_nulls(column, keep_mask)
+
+    def memory_size(self):
+        return sys.getsizeof(self.data) + self._nulls_size()
+
+
+class StrColumn:
+    """Dictionary-encoded str values: distinct strings plus an array of codes.
+
+    Codes are single bytes while there are few distinct values, so filters
+    become one bytes.translate call; predicates are evaluated once per
+    distinct value and then mapped over the codes. None is a dictionary
+    value of its own that matches no condition.
+    """
+
+    def __init__(self, values=()):
+        self.dictionary = []
+        self.codes = {}
+        self.data = bytearray()
+        for value in values:
+            self.append(value)
+
+    def _encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            if code == _BYTE_CODES_LIMIT:
+                self.data = array("L", iter(self.data))
+            self.codes[value] = code
+            self.dictionary.append(value)
+        return code
+
+    def append(self, value):
+        code = self._encode(value)
+        self.data.append(code)
+
+    def get(self, position):
+        return self.dictionary[self.data[position]]
+
+    def set(self, position, value):
+        code = self._encode(value)
+        self.data[position] = code
+
+    def mask(self, expected):
+        if isinstance(expected, tuple):
+            null_code = self.codes.get(None)
+            if null_code is None:
+                truth = bytes(_compare_mask(self.dictionary, *expected))
+            else:
+                values = self.dictionary[:null_code] + self.dictionary[null_code + 1:]
+                truth = _compare_mask(values, *expected)
+                truth.insert(null_code, 0)
+                truth = bytes(truth)
+        else:
+            truth = bytearray(len(self.dictionary))
+            code = self.codes.get(expected)
+            if code is not None:
+                truth[code] = 1
+            truth = bytes(truth)
+        if isinstance(self.data, bytearray):
+            return bytearray(self.data.translate(truth.ljust(_BYTE_CODES_LIMIT, b"\x00")))
+        return bytearray(map(truth.__getitem__, self.data))
+
+    def keep(self, keep_mask):
+        column = StrColumn()
+        column.dictionary = self.dictionary
+        column.codes = self.codes
+        kept = compress(self.data, keep_mask)
+        column.data = bytearray(kept) if isinstance(self.data, bytearray) else array("L", kept)
+        return column
+
+    def memory_size(self):
+        return sys.getsizeof(self.data) + sum(sys.getsizeof(value) for value in self.dictionary)
+
+
+COLUMN_TYPES = {
+    TYPE_INT: IntColumn,
+    TYPE_BOOL: BoolColumn,
+    TYPE_STR: StrColumn,
+}
+
+
+class ColumnarTable:
+    """Typed column-per-array representation of a table.
+
+    Behaves like a read-only list of records (len, indexing, iteration and
+    append build or take dicts), so generic code keeps working, while core
+    filters it column at a time through mask().
+    """
+
+    def __init__(self, schema):
+        self.schema = dict(schema)
+        self.columns = {name: COLUMN_TYPES[column_type]() for name, column_type in self.schema.items()}
+        self._length = 0
+
+    @classmethod
+    def from_records(cls, schema, records):
+        table = cls(schema)
+        table.columns = {
+            name: COLUMN_TYPES[column_type](record[name] for record in records)
+            for name, column_type in table.schema.items()
+        }
+        table._length = len(records)
+        return table
+
+    def __len__(self):
+        return self._length
+
+    def row(self, position):
+        return {name: column.get(position) for name, column in self.columns.items()}
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.row(position) for position in range(*item.indices(self._length))]
+        if item < 0:
+            item += self._length
+        if not 0 <= item < self._length:
+            raise IndexError(item)
+        return self.row(item)
+
+    def __iter__(self):
+        for position in range(self._length):
+            yield self.row(position)
+
+    def append(self, record):
+        for name, column in self.columns.items():
+            column.append(record.get(name))
+        self._length += 1
+
+    def position_of(self, record_id):
+        """Binary-search the ID column; return the row position or -1."""
+        ids = self.columns[RESERVED_ID_NAME].data
+        position = bisect_left(ids, record_id)
+        if position < len(ids) and ids[position] == record_id:
+            return position
+        return -1
+
+    def mask(self, node):
+        """Evaluate a WHERE expression column at a time into a 0/1 bytearray."""
+        if node is None:
+            return bytearray(b"\x01" * self._length)
+        kind = node[0]
+        if kind in (NODE_AND, NODE_OR):
+            combine = and_masks if kind == NODE_AND else or_masks
+            result = self.mask(node[1][0])
+            for child in node[1][1:]:
+                result = combine(result, self.mask(child))
+            return result
+        if kind == NODE_NOT:
+            return invert_mask(self.mask(node[1]))
+
+        column = self.columns[node[1]]
+        if kind == NODE_IN:
+            result = bytearray(self._length)
+            for value in node[2]:
+                result = or_masks(result, column.mask(value))
+            return result
+        if kind == NODE_BETWEEN:
+            return column.mask((OP_BETWEEN, (node[2], node[3])))
+        op, value = node[2], node[3]
+        if op == OP_EQ:
+            return column.mask(value)
+        if op == OP_NE:
+            return invert_mask(column.mask(value))
+        return column.mask((op, value))
+
+    def positions(self, mask):
+        return mask_positions(mask)
+
+    def update_positions(self, positions, set_clause):
+        for name, value in set_clause.items():
+            column = self.columns[name]
+            for position in positions:
+                column.set(position, value)
+
+    def without_positions(self, positions):
+        """Return a new table without the rows at the given positions."""
+        keep_mask = bytearray(b"\x01" * self._length)
+        for position in positions:
+            keep_mask[position] = 0
+        table = ColumnarTable(self.schema)
+        table.columns = {name: column.keep(keep_mask) for name, column in self.columns.items()}
+        table._length = self._length - len(set(positions))
+        return table
+
+    def memory_size(self):
+        return sys.getsizeof(self) + sum(column.memory_size() for column in self.columns.values())
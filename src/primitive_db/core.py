@@ -1,8 +1,65 @@
-
-from src.constants import ALLOWED_TYPES, RESERVED_ID_NAME, TYPE_BOOL, TYPE_INT, TYPE_STR
-from src.decorators import confirm_action, create_cacher, handle_db_errors, log_time
-
-_select_cache = create_cacher()
+import time
+from itertools import islice
+from operator import attrgetter, methodcaller
+
+from src.constants import (
+    AGG_COUNT,
+    AGG_MAX,
+    AGG_MIN,
+    ALLOWED_TYPES,
+    INDEX_HASH,
+    INDEX_SORTED,
+    LAYOUT_ROWS,
+    META_TABLES_INFO_KEY,
+    RANGE_TYPES,
+    RESERVED_ID_NAME,
+    SELECT_CACHE_MAX_ENTRIES,
+    SELECT_CACHE_MAX_ROWS,
+    STORAGE_JSON,
+    STORAGE_SEGMENTED,
+    TABLE_LAYOUTS,
+    TABLE_STORAGES,
+    TYPE_BOOL,
+    TYPE_INT,
+    TYPE_STR,
+)
+from src.decorators import create_cacher
+from src.primitive_db.aggregates import ALL_COLUMNS, aggregate_rows, item_label
+from src.primitive_db.binary import BinaryTable
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.errors import ColumnNotFoundError, TableExistsError, TableNotFoundError, ValidationError
+from src.primitive_db.expressions import (
+    NODE_IN,
+    as_condition,
+    compile_predicate,
+    conjunction,
+    conjuncts,
+    iter_columns,
+    map_columns,
+    normalize,
+)
+from src.primitive_db.indexes import INDEX_TYPES, find_id_range, find_positions
+from src.primitive_db.metrics import PHASE_MUTATION, PHASE_PREDICATE, measured
+from src.primitive_db.planner import (
+    ACCESS_FULL_SCAN,
+    ACCESS_ID_LOOKUP,
+    ACCESS_ID_RANGE,
+    ACCESS_INDEX_LOOKUP,
+    JOIN_INDEX,
+    collect_stats,
+    empty_stats,
+    estimate_rows_per_value,
+    plan_join,
+    plan_query,
+    stats_after_delete,
+    stats_after_insert,
+    stats_after_update,
+)
+from src.primitive_db.rows import Row, row_class, schema_row_class
+from src.primitive_db.segments import SegmentedTable
+
+_select_cache = create_cacher(SELECT_CACHE_MAX_ENTRIES, SELECT_CACHE_MAX_ROWS)
+_table_versions = {}
 
 
 def _parse_columns(columns):
@@ -34,60 +91,302 @@ def _parse_columns(columns):
     return True, parsed, ""
 
 
-def _make_select_key(table_data, where_clause, table_name):
-    records = table_data if table_data is not None else []
-    records_key = tuple(tuple(sorted(record.items())) for record in records)
-    where_key = None if not where_clause else tuple(sorted(where_clause.items()))
-    return table_name, records_key, where_key
+def table_exists(metadata, table_name):
+    return table_name != META_TABLES_INFO_KEY and table_name in metadata
+
+
+def get_table_names(metadata):
+    return [name for name in metadata if name != META_TABLES_INFO_KEY]
+
+
+def get_table_info(metadata, table_name):
+    """Return service information stored for a table (indexes etc.)."""
+    return metadata.get(META_TABLES_INFO_KEY, {}).get(table_name, {})
+
+
+def _with_table_info(metadata, table_name, info):
+    """Return a metadata copy with service information of a table replaced."""
+    new_metadata = dict(metadata)
+    tables_info = dict(metadata.get(META_TABLES_INFO_KEY, {}))
+    if info:
+        tables_info[table_name] = info
+    else:
+        tables_info.pop(table_name, None)
+    if tables_info:
+        new_metadata[META_TABLES_INFO_KEY] = tables_info
+    else:
+        new_metadata.pop(META_TABLES_INFO_KEY, None)
+    return new_metadata
+
+
+def next_id(metadata, table_name, table_data, count=1):
+    """Advance the table ID sequence stored in metadata by count.
+
+    Returns the first of the reserved IDs. The sequence lives in the table
+    service info, so IDs of deleted records are never reused. A table without
+    a sequence recovers it once from data. Metadata is changed in place; the
+    caller persists it.
+    """
+    tables_info = metadata.setdefault(META_TABLES_INFO_KEY, {})
+    info = tables_info.setdefault(table_name, {})
+    sequence = info.get("sequence")
+    if sequence is None:
+        sequence = max((item.get(RESERVED_ID_NAME, 0) for item in table_data), default=0)
+    info["sequence"] = sequence + count
+    return sequence + 1
+
+
+def get_table_stats(metadata, table_name):
+    """Return planner statistics of a table or None if it was never analyzed."""
+    return get_table_info(metadata, table_name).get("stats")
+
+
+def get_row_count(metadata, table_name):
+    """Return the row count kept in table statistics, or None if the table has none."""
+    stats = get_table_stats(metadata, table_name)
+    return None if stats is None else stats["rows"]
+
+
+def _track_stats(metadata, table_name, change, *args):
+    """Apply an incremental statistics change in place, if the table has statistics."""
+    info = metadata.get(META_TABLES_INFO_KEY, {}).get(table_name)
+    if info is not None and "stats" in info:
+        info["stats"] = change(info["stats"], *args)
+
+
+def track_update(metadata, table_name, set_clause, count):
+    """Account updated rows in table statistics. Metadata is changed in place."""
+    _track_stats(metadata, table_name, stats_after_update, set_clause, count)
+
+
+def track_delete(metadata, table_name, count):
+    """Account deleted rows in table statistics. Metadata is changed in place."""
+    _track_stats(metadata, table_name, stats_after_delete, count)
+
+
+def invalidate_table(cache_key):
+    """Bump the table version and drop its cached select results.
+
+    cache_key names the table in the select cache (see TablePool.cache_key).
+    """
+    _table_versions[cache_key] = _table_versions.get(cache_key, 0) + 1
+    _select_cache.invalidate(cache_key)
+
+
+def get_select_cache_info():
+    return _select_cache.info()
+
+
+def _make_select_key(where, cache_key, columns=None):
+    return cache_key, _table_versions.get(cache_key, 0), where, None if columns is None else tuple(columns)
+
+
+def _require_table(metadata, table_name):
+    if not table_exists(metadata, table_name):
+        raise TableNotFoundError(table_name)
 
 
-@handle_db_errors
 def create_table(metadata, table_name, columns):
     """Create a table definition inside metadata.
 
     - Adds ID:int automatically as the first column
     - Validates duplicates and allowed types
-    - Prints user-facing messages
-    Returns new metadata dict (may be the same if an error occurred).
+    Returns new metadata dict; raises TableExistsError or ValidationError.
     """
     if not table_name:
-        raise ValueError(f"Некорректное значение: {table_name}. Попробуйте снова.")
+        raise ValidationError(f"Некорректное значение: {table_name}. Попробуйте снова.")
+
+    if table_name == META_TABLES_INFO_KEY:
+        raise ValidationError(f"Некорректное значение: {table_name}. Попробуйте снова.")
 
     if table_name in metadata:
-        raise ValueError(f"Ошибка: Таблица \"{table_name}\" уже существует.")
+        raise TableExistsError(f"Ошибка: Таблица \"{table_name}\" уже существует.")
 
     ok, parsed_columns, err_val = _parse_columns(columns)
     if not ok:
-        raise ValueError(f"Некорректное значение: {err_val}. Попробуйте снова.")
+        raise ValidationError(f"Некорректное значение: {err_val}. Попробуйте снова.")
 
     # Build ordered mapping: ID first
     new_table = {RESERVED_ID_NAME: TYPE_INT}
     for col_name, col_type in parsed_columns:
         new_table[col_name] = col_type
 
-    new_metadata = dict(metadata)
+    new_metadata = _with_table_info(metadata, table_name, {"stats": empty_stats()})
     new_metadata[table_name] = new_table
+    return new_metadata
 
-    columns_desc = ", ".join([f"{RESERVED_ID_NAME}:{TYPE_INT}"] + [f"{n}:{t}" for n, t in parsed_columns])
-    print(f"Таблица \"{table_name}\" успешно создана со столбцами: {columns_desc}")
 
+def drop_table(metadata, table_name):
+    """Drop a table definition from metadata. Returns new metadata."""
+    _require_table(metadata, table_name)
+    new_metadata = _with_table_info(metadata, table_name, {})
+    del new_metadata[table_name]
     return new_metadata
 
 
-@handle_db_errors
-@confirm_action("удаление таблицы")
-def drop_table(metadata, table_name):
-    """Drop a table definition from metadata if it exists. Prints messages."""
-    if table_name not in metadata:
-        raise KeyError(table_name)
+def create_index(metadata, table_name, column, kind=INDEX_HASH):
+    """Register a secondary index on a table column. Returns new metadata."""
+    _require_table(metadata, table_name)
+    if column not in metadata[table_name]:
+        raise ColumnNotFoundError(column)
+    if kind not in INDEX_TYPES:
+        raise ValidationError(f"Некорректное значение: {kind}. Попробуйте снова.")
+    if kind == INDEX_SORTED and metadata[table_name][column] not in RANGE_TYPES:
+        raise ValidationError(f"Упорядоченный индекс не поддерживается для типа {metadata[table_name][column]}.")
+
+    info = dict(get_table_info(metadata, table_name))
+    indexes = dict(info.get("indexes", {}))
+    if column in indexes:
+        raise ValidationError(f"Индекс по столбцу {column} в таблице \"{table_name}\" уже существует.")
+    indexes[column] = kind
+    info["indexes"] = indexes
+    return _with_table_info(metadata, table_name, info)
+
+
+def drop_index(metadata, table_name, column):
+    """Remove a secondary index from a table. Returns new metadata."""
+    _require_table(metadata, table_name)
+    info = dict(get_table_info(metadata, table_name))
+    indexes = dict(info.get("indexes", {}))
+    if column not in indexes:
+        raise ValidationError(f"Индекса по столбцу {column} в таблице \"{table_name}\" нет.")
+    del indexes[column]
+    if indexes:
+        info["indexes"] = indexes
+    else:
+        info.pop("indexes", None)
+    return _with_table_info(metadata, table_name, info)
 
-    new_metadata = dict(metadata)
-    del new_metadata[table_name]
-    print(f"Таблица \"{table_name}\" успешно удалена.")
-    _select_cache.clear()
+
+def set_layout(metadata, table_name, layout):
+    """Choose how a table is held in memory: rows (dicts) or typed columns. Returns new metadata."""
+    _require_table(metadata, table_name)
+    if layout not in TABLE_LAYOUTS:
+        raise ValidationError(f"Некорректное значение: {layout}. Попробуйте снова.")
+
+    info = dict(get_table_info(metadata, table_name))
+    if layout == LAYOUT_ROWS:
+        info.pop("layout", None)
+    else:
+        info["layout"] = layout
+    return _with_table_info(metadata, table_name, info)
+
+
+def set_storage(metadata, table_name, storage):
+    """Choose the on-disk format of a table: JSON with a log, binary rows or JSON segments.
+
+    Returns new metadata; TablePool.convert rewrites the files.
+    """
+    _require_table(metadata, table_name)
+    if storage not in TABLE_STORAGES:
+        raise ValidationError(f"Некорректное значение: {storage}. Попробуйте снова.")
+
+    info = dict(get_table_info(metadata, table_name))
+    if info.get("storage", STORAGE_JSON) == storage:
+        raise ValidationError(f"Таблица \"{table_name}\" уже хранится в формате {storage}.")
+    if storage == STORAGE_JSON:
+        info.pop("storage", None)
+    else:
+        info["storage"] = storage
+    if storage != STORAGE_SEGMENTED:
+        info.pop("segments", None)
+    # Converting rewrites every record with the current columns.
+    info.pop("defaults", None)
+    info.pop("dropped", None)
+    return _with_table_info(metadata, table_name, info)
+
+
+def analyze_table(metadata, table_name, table_data):
+    """Recompute planner statistics of a table from its records. Returns new metadata."""
+    _require_table(metadata, table_name)
+    info = dict(get_table_info(metadata, table_name))
+    info["stats"] = collect_stats(metadata[table_name], table_data)
+    return _with_table_info(metadata, table_name, info)
+
+
+def add_column(metadata, table_name, column, default=None):
+    """Add a name:type column to a table schema without touching its records. Returns new metadata.
+
+    Records stored before the change lack the column; loading gives them
+    default, recorded in the table info until the table is rewritten.
+    """
+    _require_table(metadata, table_name)
+    ok, parsed_columns, err_val = _parse_columns([column])
+    if not ok or not parsed_columns:
+        raise ValidationError(f"Некорректное значение: {err_val or column}. Попробуйте снова.")
+    name, column_type = parsed_columns[0]
+    if name in metadata[table_name]:
+        raise ValidationError(f"Столбец {name} в таблице \"{table_name}\" уже существует.")
+    info = dict(get_table_info(metadata, table_name))
+    if name in info.get("dropped", ()):
+        raise ValidationError(
+            f"Столбец {name} удален из таблицы \"{table_name}\", но еще хранится в ее файлах. "
+            f"Выполните compact {table_name}."
+        )
+    if default is not None and type(default) is not _PYTHON_TYPES[column_type]:
+        raise ValidationError(f"Некорректный тип для столбца {name}. Ожидался {column_type}.")
+
+    info["defaults"] = {**info.get("defaults", {}), name: default}
+    stats = info.get("stats")
+    if stats is not None and stats["rows"] and default is not None:
+        column_stats = {"distinct": 1, "min": default, "max": default}
+        info["stats"] = {**stats, "columns": {**stats["columns"], name: column_stats}}
+    new_metadata = _with_table_info(metadata, table_name, info)
+    new_metadata[table_name] = {**metadata[table_name], name: column_type}
+    return new_metadata
+
+
+def drop_column(metadata, table_name, column):
+    """Remove a column from a table schema without touching its records. Returns new metadata.
+
+    Stored records keep the values until the table is rewritten (compact,
+    convert_table); until then the name is listed as dropped and can't be
+    added again.
+    """
+    _require_table(metadata, table_name)
+    if column == RESERVED_ID_NAME:
+        raise ValidationError(f"Удаление столбца {RESERVED_ID_NAME} запрещено.")
+    if column not in metadata[table_name]:
+        raise ColumnNotFoundError(column)
+
+    info = dict(get_table_info(metadata, table_name))
+    info["dropped"] = [*info.get("dropped", []), column]
+    for key in ("defaults", "indexes"):
+        values = {name: value for name, value in info.get(key, {}).items() if name != column}
+        if values:
+            info[key] = values
+        else:
+            info.pop(key, None)
+    stats = info.get("stats")
+    if stats is not None and column in stats["columns"]:
+        columns = {name: value for name, value in stats["columns"].items() if name != column}
+        info["stats"] = {**stats, "columns": columns}
+    new_metadata = _with_table_info(metadata, table_name, info)
+    new_metadata[table_name] = {name: value for name, value in metadata[table_name].items() if name != column}
     return new_metadata
 
 
+def mark_rewritten(metadata, table_name):
+    """Note that every record of a table was rewritten with its current columns. Returns new metadata.
+
+    Added columns need no defaults and dropped ones are gone from the files.
+    """
+    info = dict(get_table_info(metadata, table_name))
+    if "defaults" not in info and "dropped" not in info:
+        return metadata
+    info.pop("defaults", None)
+    info.pop("dropped", None)
+    return _with_table_info(metadata, table_name, info)
+
+
+def value_from_text(text, column_type):
+    """Convert a value typed as text (e.g. a default in a command) to a column type."""
+    try:
+        return _TEXT_CONVERTERS[column_type](text)
+    except (KeyError, ValueError):
+        raise ValidationError(f"Некорректное значение: {text}. Попробуйте снова.") from None
+
+
 def _is_value_of_type(value, expected_type):
     if expected_type == TYPE_INT:
         return isinstance(value, int)
@@ -98,25 +397,145 @@ def _is_value_of_type(value, expected_type):
     return False
 
 
-def _matches(record, where_clause):
-    for key, expected in where_clause.items():
-        if record.get(key) != expected:
-            return False
-    return True
+def _parse_bool_text(text):
+    lowered = text.strip().lower()
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    raise ValueError(text)
+
+
+_TEXT_CONVERTERS = {
+    TYPE_INT: int,
+    TYPE_STR: str,
+    TYPE_BOOL: _parse_bool_text,
+}
+_PYTHON_TYPES = {
+    TYPE_INT: int,
+    TYPE_STR: str,
+    TYPE_BOOL: bool,
+}
 
 
-@handle_db_errors
-@log_time
-def insert(metadata, table_name, values, table_data=None):
-    """Add a new record to the table after validating schema and types."""
-    if table_name not in metadata:
-        raise KeyError(table_name)
+def compile_row_validator(schema, from_text=False):
+    """Build a validator for rows of values in schema order (without ID).
+
+    The returned function turns a list of values into a record without ID,
+    or returns None if the row does not fit the schema. With from_text the
+    values are strings (e.g. CSV cells) converted to the column types.
+    """
+    columns = [column for column in schema if column != RESERVED_ID_NAME]
+    column_count = len(columns)
+    if from_text:
+        converters = [_TEXT_CONVERTERS[schema[column]] for column in columns]
+
+        def validate(values):
+            if len(values) != column_count:
+                return None
+            try:
+                return {column: convert(value) for column, convert, value in zip(columns, converters, values)}
+            except (TypeError, ValueError):
+                return None
+
+        return validate
+
+    expected_types = [_PYTHON_TYPES[schema[column]] for column in columns]
+
+    def validate(values):
+        if len(values) != column_count:
+            return None
+        for value, expected_type in zip(values, expected_types):
+            if type(value) is not expected_type:
+                return None
+        return dict(zip(columns, values))
+
+    return validate
+
+
+def _lookup_ids(node, indexes):
+    """Return IDs the ID column itself or an index yields for one condition."""
+    column = node[1]
+    if column == RESERVED_ID_NAME:
+        return list(node[2]) if node[0] == NODE_IN else [node[3]]
+    index = indexes[column]
+    if node[0] != NODE_IN:
+        return index.lookup_condition(as_condition(node))
+    ids = []
+    for value in node[2]:
+        ids.extend(index.lookup_condition(value))
+    return ids
+
+
+def _find_candidates(table_data, plan, indexes, where=None):
+    """Fetch rows along the access path of a plan as (positions, records).
+
+    Returns (None, table_data) for scans - only the segments whose bounds
+    allow a match to where for a segmented table; the full WHERE still has
+    to be checked on every returned record.
+    """
+    if plan.access == ACCESS_ID_RANGE:
+        positions = find_id_range(table_data, as_condition(plan.node))
+        return positions, table_data[positions[0]:positions[-1] + 1] if positions else []
+    if plan.access in (ACCESS_ID_LOOKUP, ACCESS_INDEX_LOOKUP):
+        positions = find_positions(table_data, set(_lookup_ids(plan.node, indexes)))
+        return positions, [table_data[position] for position in positions]
+    if isinstance(table_data, SegmentedTable):
+        return None, table_data.candidates(where)
+    return None, table_data
+
+
+def _row_class_of(table_data):
+    """Return the row class shared by the records of a table, or None for dict records."""
+    if isinstance(table_data, (BinaryTable, SegmentedTable)):
+        return table_data.row_class
+    if isinstance(table_data, list) and table_data and isinstance(table_data[0], Row):
+        return type(table_data[0])
+    return None
+
+
+def _residual_predicate(where, plan, row_class=None):
+    """Return the filter still needed on rows fetched by a plan.
+
+    ID and index lookups return exactly the rows matching their condition,
+    so a WHERE consisting of that condition alone needs no further check.
+    """
+    if where is None or (plan.node is not None and plan.node == where):
+        return None
+    return compile_predicate(where, row_class)
 
+
+def _plan(table_data, where, indexes, stats):
+    return plan_query(where, table_data, indexes, stats, columnar=isinstance(table_data, ColumnarTable))
+
+
+def _columnar_positions(table_data, where, plan, indexes):
+    """Return positions of matching rows of a ColumnarTable.
+
+    Rows fetched through an index are checked one by one; otherwise the
+    WHERE is evaluated column at a time into a selection mask.
+    """
+    positions, candidates = _find_candidates(table_data, plan, indexes)
+    if positions is None:
+        return table_data.positions(table_data.mask(where))
+    predicate = _residual_predicate(where, plan)
+    if predicate is None:
+        return positions
+    return [position for position, record in zip(positions, candidates) if predicate(record)]
+
+
+@measured(PHASE_MUTATION)
+def insert(metadata, table_name, values, table_data=None, indexes=None):
+    """Add a new record to the table after validating schema and types.
+
+    The record is appended to table_data in place and returned.
+    """
+    _require_table(metadata, table_name)
     schema = metadata[table_name]
     ordered_columns = [column for column in schema.keys() if column != RESERVED_ID_NAME]
 
     if len(values) != len(ordered_columns):
-        raise ValueError("Некорректное количество значений. Попробуйте снова.")
+        raise ValidationError("Некорректное количество значений. Попробуйте снова.")
 
     if table_data is None:
         table_data = []
@@ -124,95 +543,478 @@ def insert(metadata, table_name, values, table_data=None):
     for column_name, value in zip(ordered_columns, values):
         expected_type = schema[column_name]
         if not _is_value_of_type(value, expected_type):
-            raise ValueError(f"Некорректный тип для столбца {column_name}. Ожидался {expected_type}.")
+            raise ValidationError(f"Некорректный тип для столбца {column_name}. Ожидался {expected_type}.")
 
-    if table_data:
-        max_id = max(item.get(RESERVED_ID_NAME, 0) for item in table_data)
-        new_id = max_id + 1
-    else:
-        new_id = 1
+    new_id = next_id(metadata, table_name, table_data)
 
-    new_record = {RESERVED_ID_NAME: new_id}
-    for column_name, value in zip(ordered_columns, values):
-        new_record[column_name] = value
+    new_record = schema_row_class(schema)(new_id, *values)
 
     table_data.append(new_record)
-    _select_cache.clear()
-    print(f"Запись с {RESERVED_ID_NAME}={new_id} успешно добавлена в таблицу \"{table_name}\".")
+    for index in (indexes or {}).values():
+        index.add(new_record)
+    _track_stats(metadata, table_name, stats_after_insert, [new_record])
+    return new_record
+
+
+@measured(PHASE_MUTATION)
+def insert_many(metadata, table_name, records, table_data=None, indexes=None):
+    """Append validated records (without ID) in one batch.
+
+    IDs are reserved from the sequence at once and nothing is printed per
+    record. Returns the table data.
+    """
+    _require_table(metadata, table_name)
+    if table_data is None:
+        table_data = []
+    if not records:
+        return table_data
+
+    new_id = next_id(metadata, table_name, table_data, len(records))
+    start = len(table_data)
+    row_class = schema_row_class(metadata[table_name])
+    columns = row_class.columns[1:]
+    for record in records:
+        table_data.append(row_class(new_id, *map(record.get, columns)))
+        new_id += 1
+    inserted = table_data[start:]
+    for index in (indexes or {}).values():
+        index.add_many(inserted)
+    _track_stats(metadata, table_name, stats_after_insert, inserted)
     return table_data
 
 
-@handle_db_errors
-@log_time
-def select(table_data, where_clause=None, table_name=None):
+def _iter_matches(table_data, where, indexes, stats=None):
+    plan = None if where is None else _plan(table_data, where, indexes, stats)
+    if isinstance(table_data, SegmentedTable) and (plan is None or plan.access == ACCESS_FULL_SCAN):
+        yield from table_data.scan(where)
+        return
+    if where is None:
+        yield from table_data
+        return
+    if isinstance(table_data, ColumnarTable):
+        for position in _columnar_positions(table_data, where, plan, indexes):
+            yield table_data.row(position)
+        return
+    _, candidates = _find_candidates(table_data, plan, indexes)
+    predicate = _residual_predicate(where, plan, _row_class_of(table_data))
+    yield from candidates if predicate is None else filter(predicate, candidates)
+
+
+def _iter_projected(table_data, where, indexes, stats, columns):
+    """Yield matching records holding only the given columns.
+
+    The projection is pushed into the scan: a columnar table reads just
+    those column arrays, a binary table decodes just those fields plus the
+    ones the WHERE needs, and segments of a segmented table read on the
+    process pool send back just those. Rows of a JSON table are already
+    parsed and are only trimmed.
+    """
+    if isinstance(table_data, ColumnarTable):
+        if where is None:
+            positions = range(len(table_data))
+        else:
+            positions = _columnar_positions(table_data, where, _plan(table_data, where, indexes, stats), indexes)
+        yield from _columnar_records(table_data, positions, columns)
+        return
+    needed = list(dict.fromkeys([*columns, *(iter_columns(where) if where is not None else ())]))
+    if isinstance(table_data, BinaryTable):
+        table_data = table_data.with_columns(needed)
+        if len(needed) == len(columns):
+            yield from _iter_matches(table_data, where, indexes, stats)
+            return
+    elif isinstance(table_data, SegmentedTable):
+        table_data = table_data.with_columns(needed)
+    for record in _iter_matches(table_data, where, indexes, stats):
+        yield {column: record[column] for column in columns}
+
+
+def explain_select(table_data, where_clause=None, indexes=None, stats=None):
+    """Plan a select, run it and return (plan, fetched rows, result rows, seconds)."""
+    where = normalize(where_clause)
+    plan = _plan(table_data, where, indexes, stats)
+    start = time.monotonic()
+    if where is None:
+        fetched = result = len(table_data)
+    elif isinstance(table_data, ColumnarTable):
+        positions, _ = _find_candidates(table_data, plan, indexes)
+        fetched = len(table_data) if positions is None else len(positions)
+        result = len(_columnar_positions(table_data, where, plan, indexes))
+    else:
+        _, candidates = _find_candidates(table_data, plan, indexes, where)
+        fetched = len(candidates)
+        predicate = _residual_predicate(where, plan, _row_class_of(table_data)) or bool
+        result = sum(1 for record in candidates if predicate(record))
+    return plan, fetched, result, time.monotonic() - start
+
+
+def iter_select(
+    table_data, where_clause=None, cache_key=None, indexes=None, limit=None, offset=0, stats=None, columns=None
+):
+    """Stream matching records: scan -> filter -> offset/limit.
+
+    where_clause is an expression from parser.parse_where_clause (the old
+    {column: value} dicts are accepted too); it is compiled once before the
+    scan. With columns, records hold only those columns and only they are
+    read from storage. Reading stops as soon as limit records were produced.
+    A full filtered result is collected into the select cache on the way if
+    it fits the cache bounds, and later served from it; cache_key names the
+    table there (see TablePool.cache_key), without it nothing is cached.
+    """
+    where = normalize(where_clause)
+    stop = None if limit is None else offset + limit
+    if columns is None:
+        rows = _iter_matches(table_data, where, indexes, stats)
+    else:
+        rows = _iter_projected(table_data, where, indexes, stats, columns)
+    if cache_key is None or where is None:
+        yield from islice(rows, offset, stop)
+        return
+
+    key = _make_select_key(where, cache_key, columns)
+    cached = _select_cache.get(key)
+    if cached is not None:
+        yield from islice(cached, offset, stop)
+        return
+
+    if stop is not None or offset:
+        yield from islice(rows, offset, stop)
+        return
+
+    collected = []
+    for record in rows:
+        if collected is not None:
+            collected.append(record)
+            if len(collected) > SELECT_CACHE_MAX_ROWS:
+                collected = None
+        yield record
+    if collected is not None:
+        _select_cache.put(key, collected)
+
+
+@measured(PHASE_PREDICATE)
+def select(table_data, where_clause=None, cache_key=None, indexes=None, stats=None):
     """Return table records, optionally filtered, with memoization support."""
-    key = _make_select_key(table_data, where_clause, table_name)
+    where = normalize(where_clause)
 
     def compute():
-        if not where_clause:
+        if where is None:
             return table_data
-        return [record for record in table_data if _matches(record, where_clause)]
+        return list(_iter_matches(table_data, where, indexes, stats))
 
-    return _select_cache(key, compute)
+    if cache_key is None:
+        return compute()
+    return _select_cache(_make_select_key(where, cache_key), compute)
 
 
-@handle_db_errors
-def update(table_data, set_clause, where_clause, table_name=None):
-    """Apply values from set_clause to records matching where_clause."""
-    changed_ids = []
-    for record in table_data:
-        if _matches(record, where_clause):
-            for key, value in set_clause.items():
-                record[key] = value
-            changed_ids.append(record.get(RESERVED_ID_NAME))
+class JoinSide:
+    """One table of a join: its records, indexes and statistics and the column it is joined on."""
 
-    if not changed_ids:
-        print("Записи по условию не найдены.")
-        return table_data
+    __slots__ = ("name", "schema", "table_data", "column", "indexes", "stats")
 
-    if len(changed_ids) == 1:
-        if table_name:
-            print(f"Запись с {RESERVED_ID_NAME}={changed_ids[0]} в таблице \"{table_name}\" успешно обновлена.")
-        else:
-            print(f"Запись с {RESERVED_ID_NAME}={changed_ids[0]} успешно обновлена.")
-    else:
-        joined = ", ".join(str(item) for item in changed_ids)
-        if table_name:
-            print(f"Записи с {RESERVED_ID_NAME}={joined} в таблице \"{table_name}\" успешно обновлены.")
-        else:
-            print(f"Записи с {RESERVED_ID_NAME}={joined} успешно обновлены.")
-    _select_cache.clear()
-    return table_data
+    def __init__(self, name, schema, table_data, column, indexes=None, stats=None):
+        self.name = name
+        self.schema = schema
+        self.table_data = table_data
+        self.column = column
+        self.indexes = indexes or {}
+        self.stats = stats
 
 
-@handle_db_errors
-@confirm_action("удаление записей")
-def delete(table_data, where_clause, table_name=None):
-    """Remove records that satisfy where_clause and report deleted IDs."""
-    remaining = []
-    deleted_ids = []
-    for record in table_data:
-        if _matches(record, where_clause):
-            deleted_ids.append(record.get(RESERVED_ID_NAME))
+def join_schema(metadata, left_name, right_name):
+    """Return the columns of a join of two tables as {table.column: type}, left table first."""
+    return {
+        f"{table_name}.{column}": column_type
+        for table_name in (left_name, right_name)
+        for column, column_type in metadata[table_name].items()
+    }
+
+
+def _split_join_where(where, sides):
+    """Split a join WHERE into (left part, right part, rest).
+
+    Conditions of a top-level AND that name columns of one table only are
+    moved to that table, rewritten to its plain column names; the rest keeps
+    table.column names and is checked on joined rows.
+    """
+    owners = {f"{side.name}.{column}": (number, column) for number, side in enumerate(sides) for column in side.schema}
+    parts = ([], [], [])
+    for node in conjuncts(where) if where is not None else ():
+        numbers = {owners[column][0] for column in iter_columns(node)}
+        if len(numbers) == 1:
+            parts[numbers.pop()].append(map_columns(node, lambda column: owners[column][1]))
         else:
-            remaining.append(record)
+            parts[2].append(node)
+    return tuple(normalize(conjunction(nodes)) if nodes else None for nodes in parts)
 
-    if not deleted_ids:
-        print("Записи по условию не найдены.")
-        return table_data
 
-    if len(deleted_ids) == 1:
-        if table_name:
-            print(f"Запись с {RESERVED_ID_NAME}={deleted_ids[0]} успешно удалена из таблицы \"{table_name}\".")
+def _lookup_rows(side):
+    """Return the expected rows per join key if a side can be looked up by its join column, else None."""
+    if side.column == RESERVED_ID_NAME:
+        return 1
+    if side.column not in side.indexes:
+        return None
+    return estimate_rows_per_value(side.stats, side.column)
+
+
+def _plan_join(sides, where):
+    parts = _split_join_where(where, sides)
+    plans = tuple(_plan(side.table_data, part, side.indexes, side.stats) for side, part in zip(sides, parts))
+    return plan_join(plans, [_lookup_rows(side) for side in sides], parts)
+
+
+def _key_getter(side):
+    row_cls = _row_class_of(side.table_data)
+    if row_cls is not None and side.column in row_cls.fields:
+        return attrgetter(row_cls.fields[side.column])
+    return methodcaller("get", side.column)
+
+
+def _values_getter(side):
+    """Return a function giving the values of a record of a side in schema order."""
+    columns = tuple(side.schema)
+    row_cls = _row_class_of(side.table_data)
+    if row_cls is not None and row_cls.columns == columns:
+        return row_cls.values
+    return lambda record: tuple(map(record.get, columns))
+
+
+def _index_matcher(side, where):
+    """Return a function of a join key giving value tuples of the side's matching records.
+
+    Records are fetched through the ID column or the index on the join
+    column; the WHERE part of the side is checked on each of them.
+    """
+    table_data, get_values = side.table_data, _values_getter(side)
+    predicate = compile_predicate(where, _row_class_of(table_data)) if where is not None else None
+    lookup = (lambda key: (key,)) if side.column == RESERVED_ID_NAME else side.indexes[side.column].lookup
+
+    def matches(key):
+        records = [table_data[position] for position in find_positions(table_data, lookup(key))]
+        return [get_values(record) for record in records if predicate is None or predicate(record)]
+
+    return matches
+
+
+def _hash_matcher(side, where):
+    """Load value tuples of the side's matching records into a hash table keyed by the join column."""
+    get_key, get_values = _key_getter(side), _values_getter(side)
+    buckets = {}
+    for record in _iter_matches(side.table_data, where, side.indexes, side.stats):
+        key = get_key(record)
+        if key is None:
+            continue
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [get_values(record)]
         else:
-            print(f"Запись с {RESERVED_ID_NAME}={deleted_ids[0]} успешно удалена из таблицы.")
+            bucket.append(get_values(record))
+    return buckets.get
+
+
+def _join_rows(sides, plan):
+    build, probe = sides[plan.build], sides[plan.probe]
+    if plan.strategy == JOIN_INDEX:
+        matches = _index_matcher(build, plan.where[plan.build])
     else:
-        joined = ", ".join(str(item) for item in deleted_ids)
-        if table_name:
-            print(f"Записи с {RESERVED_ID_NAME}={joined} успешно удалены из таблицы \"{table_name}\".")
+        matches = _hash_matcher(build, plan.where[plan.build])
+    joined = row_class(tuple(f"{side.name}.{column}" for side in sides for column in side.schema))
+    predicate = compile_predicate(plan.where[2], joined) if plan.where[2] is not None else None
+    get_key, get_values = _key_getter(probe), _values_getter(probe)
+    probe_first = plan.probe == 0
+
+    for record in _iter_matches(probe.table_data, plan.where[plan.probe], probe.indexes, probe.stats):
+        key = get_key(record)
+        if key is None:
+            continue
+        found = matches(key)
+        if not found:
+            continue
+        values = get_values(record)
+        for other in found:
+            row = joined(*(values + other)) if probe_first else joined(*(other + values))
+            if predicate is None or predicate(row):
+                yield row
+
+
+def iter_join(left, right, where_clause=None):
+    """Stream the rows of an inner join of two JoinSides on equal join column values.
+
+    Rows hold the columns of both tables named table.column. Conditions of
+    the WHERE on one table are pushed down to the scan of that table and
+    may use its indexes; the rest is checked on joined rows. The side
+    picked by planner.plan_join is put into a hash table, or looked up
+    through its index, while the other side is streamed, so only one side
+    is ever held in memory. Rows with None in the join column match nothing.
+    """
+    sides = (left, right)
+    yield from _join_rows(sides, _plan_join(sides, normalize(where_clause)))
+
+
+def explain_join(left, right, where_clause=None):
+    """Plan a join, run it and return (join plan, result rows, seconds)."""
+    sides = (left, right)
+    plan = _plan_join(sides, normalize(where_clause))
+    start = time.monotonic()
+    result = sum(1 for _ in _join_rows(sides, plan))
+    return plan, result, time.monotonic() - start
+
+
+def _whole_table_value(table_data, item, indexes):
+    """Answer an aggregate over all rows without a scan.
+
+    count(*) is the table length, min/max of ID come from the ends of the
+    ID-ordered rows and min/max of a column with a sorted index from the
+    ends of the index. Returns (True, value) or (False, None).
+    """
+    function, column = item
+    if function == AGG_COUNT and column == ALL_COLUMNS:
+        return True, len(table_data)
+    if function not in (AGG_MIN, AGG_MAX):
+        return False, None
+    if column == RESERVED_ID_NAME:
+        if not len(table_data):
+            return True, None
+        return True, table_data[0 if function == AGG_MIN else -1][RESERVED_ID_NAME]
+    index = (indexes or {}).get(column)
+    if index is None or index.kind != INDEX_SORTED:
+        return False, None
+    return True, index.min() if function == AGG_MIN else index.max()
+
+
+def _columnar_records(table_data, positions, columns):
+    """Yield records of a ColumnarTable holding only the given columns."""
+    getters = [(column, table_data.columns[column].get) for column in columns]
+    for position in positions:
+        yield {column: get(position) for column, get in getters}
+
+
+@measured(PHASE_PREDICATE)
+def aggregate(table_data, items, where_clause=None, group_by=None, indexes=None, stats=None):
+    """Compute aggregate select items over matching records.
+
+    items are (function, column) pairs from parser.SelectQuery.
+    Aggregates over the whole table are answered without a scan where
+    possible; otherwise matching rows are folded one at a time (see
+    aggregates.aggregate_rows), reading only the referenced columns of
+    columnar and binary tables. Returns the list of result rows.
+    """
+    where = normalize(where_clause)
+    if where is None and group_by is None:
+        answers = [_whole_table_value(table_data, item, indexes) for item in items]
+        if all(found for found, _ in answers):
+            return [{item_label(item): value for item, (_, value) in zip(items, answers)}]
+
+    columns = {column for _, column in items if column != ALL_COLUMNS}
+    if group_by is not None:
+        columns.add(group_by)
+    if isinstance(table_data, ColumnarTable):
+        if where is None:
+            positions = range(len(table_data))
         else:
-            print(f"Записи с {RESERVED_ID_NAME}={joined} успешно удалены из таблицы.")
-    _select_cache.clear()
-    return remaining
+            positions = _columnar_positions(table_data, where, _plan(table_data, where, indexes, stats), indexes)
+        if group_by is None and all(item == (AGG_COUNT, ALL_COLUMNS) for item in items):
+            return [{item_label(item): len(positions) for item in items}]
+        records = _columnar_records(table_data, positions, sorted(columns))
+    elif isinstance(table_data, (BinaryTable, SegmentedTable)):
+        records = _iter_projected(table_data, where, indexes, stats, sorted(columns))
+    else:
+        records = _iter_matches(table_data, where, indexes, stats)
+    return list(aggregate_rows(records, items, group_by))
+
+
+def _update_columnar(table_data, set_clause, where, plan, indexes, touched_indexes):
+    """Update matching rows of a ColumnarTable. Returns (matched IDs, changed records)."""
+    positions = _columnar_positions(table_data, where, plan, indexes)
+    columns = [(table_data.columns[column].get, value) for column, value in set_clause.items()]
+    dirty = [position for position in positions if any(get(position) != value for get, value in columns)]
+    for index in touched_indexes:
+        index.remove_many([table_data.row(position) for position in positions])
+    table_data.update_positions(positions, set_clause)
+    for index in touched_indexes:
+        index.add_many([table_data.row(position) for position in positions])
+    id_column = table_data.columns[RESERVED_ID_NAME]
+    return [id_column.get(position) for position in positions], [table_data.row(position) for position in dirty]
+
+
+@measured(PHASE_MUTATION)
+def update(table_data, set_clause, where_clause, indexes=None, stats=None):
+    """Apply values from set_clause to records matching where_clause.
+
+    Records are changed in place. Returns (IDs of the matched records, the
+    records whose values actually changed); the latter go to the table log,
+    so callers need no copy of the table to find them.
+    """
+    where = normalize(where_clause)
+    plan = _plan(table_data, where, indexes, stats)
+    touched_indexes = [index for column, index in (indexes or {}).items() if column in set_clause]
+    if isinstance(table_data, ColumnarTable):
+        changed_ids, dirty = _update_columnar(table_data, set_clause, where, plan, indexes, touched_indexes)
+    else:
+        _, candidates = _find_candidates(table_data, plan, indexes, where)
+        predicate = _residual_predicate(where, plan, _row_class_of(table_data)) or bool
+        assignments = list(set_clause.items())
+        changed_ids = []
+        dirty = []
+        for record in candidates:
+            if predicate(record):
+                changed_ids.append(record[RESERVED_ID_NAME])
+                if not all(record.get(key) == value for key, value in assignments):
+                    dirty.append(record)
+        # Index entries hold the old values, so they leave before the records change.
+        for index in touched_indexes:
+            index.remove_many(dirty)
+        for record in dirty:
+            for key, value in assignments:
+                record[key] = value
+        for index in touched_indexes:
+            index.add_many(dirty)
+        if isinstance(table_data, SegmentedTable):
+            table_data.touch(dirty)
+
+    return changed_ids, dirty
+
 
+@measured(PHASE_MUTATION)
+def delete(table_data, where_clause, indexes=None, stats=None):
+    """Remove records that satisfy where_clause.
 
+    Returns (IDs of the deleted records, the remaining table data).
+    """
+    where = normalize(where_clause)
+    plan = _plan(table_data, where, indexes, stats)
+    remaining = []
+    deleted_records = []
+    if isinstance(table_data, ColumnarTable):
+        matched = _columnar_positions(table_data, where, plan, indexes)
+        deleted_records = [table_data.row(position) for position in matched]
+        remaining = table_data.without_positions(matched)
+    elif isinstance(table_data, SegmentedTable):
+        _, candidates = _find_candidates(table_data, plan, indexes, where)
+        predicate = _residual_predicate(where, plan, table_data.row_class) or bool
+        deleted_records = list(filter(predicate, candidates))
+        remaining = table_data.without(deleted_records)
+    else:
+        positions, candidates = _find_candidates(table_data, plan, indexes)
+        predicate = _residual_predicate(where, plan, _row_class_of(table_data)) or bool
+        if positions is None:
+            for record in table_data:
+                if predicate(record):
+                    deleted_records.append(record)
+                else:
+                    remaining.append(record)
+        else:
+            start = 0
+            for position, record in zip(positions, candidates):
+                if predicate(record):
+                    deleted_records.append(record)
+                    remaining.extend(table_data[start:position])
+                    start = position + 1
+            remaining.extend(table_data[start:])
+
+    deleted_ids = [record.get(RESERVED_ID_NAME) for record in deleted_records]
+    for index in (indexes or {}).values():
+        index.remove_many(deleted_records)
+
+    if not deleted_ids:
+        return deleted_ids, table_data
+    return deleted_ids, remaining
@@ -0,0 +1,386 @@
+"""Embeddable Python API: a Database of Tables that returns results and raises errors.
+
+    with Database("/path/to/db") as db:
+        users = db.create_table("users", {"name": "str", "age": "int"})
+        users.insert_many([["Ann", 30], {"name": "Bob", "age": 25}])
+        for record in users.select("age >= 18", columns=["name"], limit=10):
+            ...
+
+Nothing is printed: methods return IDs, records and counts, and failures
+raise the exceptions of errors.py. By default changes are kept in
+memory in a transaction of the table pool and written on commit(), close()
+or a clean exit from the with block (an exception rolls them back). With
+autocommit=True every change is written at once, as the REPL does.
+
+WHERE conditions are REPL expression text ("age > 30 and name != \"x\""),
+parsed expression trees (see expressions.py) or the legacy
+{column: value} dicts.
+"""
+import os
+from contextlib import contextmanager
+
+from src.constants import (
+    AGG_COUNT,
+    DATA_DIRECTORY_NAME,
+    INDEX_HASH,
+    META_FILENAME,
+    OP_EQ,
+    PRIMITIVE_DB_DIR,
+    RESERVED_ID_NAME,
+    TABLE_POOL_MEMORY_BUDGET,
+)
+from src.primitive_db import core
+from src.primitive_db.aggregates import ALL_COLUMNS
+from src.primitive_db.errors import ColumnNotFoundError, TableNotFoundError, TransactionError, ValidationError
+from src.primitive_db.expressions import check_expression, comparison, normalize
+from src.primitive_db.parser import parse_where_clause
+from src.primitive_db.pool import TablePool
+from src.primitive_db.rows import Row
+from src.primitive_db.utils import make_delete_entry, make_insert_entry, make_update_entry, prefers_snapshot
+
+
+class Database:
+    """A database directory: metadata file plus table files, held in a TablePool."""
+
+    def __init__(self, path=None, autocommit=False, memory_budget=TABLE_POOL_MEMORY_BUDGET):
+        path = path or PRIMITIVE_DB_DIR
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.autocommit = autocommit
+        self.pool = TablePool(
+            os.path.join(path, META_FILENAME),
+            memory_budget,
+            data_dir=os.path.join(path, DATA_DIRECTORY_NAME),
+        )
+        if not autocommit:
+            self.pool.begin()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.pool.in_transaction:
+            self.pool.rollback()
+        return False
+
+    @property
+    def in_transaction(self):
+        return self.pool.in_transaction
+
+    def begin(self):
+        """Start an explicit transaction (autocommit mode only; otherwise one is always open)."""
+        if self.pool.in_transaction:
+            raise TransactionError("Транзакция уже начата.")
+        self.pool.begin()
+
+    def commit(self):
+        """Write pending changes. Returns (tables, changes); see TablePool.commit."""
+        if not self.pool.in_transaction:
+            raise TransactionError("Нет активной транзакции.")
+        result = self.pool.commit()
+        if not self.autocommit:
+            self.pool.begin()
+        return result
+
+    def rollback(self):
+        """Drop pending changes."""
+        if not self.pool.in_transaction:
+            raise TransactionError("Нет активной транзакции.")
+        self.pool.rollback()
+        if not self.autocommit:
+            self.pool.begin()
+
+    def close(self):
+        """Write pending changes of the implicit transaction (an explicit one is rolled back)."""
+        if not self.pool.in_transaction:
+            return
+        if self.autocommit:
+            self.pool.rollback()
+        else:
+            self.pool.commit()
+
+    @contextmanager
+    def _outside_transaction(self, command):
+        """Run a storage rewrite (layout, format, compaction) with no transaction open.
+
+        Pending changes of the implicit transaction are written first; an
+        explicit transaction of an autocommit database has to be finished by
+        the caller.
+        """
+        if self.autocommit and self.pool.in_transaction:
+            raise TransactionError(f"Команда {command} недоступна внутри транзакции. Выполните commit или rollback.")
+        if not self.autocommit:
+            self.pool.commit()
+        try:
+            yield
+        finally:
+            if not self.autocommit:
+                self.pool.begin()
+
+    def get_metadata(self):
+        return self.pool.get_metadata()
+
+    def table_names(self):
+        return core.get_table_names(self.pool.get_metadata())
+
+    def table(self, name):
+        """Return the Table of an existing table; raises TableNotFoundError."""
+        if not core.table_exists(self.pool.get_metadata(), name):
+            raise TableNotFoundError(name)
+        return Table(self, name)
+
+    def create_table(self, name, columns):
+        """Create a table; columns are "name:type" strings or a {name: type} dict (ID is added)."""
+        if isinstance(columns, dict):
+            columns = [f"{column}:{column_type}" for column, column_type in columns.items()]
+        self.pool.save_metadata(core.create_table(self.pool.get_metadata(), name, list(columns)))
+        # Files left by an earlier table of this name must not show up in the new one.
+        self.pool.remove_table_files(name)
+        return Table(self, name)
+
+    def drop_table(self, name):
+        """Drop a table together with its data files."""
+        self.pool.save_metadata(core.drop_table(self.pool.get_metadata(), name))
+        self.pool.remove_table_files(name)
+
+    def create_index(self, table_name, column, kind=INDEX_HASH):
+        self.pool.save_metadata(core.create_index(self.pool.get_metadata(), table_name, column, kind))
+
+    def drop_index(self, table_name, column):
+        self.pool.save_metadata(core.drop_index(self.pool.get_metadata(), table_name, column))
+
+    def analyze(self, table_name):
+        """Recompute planner statistics of a table. Returns its row count."""
+        metadata = core.analyze_table(self.pool.get_metadata(), table_name, self.pool.get_table(table_name))
+        self.pool.save_metadata(metadata)
+        return core.get_table_stats(metadata, table_name)["rows"]
+
+    def set_layout(self, table_name, layout):
+        """Hold a table in memory as rows or typed columns."""
+        with self._outside_transaction("set_layout"):
+            self.pool.save_metadata(core.set_layout(self.pool.get_metadata(), table_name, layout))
+            self.pool.evict(table_name)
+
+    def convert_table(self, table_name, storage):
+        """Rewrite a table in another on-disk format (json, binary or segmented)."""
+        with self._outside_transaction("convert_table"):
+            self.pool.convert(table_name, core.set_storage(self.pool.get_metadata(), table_name, storage))
+
+    def compact(self, table_name):
+        """Rewrite the files of a table without its change log and dropped columns. Returns the row count."""
+        with self._outside_transaction("compact"):
+            if not core.table_exists(self.pool.get_metadata(), table_name):
+                raise TableNotFoundError(table_name)
+            row_count = len(self.pool.compact(table_name))
+            self.pool.save_metadata(core.mark_rewritten(self.pool.get_metadata(), table_name))
+            return row_count
+
+    def add_column(self, table_name, column, default=None):
+        """Add a name:type column; existing records read default (None if not given).
+
+        Only metadata is written, so this takes the same time for any table size.
+        """
+        with self._outside_transaction("alter_table"):
+            metadata = core.add_column(self.pool.get_metadata(), table_name, column, default)
+            self.pool.evict(table_name)
+            self._table_changed(metadata, table_name)
+
+    def drop_column(self, table_name, column):
+        """Remove a column; its values leave the files at the next compact or convert_table."""
+        with self._outside_transaction("alter_table"):
+            metadata = core.drop_column(self.pool.get_metadata(), table_name, column)
+            self.pool.evict(table_name)
+            self._table_changed(metadata, table_name)
+
+    def _table_changed(self, metadata, table_name):
+        self.pool.save_metadata(metadata)
+        core.invalidate_table(self.pool.cache_key(table_name))
+
+
+class Table:
+    """One table of a Database. Records are returned as dicts."""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    def __repr__(self):
+        return f"Table({self.name!r})"
+
+    @property
+    def _pool(self):
+        return self.database.pool
+
+    def _metadata(self):
+        metadata = self._pool.get_metadata()
+        if not core.table_exists(metadata, self.name):
+            raise TableNotFoundError(self.name)
+        return metadata
+
+    @property
+    def schema(self):
+        """{column: type} with ID first."""
+        return dict(self._metadata()[self.name])
+
+    @property
+    def columns(self):
+        return list(self._metadata()[self.name])
+
+    def __len__(self):
+        metadata = self._metadata()
+        row_count = core.get_row_count(metadata, self.name)
+        if row_count is None:
+            row_count = len(self._pool.get_table(self.name))
+        return row_count
+
+    def _where(self, schema, where):
+        """Turn a WHERE argument into a checked expression; None stays None."""
+        if isinstance(where, str):
+            text, where = where, parse_where_clause(where)
+            if where is None:
+                raise ValidationError(f"Некорректное значение: {text}. Попробуйте снова.")
+        where = normalize(where)
+        if where is not None:
+            error = check_expression(where, schema)
+            if error:
+                raise ValidationError(error)
+        return where
+
+    def _values(self, schema, values):
+        """Return the values of a row (sequence or mapping) in schema order, without ID."""
+        if not isinstance(values, dict):
+            return list(values)
+        for column in values:
+            if column not in schema or column == RESERVED_ID_NAME:
+                raise ColumnNotFoundError(column)
+        return [values.get(column) for column in schema if column != RESERVED_ID_NAME]
+
+    def _save(self, metadata, entries, table_data, change_count=None):
+        """Persist changed records through the pool and drop cached selects of the table."""
+        if change_count is not None and prefers_snapshot(change_count, len(table_data)):
+            self._pool.save_table(self.name, table_data, len(entries))
+        else:
+            self._pool.save_changes(self.name, entries, table_data)
+        self.database._table_changed(metadata, self.name)
+
+    def insert(self, values):
+        """Insert one row given as values in column order or a {column: value} mapping. Returns its ID."""
+        metadata = self._metadata()
+        schema = metadata[self.name]
+        table_data = self._pool.get_table(self.name)
+        indexes = self._pool.get_indexes(self.name)
+        record = core.insert(metadata, self.name, self._values(schema, values), table_data, indexes)
+        self._save(metadata, [make_insert_entry(record)], table_data)
+        return record[RESERVED_ID_NAME]
+
+    def insert_many(self, rows):
+        """Insert rows as one batch, all or nothing. Returns their IDs.
+
+        Raises ValidationError naming the first row (counting from 1) that
+        does not fit the schema; nothing is inserted then.
+        """
+        metadata = self._metadata()
+        schema = metadata[self.name]
+        validate = core.compile_row_validator(schema)
+        records = []
+        for number, values in enumerate(rows, start=1):
+            record = validate(self._values(schema, values))
+            if record is None:
+                raise ValidationError(f"Строка {number} не соответствует схеме таблицы \"{self.name}\".")
+            records.append(record)
+        return self.append_records(records)
+
+    def append_records(self, records):
+        """Insert records made by core.compile_row_validator as one batch. Returns their IDs.
+
+        The records are not checked again; the REPL import uses this after
+        rejecting rows that do not fit.
+        """
+        if not records:
+            return []
+        metadata = self._metadata()
+        table_data = self._pool.get_table(self.name)
+        before_count = len(table_data)
+        indexes = self._pool.get_indexes(self.name)
+        table_data = core.insert_many(metadata, self.name, records, table_data, indexes)
+        inserted = table_data[before_count:]
+        self._save(metadata, [make_insert_entry(record) for record in inserted], table_data, len(records))
+        return [record[RESERVED_ID_NAME] for record in inserted]
+
+    def select(self, where=None, columns=None, limit=None, offset=0):
+        """Iterate over matching records as dicts, reading only the given columns if any."""
+        metadata = self._metadata()
+        schema = metadata[self.name]
+        where = self._where(schema, where)
+        if columns is not None:
+            columns = list(columns)
+            for column in columns:
+                if column not in schema:
+                    raise ColumnNotFoundError(column)
+        rows = core.iter_select(
+            self._pool.get_table(self.name),
+            where,
+            self._pool.cache_key(self.name),
+            self._pool.get_indexes(self.name),
+            limit,
+            offset,
+            core.get_table_stats(metadata, self.name),
+            columns,
+        )
+        return (record.to_dict() if isinstance(record, Row) else dict(record) for record in rows)
+
+    def get(self, record_id):
+        """Return the record with this ID as a dict, or None."""
+        return next(self.select(comparison(RESERVED_ID_NAME, OP_EQ, record_id), limit=1), None)
+
+    def count(self, where=None):
+        """Return the number of matching records."""
+        metadata = self._metadata()
+        where = self._where(metadata[self.name], where)
+        if where is None:
+            return len(self)
+        item = (AGG_COUNT, ALL_COLUMNS)
+        (row,) = core.aggregate(
+            self._pool.get_table(self.name),
+            [item],
+            where,
+            indexes=self._pool.get_indexes(self.name),
+            stats=core.get_table_stats(metadata, self.name),
+        )
+        return next(iter(row.values()))
+
+    def update(self, values, where):
+        """Set {column: value} on records matching where (None matches all). Returns the IDs of the matched records."""
+        metadata = self._metadata()
+        schema = metadata[self.name]
+        if RESERVED_ID_NAME in values:
+            raise ValidationError(f"Изменение столбца {RESERVED_ID_NAME} запрещено.")
+        for column, value in values.items():
+            if column not in schema:
+                raise ColumnNotFoundError(column)
+            if check_expression(comparison(column, OP_EQ, value), schema):
+                raise ValidationError(f"Некорректный тип для столбца {column}. Ожидался {schema[column]}.")
+        where = self._where(schema, where)
+        table_data = self._pool.get_table_for_write(self.name)
+        indexes = self._pool.get_indexes(self.name)
+        stats = core.get_table_stats(metadata, self.name)
+        changed_ids, dirty = core.update(table_data, values, where, indexes, stats)
+        if dirty:
+            core.track_update(metadata, self.name, values, len(dirty))
+            self._save(metadata, [make_update_entry(record) for record in dirty], table_data)
+        return changed_ids
+
+    def delete(self, where):
+        """Delete records matching where (None matches all). Returns their IDs."""
+        metadata = self._metadata()
+        where = self._where(metadata[self.name], where)
+        table_data = self._pool.get_table_for_write(self.name)
+        indexes = self._pool.get_indexes(self.name)
+        stats = core.get_table_stats(metadata, self.name)
+        deleted_ids, remaining = core.delete(table_data, where, indexes, stats)
+        if deleted_ids:
+            core.track_delete(metadata, self.name, len(deleted_ids))
+            self._save(metadata, [make_delete_entry(record_id) for record_id in deleted_ids], remaining)
+        return deleted_ids
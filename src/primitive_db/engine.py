@@ -1,12 +1,127 @@
+import contextlib
+import contextvars
+import io
+import json
+import os
 import shlex
+import sys
+import threading
+import time
+from itertools import islice
 
 import prompt
 from prettytable import PrettyTable
 
-from src.constants import META_FILEPATH, RESERVED_ID_NAME, TYPE_BOOL, TYPE_INT, TYPE_STR
-from src.primitive_db.core import create_table, delete, drop_table, insert, select, update
-from src.primitive_db.parser import parse_set_clause, parse_values_list, parse_where_clause
-from src.primitive_db.utils import load_metadata, load_table_data, save_metadata, save_table_data
+from src.constants import (
+    AGG_COUNT,
+    AGG_MAX,
+    AGG_MIN,
+    ALLOWED_TYPES,
+    CSV_FILE_EXTENSION,
+    INDEX_HASH,
+    JSONL_FILE_EXTENSION,
+    LAYOUT_ROWS,
+    NUMERIC_AGGREGATES,
+    RANGE_TYPES,
+    RESERVED_ID_NAME,
+    SELECT_PAGE_SIZE,
+    STATEMENT_CACHE_MAX_ENTRIES,
+    STORAGE_JSON,
+    TYPE_BOOL,
+    TYPE_INT,
+    TYPE_STR,
+)
+from src.decorators import confirm_action, create_cacher, get_error_count, handle_db_errors, report_error
+from src.primitive_db import metrics
+from src.primitive_db.aggregates import ALL_COLUMNS, aggregate_rows, item_label
+from src.primitive_db.core import (
+    JoinSide,
+    aggregate,
+    compile_row_validator,
+    explain_join,
+    explain_select,
+    get_row_count,
+    get_select_cache_info,
+    get_table_info,
+    get_table_names,
+    get_table_stats,
+    iter_join,
+    iter_select,
+    join_schema,
+    table_exists,
+    value_from_text,
+)
+from src.primitive_db.database import Database
+from src.primitive_db.errors import DatabaseError
+from src.primitive_db.expressions import check_expression, format_expression, normalize
+from src.primitive_db.parser import (
+    STATEMENT_KEYWORDS,
+    DeleteStatement,
+    ExecuteStatement,
+    ExplainStatement,
+    InsertStatement,
+    PrepareStatement,
+    SelectQuery,
+    UpdateStatement,
+    parse_statement,
+)
+from src.primitive_db.planner import ACCESS_FULL_SCAN, ACCESS_INDEX_LOOKUP, JOIN_INDEX
+from src.primitive_db.segments import SegmentedTable
+from src.primitive_db.utils import iter_csv_rows, iter_jsonl_rows, write_rows
+
+# The REPL, the server and batch runs share one database; every change is written at once
+# unless the user opens a transaction with begin.
+_database = Database(autocommit=True)
+_table_pool = _database.pool
+# Parsed and validated statements by normalized command text (see _get_statement).
+_statement_cache = create_cacher(max_entries=STATEMENT_CACHE_MAX_ENTRIES)
+# Stand-in values of each type, bound into a prepared statement to validate it once.
+_SAMPLE_VALUES = {TYPE_INT: 0, TYPE_STR: "", TYPE_BOOL: False}
+# Commands about metrics themselves are not measured.
+METRICS_COMMANDS = {"stats", "profile"}
+
+
+class Session:
+    """State of one client of the engine.
+
+    file_access tells whether commands may read and write files named by the
+    user (select into, import, stats export). The server turns it off, so
+    remote clients can't reach files of the server machine. prepared holds
+    the prepared statements of the client by name: (statement, parameter
+    types, schema they were checked against).
+    """
+
+    __slots__ = ("file_access", "prepared")
+
+    def __init__(self, file_access=True):
+        self.file_access = file_access
+        self.prepared = {}
+
+
+# The session commands run in; the REPL and batch runs keep the default one.
+_current_session = contextvars.ContextVar("session", default=Session())
+
+
+@contextlib.contextmanager
+def use_session(session):
+    """Run the commands of a with block in session."""
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+def _file_access_allowed(filepath):
+    if _current_session.get().file_access:
+        return True
+    report_error(f"Ошибка: Доступ к файлу {filepath} в режиме сервера запрещен.")
+    return False
+
+
+def get_pool():
+    """Return the table pool shared by the REPL, the server and batch runs."""
+    return _table_pool
 
 
 def print_help():
@@ -17,11 +132,39 @@ def print_help():
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
     print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...) - создать запись")
+    print("<command> insert into <имя_таблицы> values (...), (...), ... - создать несколько записей")
+    print("<command> import <имя_таблицы> from <файл.csv|файл.jsonl> - загрузить записи из файла")
     print("<command> select from <имя_таблицы> where <столбец> = <значение> - прочитать записи по условию")
+    print("<command> select from <имя_таблицы> where <столбец> <|<=|>|>= <значение> - выборка по диапазону")
+    print("<command> select from <имя_таблицы> where <столбец> between <от> and <до> - выборка по диапазону")
+    print("<command> select from <имя_таблицы> where <условие> and|or <условие> - составные условия")
+    print("<command> select from <имя_таблицы> where not (<условие>) or <столбец> in (...) - также !=, скобки")
     print("<command> select from <имя_таблицы> - прочитать все записи")
+    print("<command> select <столбец1>, <столбец2> from <имя_таблицы> [where ...] - прочитать только эти столбцы")
+    print("<command> select count(*), sum|min|max|avg(<столбец>) from <имя_таблицы> [where ...] - агрегаты")
+    print("<command> select <столбец>, count(*) from <имя_таблицы> [where ...] group by <столбец> - по группам")
+    print("<command> select ... from <таблица1> join <таблица2> on <таблица1.столбец> = <таблица2.столбец> [where ...]"
+          " - соединить таблицы (столбцы указываются как таблица.столбец)")
+    print("<command> select ... limit <n> offset <m> - ограничить выборку")
+    print("<command> select ... into <файл.csv|файл.jsonl> - выгрузить выборку в файл")
     print("<command> update <имя_таблицы> set <столбец> = <значение> where <столбец> = <значение> - обновить записи")
     print("<command> delete from <имя_таблицы> where <столбец> = <значение> - удалить записи")
+    print("<command> prepare <имя> as <select|insert|update|delete с ? вместо значений> - подготовить команду")
+    print("<command> execute <имя> (<значение1>, ...) - выполнить подготовленную команду без разбора")
     print("<command> info <имя_таблицы> - вывести информацию о таблице")
+    print("<command> compact <имя_таблицы> - сжать журнал изменений таблицы")
+    print("<command> analyze <имя_таблицы> - пересчитать статистику таблицы для планировщика")
+    print("<command> explain select from <имя_таблицы> where ... - показать план выборки и число строк")
+    print("<command> begin / commit / rollback - начать, зафиксировать или отменить транзакцию")
+    print("<command> create_index <имя_таблицы> <столбец> [hash|sorted] - создать индекс по столбцу")
+    print("<command> drop_index <имя_таблицы> <столбец> - удалить индекс по столбцу")
+    print("<command> cache_stats - статистика кэша выборок")
+    print("<command> stats [on|off|reset|export <файл.json>] - метрики задержек команд и их фаз (p50/p95/p99)")
+    print("<command> profile <команда> - выполнить команду под cProfile и показать самые долгие функции")
+    print("<command> set_layout <имя_таблицы> <rows|columnar> - формат хранения таблицы в памяти")
+    print("<command> convert_table <имя_таблицы> <json|binary|segmented> - формат хранения таблицы на диске")
+    print("<command> alter_table <имя_таблицы> add <столбец:тип> [default <значение>] - добавить столбец")
+    print("<command> alter_table <имя_таблицы> drop <столбец> - удалить столбец")
     print("Строковые значения указывайте в двойных кавычках.")
 
     print("\nОбщие команды:")
@@ -29,11 +172,6 @@ def print_help():
     print("<command> help - справочная информация\n")
 
 
-def _save_if_changed(before, after):
-    if before != after:
-        save_metadata(META_FILEPATH, after)
-
-
 def _value_matches_type(value, expected_type):
     if expected_type == TYPE_INT:
         return isinstance(value, int)
@@ -49,7 +187,7 @@ def _validate_values(schema, values):
     for column_name, value in zip(ordered_columns, values):
         expected_type = schema[column_name]
         if not _value_matches_type(value, expected_type):
-            print(f"Некорректный тип для столбца {column_name}. Ожидался {expected_type}.")
+            report_error(f"Некорректный тип для столбца {column_name}. Ожидался {expected_type}.")
             return False
     return True
 
@@ -57,234 +195,785 @@ def _validate_values(schema, values):
 def _validate_clause(schema, clause):
     for key, value in clause.items():
         if key not in schema:
-            print(f"Некорректное значение: {key}. Попробуйте снова.")
+            report_error(f"Некорректное значение: {key}. Попробуйте снова.")
             return False
-        expected_type = schema[key]
-        if not _value_matches_type(value, expected_type):
-            print(f"Некорректный тип для столбца {key}. Ожидался {expected_type}.")
+        if not _value_matches_type(value, schema[key]):
+            report_error(f"Некорректный тип для столбца {key}. Ожидался {schema[key]}.")
             return False
     return True
 
 
-def _print_table(schema, rows):
+def _validate_where(schema, where_clause):
+    error = check_expression(where_clause, schema)
+    if error:
+        report_error(error)
+        return False
+    return True
+
+
+@metrics.measured(metrics.PHASE_RENDER)
+def _print_table(schema, rows, header=True):
     headers = list(schema.keys())
     table = PrettyTable()
     table.field_names = headers
+    table.header = header
     for row in rows:
         table.add_row([row.get(column, "") for column in headers])
     print(table)
 
 
-def _handle_insert(metadata, raw_command):
-    lower_command = raw_command.lower()
-    keyword = " values"
-    values_index = lower_command.find(keyword)
-    if values_index == -1:
-        print("Некорректное значение: values. Попробуйте снова.")
+def _print_rows_paged(schema, rows):
+    """Render rows page by page as they arrive. Returns the number of rows printed."""
+    count = 0
+    rows = iter(rows)
+    while True:
+        # Rows are produced lazily, so pulling a page is where the scan and filtering happen.
+        with metrics.phase(metrics.PHASE_PREDICATE):
+            page = list(islice(rows, SELECT_PAGE_SIZE))
+        if not page:
+            metrics.increment("rows.returned", count)
+            return count
+        _print_table(schema, page, header=count == 0)
+        count += len(page)
+
+
+def _check_insert(schema, statement):
+    # Rows of a multi-row insert are validated one by one while inserting.
+    return len(statement.rows) > 1 or _validate_values(schema, statement.rows[0])
+
+
+@handle_db_errors
+def _run_insert(metadata, statement):
+    table_name = statement.table
+    if len(statement.rows) > 1:
+        validate = compile_row_validator(metadata[table_name])
+        _bulk_insert(metadata, table_name, statement.rows, validate)
         return
 
-    head = raw_command[:values_index].strip()
-    if not head.lower().startswith("insert into "):
-        print("Некорректное значение: insert. Попробуйте снова.")
-        return
+    new_id = _database.table(table_name).insert(statement.rows[0])
+    print(f"Запись с {RESERVED_ID_NAME}={new_id} успешно добавлена в таблицу \"{table_name}\".")
+
+
+def _bulk_insert(metadata, table_name, rows, validate):
+    """Validate rows, insert them as one batch and persist once. Prints a summary."""
+    start = time.monotonic()
+    records = []
+    rejected = 0
+    for values in rows:
+        record = validate(values) if values is not None else None
+        if record is None:
+            rejected += 1
+        else:
+            records.append(record)
+
+    _database.table(table_name).append_records(records)
+
+    duration = time.monotonic() - start
+    print(f"Загружено записей: {len(records)}, отклонено: {rejected}, время: {duration:.3f} секунд.")
+
+
+def insert_rows(table_name, rows):
+    """Insert parsed rows (lists of values without ID) as one batch, persisted once.
+
+    Returns the new IDs, or None without inserting anything if the table is
+    missing or any row does not fit its schema.
+    """
+    with metrics.command("insert"):
+        return _insert_rows(table_name, rows)
+
+
+def _insert_rows(table_name, rows):
+    if not rows:
+        return None
+    try:
+        return _database.table(table_name).insert_many(rows)
+    except DatabaseError:
+        return None
 
-    head_parts = head.split()
-    if len(head_parts) < 3:
-        print("Некорректное значение: имя_таблицы. Попробуйте снова.")
+
+def _handle_import(metadata, args):
+    if len(args) != 4 or args[2].lower() != "from":
+        report_error("Некорректное значение: параметры. Попробуйте снова.")
         return
 
-    table_name = head_parts[2]
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица \"{table_name}\" не существует.")
+    table_name, filepath = args[1], args[3]
+    if not table_exists(metadata, table_name):
+        report_error(f"Ошибка: Таблица \"{table_name}\" не существует.")
+        return
+    if not _file_access_allowed(filepath):
         return
 
     schema = metadata[table_name]
-    values_part = raw_command[values_index + len(keyword):].strip()
-    if not values_part.startswith("(") or not values_part.endswith(")"):
-        print("Некорректное значение: скобки. Попробуйте снова.")
+    columns = [column for column in schema if column != RESERVED_ID_NAME]
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == CSV_FILE_EXTENSION:
+        rows = iter_csv_rows(filepath, columns)
+        validate = compile_row_validator(schema, from_text=True)
+    elif extension == JSONL_FILE_EXTENSION:
+        rows = iter_jsonl_rows(filepath, columns)
+        validate = compile_row_validator(schema)
+    else:
+        report_error(f"Некорректное значение: {filepath}. Попробуйте снова.")
         return
 
-    raw_values = values_part[1:-1]
-    parsed_values = parse_values_list(raw_values)
+    try:
+        _bulk_insert(metadata, table_name, rows, validate)
+    except FileNotFoundError:
+        report_error(f"Ошибка: Файл {filepath} не найден.")
+    except (OSError, UnicodeDecodeError) as error:
+        report_error(f"Ошибка чтения файла {filepath}: {error}")
+
+
+def _validate_items(schema, query):
+    """Check select items and the group by column against a table schema."""
+    if query.group_by is not None and query.group_by not in schema:
+        report_error(f"Некорректное значение: {query.group_by}. Попробуйте снова.")
+        return False
+    aggregate = query.is_aggregate
+    for function, column in query.items:
+        if function is None:
+            # Next to aggregates the only plain column allowed is the group column.
+            if column not in schema or (aggregate and column != query.group_by):
+                report_error(f"Некорректное значение: {column}. Попробуйте снова.")
+                return False
+            continue
+        if column == ALL_COLUMNS:
+            continue
+        if column not in schema:
+            report_error(f"Некорректное значение: {item_label((function, column))}. Попробуйте снова.")
+            return False
+        column_type = schema[column]
+        if (function in NUMERIC_AGGREGATES and column_type != TYPE_INT) or (
+            function in (AGG_MIN, AGG_MAX) and column_type not in RANGE_TYPES
+        ):
+            report_error(f"Функция {function} неприменима к столбцу {column} типа {column_type}.")
+            return False
+    return True
 
-    if not _validate_values(schema, parsed_values):
-        return
 
-    table_data = load_table_data(table_name)
-    before_count = len(table_data)
-    updated_data = insert(metadata, table_name, parsed_values, table_data)
-    if updated_data is None:
-        return
-    if len(updated_data) > before_count:
-        save_table_data(table_name, updated_data)
+def _validate_join(schema, query):
+    """Check the join columns against the schema of a join (see core.join_schema)."""
+    left = f"{query.table}.{query.join.left_column}"
+    right = f"{query.join.table}.{query.join.right_column}"
+    for column in (left, right):
+        if column not in schema:
+            report_error(f"Некорректное значение: {column}. Попробуйте снова.")
+            return False
+    if schema[left] != schema[right]:
+        report_error(f"Столбцы {left} и {right} имеют разные типы: {schema[left]} и {schema[right]}.")
+        return False
+    return True
 
 
-def _handle_select(metadata, raw_command):
-    lower_command = raw_command.lower()
-    keyword = "select from "
-    rest = raw_command[len(keyword):] if lower_command.startswith(keyword) else ""
-    if not rest:
-        print("Некорректное значение: имя_таблицы. Попробуйте снова.")
+def _check_select(schema, query):
+    if query.join is not None and not _validate_join(schema, query):
+        return False
+    if query.where and not _validate_where(schema, query.where):
+        return False
+    return _validate_items(schema, query)
+
+
+def _join_sides(metadata, query):
+    """Return the JoinSides of the two tables of a select with join."""
+    return tuple(
+        JoinSide(
+            table_name,
+            metadata[table_name],
+            _table_pool.get_table(table_name),
+            column,
+            _table_pool.get_indexes(table_name),
+            get_table_stats(metadata, table_name),
+        )
+        for table_name, column in (
+            (query.table, query.join.left_column),
+            (query.join.table, query.join.right_column),
+        )
+    )
+
+
+def _iter_join_rows(metadata, query):
+    """Return (columns, rows) of a select with join; columns are named table.column."""
+    rows = iter_join(*_join_sides(metadata, query), query.where)
+    if query.is_aggregate:
+        columns = [item_label(item) for item in query.items]
+        rows = aggregate_rows(rows, query.items, query.group_by)
+    else:
+        columns = [column for _, column in query.items] or list(join_schema(metadata, query.table, query.join.table))
+    stop = None if query.limit is None else query.offset + query.limit
+    return columns, islice(rows, query.offset, stop)
+
+
+def _iter_select_rows(metadata, query):
+    """Return (columns, rows) of a parsed select; rows is lazy for plain selects."""
+    if query.join is not None:
+        return _iter_join_rows(metadata, query)
+    table_name = query.table
+    stats = get_table_stats(metadata, table_name)
+    if query.is_aggregate:
+        columns = [item_label(item) for item in query.items]
+        if query.items == [(AGG_COUNT, ALL_COLUMNS)] and query.where is None and query.group_by is None:
+            row_count = get_row_count(metadata, table_name)
+            if row_count is not None:
+                return columns, iter([{columns[0]: row_count}])
+        table_data = _table_pool.get_table(table_name)
+        indexes = _table_pool.get_indexes(table_name)
+        rows = aggregate(table_data, query.items, query.where, query.group_by, indexes, stats)
+        stop = None if query.limit is None else query.offset + query.limit
+        return columns, islice(rows or [], query.offset, stop)
+
+    columns = [column for _, column in query.items] or None
+    table_data = _table_pool.get_table(table_name)
+    indexes = _table_pool.get_indexes(table_name)
+    rows = iter_select(
+        table_data, query.where, _table_pool.cache_key(table_name), indexes, query.limit, query.offset, stats, columns
+    )
+    return columns or list(metadata[table_name]), rows
+
+
+@handle_db_errors
+def select_rows(raw_command):
+    """Run a select command for a program rather than a terminal.
+
+    Returns (columns, rows) where rows lazily yields records, or None if the
+    command reported an error. An into clause is ignored. execute of a
+    prepared select is accepted too.
+    """
+    metadata = _table_pool.get_metadata()
+    query = _get_statement(metadata, raw_command)
+    if isinstance(query, ExecuteStatement):
+        query = _bind_prepared(metadata, query)
+    if query is None:
+        return None
+    if not isinstance(query, SelectQuery):
+        report_error("Некорректное значение: select. Попробуйте снова.")
+        return None
+    return _iter_select_rows(metadata, query)
+
+
+@handle_db_errors
+def _run_select(metadata, query):
+    if query.into and not _file_access_allowed(query.into):
+        return
+    errors = get_error_count()
+    columns, rows = _iter_select_rows(metadata, query)
+    if get_error_count() != errors:
+        return
+    if query.into:
+        try:
+            count = write_rows(query.into, columns, rows)
+        except ValueError as error:
+            report_error(error)
+            return
+        except OSError as error:
+            report_error(f"Ошибка записи в файл {query.into}: {error}")
+            return
+        print(f"Выгружено записей: {count} в файл {query.into}.")
         return
 
-    lower_rest = rest.lower()
-    where_keyword = " where "
-    where_index = lower_rest.find(where_keyword)
-    if where_index == -1:
-        table_name = rest.strip()
-        where_clause = None
+    if not _print_rows_paged(dict.fromkeys(columns), rows):
+        print("Записи по условию не найдены.")
+
+
+def _check_update(schema, statement):
+    if RESERVED_ID_NAME in statement.assignments:
+        report_error(f"Изменение столбца {RESERVED_ID_NAME} запрещено.")
+        return False
+    return _validate_clause(schema, statement.assignments) and _validate_where(schema, statement.where)
+
+
+@handle_db_errors
+def _run_update(metadata, statement):
+    table_name = statement.table
+    changed_ids = _database.table(table_name).update(statement.assignments, statement.where)
+    if not changed_ids:
+        print("Записи по условию не найдены.")
+    elif len(changed_ids) == 1:
+        print(f"Запись с {RESERVED_ID_NAME}={changed_ids[0]} в таблице \"{table_name}\" успешно обновлена.")
     else:
-        table_name = rest[:where_index].strip()
-        where_raw = rest[where_index + len(where_keyword):].strip()
-        where_clause = parse_where_clause(where_raw)
-        if not where_clause:
-            print("Некорректное значение: условие. Попробуйте снова.")
-            return
+        joined = ", ".join(str(item) for item in changed_ids)
+        print(f"Записи с {RESERVED_ID_NAME}={joined} в таблице \"{table_name}\" успешно обновлены.")
+
+
+def _check_delete(schema, statement):
+    return _validate_where(schema, statement.where)
+
+
+@handle_db_errors
+@confirm_action("удаление записей")
+def _run_delete(metadata, statement):
+    table_name = statement.table
+    deleted_ids = _database.table(table_name).delete(statement.where)
+    if not deleted_ids:
+        print("Записи по условию не найдены.")
+    elif len(deleted_ids) == 1:
+        print(f"Запись с {RESERVED_ID_NAME}={deleted_ids[0]} успешно удалена из таблицы \"{table_name}\".")
+    else:
+        joined = ", ".join(str(item) for item in deleted_ids)
+        print(f"Записи с {RESERVED_ID_NAME}={joined} успешно удалены из таблицы \"{table_name}\".")
 
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица \"{table_name}\" не существует.")
+
+def _handle_info(metadata, raw_command):
+    parts = raw_command.split()
+    if len(parts) != 2:
+        report_error("Некорректное значение: имя_таблицы. Попробуйте снова.")
         return
 
-    schema = metadata[table_name]
-    if where_clause and not _validate_clause(schema, where_clause):
+    table_name = parts[1]
+    if not table_exists(metadata, table_name):
+        report_error(f"Ошибка: Таблица \"{table_name}\" не существует.")
         return
 
-    table_data = load_table_data(table_name)
-    rows = select(table_data, where_clause, table_name)
-    if not rows:
-        print("Записи по условию не найдены.")
+    schema = metadata[table_name]
+    row_count = get_row_count(metadata, table_name)
+    if row_count is None:
+        row_count = len(_table_pool.get_table(table_name))
+    columns_desc = ", ".join(f"{name}:{value}" for name, value in schema.items())
+    print(f"Таблица: {table_name}")
+    print(f"Столбцы: {columns_desc}")
+    print(f"Количество записей: {row_count}")
+    indexes = get_table_info(metadata, table_name).get("indexes", {})
+    indexes_desc = ", ".join(f"{column} ({kind})" for column, kind in indexes.items()) or "нет"
+    print(f"Индексы: {indexes_desc}")
+    print(f"Формат в памяти: {get_table_info(metadata, table_name).get('layout', LAYOUT_ROWS)}")
+    print(f"Формат на диске: {get_table_info(metadata, table_name).get('storage', STORAGE_JSON)}")
+    if "segments" in get_table_info(metadata, table_name):
+        print(f"Сегментов: {len(get_table_info(metadata, table_name)['segments'])}")
+    if "dropped" in get_table_info(metadata, table_name):
+        dropped = ", ".join(get_table_info(metadata, table_name)["dropped"])
+        print(f"Удаленные столбцы (хранятся в файлах до compact): {dropped}")
+
+
+@handle_db_errors
+def _handle_analyze(metadata, args):
+    if len(args) != 2:
+        report_error("Некорректное значение: имя_таблицы. Попробуйте снова.")
+        return
+    table_name = args[1]
+    if not table_exists(metadata, table_name):
+        report_error(f"Ошибка: Таблица \"{table_name}\" не существует.")
         return
+    row_count = _database.analyze(table_name)
+    print(f"Статистика таблицы \"{table_name}\" обновлена: записей {row_count}.")
 
-    _print_table(schema, rows)
 
+def _describe_access(plan):
+    if plan.access == ACCESS_INDEX_LOOKUP:
+        return f"{plan.access} (индекс {plan.index_kind} по столбцу {plan.column}: {format_expression(plan.node)})"
+    if plan.node is not None:
+        return f"{plan.access} ({format_expression(plan.node)})"
+    return plan.access
 
-def _handle_update(metadata, raw_command):
-    lower_command = raw_command.lower()
-    if not lower_command.startswith("update "):
-        print("Некорректное значение: update. Попробуйте снова.")
-        return
 
-    content = raw_command[len("update "):]
-    lower_content = lower_command[len("update "):]
+def _check_explain(schema, statement):
+    return _check_select(schema, statement.query)
+
 
-    set_keyword = " set "
-    where_keyword = " where "
-    set_index = lower_content.find(set_keyword)
-    if set_index == -1:
-        print("Некорректное значение: set. Попробуйте снова.")
+def _explain_join(metadata, query):
+    sides = _join_sides(metadata, query)
+    plan, result, duration = explain_join(*sides, query.where)
+    build, probe = sides[plan.build], sides[plan.probe]
+    if plan.strategy == JOIN_INDEX:
+        if build.column == RESERVED_ID_NAME:
+            lookup = f"поиск по {RESERVED_ID_NAME}"
+        else:
+            lookup = f"индекс {build.indexes[build.column].kind}"
+        print(f"Соединение: {plan.strategy} ({lookup} по {build.name}.{build.column}, просмотр {probe.name})")
+    else:
+        print(f"Соединение: {plan.strategy} (хеш-таблица по {build.name}.{build.column}, просмотр {probe.name})")
+    for number, side in enumerate(sides):
+        if plan.where[number] is not None:
+            print(f"Условие для {side.name}: {format_expression(plan.where[number])}")
+        if plan.strategy != JOIN_INDEX or number == plan.probe:
+            side_plan = plan.plans[number]
+            print(f"Доступ к {side.name}: {_describe_access(side_plan)}, оценка строк {side_plan.result_rows:.0f}")
+    if plan.where[2] is not None:
+        print(f"Условие после соединения: {format_expression(plan.where[2])}")
+    print(f"Стоимость: {plan.cost:.1f}")
+    print(f"Фактически строк: результат {result}")
+    print(f"Время выполнения: {duration:.3f} секунд.")
+
+
+@handle_db_errors
+def _run_explain(metadata, statement):
+    query = statement.query
+    if query.join is not None:
+        _explain_join(metadata, query)
         return
+    table_name, where_clause = query.table, query.where
+    table_data = _table_pool.get_table(table_name)
+    indexes = _table_pool.get_indexes(table_name)
+    stats = get_table_stats(metadata, table_name)
+    plan, fetched, result, duration = explain_select(table_data, where_clause, indexes, stats)
+
+    print(f"Доступ: {_describe_access(plan)}")
+    if where_clause:
+        print(f"Условие: {format_expression(normalize(where_clause))}")
+    print(f"Стоимость: {plan.cost:.1f} (полный просмотр: {plan.scan_cost:.1f})")
+    print(f"Статистика: {'есть' if stats is not None else 'нет, оценки по умолчанию (выполните analyze)'}")
+    print(f"Оценка строк: прочитано {plan.access_rows:.0f}, результат {plan.result_rows:.0f}")
+    print(f"Фактически строк: прочитано {fetched}, результат {result}")
+    if isinstance(table_data, SegmentedTable) and plan.access == ACCESS_FULL_SCAN:
+        read = len(table_data.matching_segments(normalize(where_clause)))
+        print(f"Сегментов прочитано: {read} из {table_data.segment_count}")
+    print(f"Время выполнения: {duration:.3f} секунд.")
+
+
+_STATEMENT_HANDLERS = {
+    SelectQuery: (_check_select, _run_select),
+    InsertStatement: (_check_insert, _run_insert),
+    UpdateStatement: (_check_update, _run_update),
+    DeleteStatement: (_check_delete, _run_delete),
+    ExplainStatement: (_check_explain, _run_explain),
+}
+
+
+def _statement_key(text):
+    """Cache key of a command: whitespace is collapsed unless it may be inside a string."""
+    return (text if '"' in text else " ".join(text.split()),)
+
+
+def _statement_tables(statement):
+    query = statement.query if isinstance(statement, ExplainStatement) else statement
+    if isinstance(query, SelectQuery) and query.join is not None:
+        return [query.table, query.join.table]
+    return [statement.table]
+
+
+def _statement_schema(metadata, statement):
+    """Return the schema a statement is checked against, or None if a table is missing.
+
+    A select with join is checked against the columns of both tables named
+    table.column.
+    """
+    tables = _statement_tables(statement)
+    if not all(table_exists(metadata, table_name) for table_name in tables):
+        return None
+    if len(tables) == 1:
+        return metadata[tables[0]]
+    return join_schema(metadata, *tables)
+
+
+def _tables_exist(metadata, statement):
+    for table_name in _statement_tables(statement):
+        if not table_exists(metadata, table_name):
+            report_error(f"Ошибка: Таблица \"{table_name}\" не существует.")
+            return False
+    return True
 
-    table_name = content[:set_index].strip()
-    after_set = content[set_index + len(set_keyword):]
-    lower_after_set = lower_content[set_index + len(set_keyword):]
 
-    where_index = lower_after_set.find(where_keyword)
-    if where_index == -1:
-        print("Некорректное значение: where. Попробуйте снова.")
+def _check_statement(metadata, statement):
+    if not _tables_exist(metadata, statement):
+        return False
+    check, _ = _STATEMENT_HANDLERS[type(statement)]
+    return check(_statement_schema(metadata, statement), statement)
+
+
+def _get_statement(metadata, text):
+    """Parse and validate a data statement, reusing the cached result for a repeated text.
+
+    A cached statement is reused while its tables have the schema it was
+    validated against. Inserts carry their data and are not cached. Returns
+    None after printing an error.
+    """
+    key = _statement_key(text)
+    cached = _statement_cache.get(key)
+    if cached is not None:
+        statement, schema = cached
+        if _statement_schema(metadata, statement) == schema:
+            return statement
+    try:
+        statement = parse_statement(text)
+    except ValueError as error:
+        report_error(f"Некорректное значение: {error}. Попробуйте снова.")
+        return None
+    if isinstance(statement, (PrepareStatement, ExecuteStatement)):
+        return statement
+    if not _check_statement(metadata, statement):
+        return None
+    if not isinstance(statement, InsertStatement):
+        _statement_cache.put(key, (statement, dict(_statement_schema(metadata, statement))))
+    return statement
+
+
+def _prepare_statement(metadata, statement, parameter_count):
+    """Validate a statement with parameters once. Returns (statement, types, schema) or None.
+
+    Every parameter gets the type of the column it is compared with or
+    assigned to; the statement is validated with stand-in values of those
+    types, so executing it only has to check the types of the values.
+    """
+    if not _tables_exist(metadata, statement):
+        return None
+    schema = _statement_schema(metadata, statement)
+    types = [None] * parameter_count
+    for column, parameter in statement.parameters(schema):
+        types[parameter.index] = schema.get(column)
+    if not _check_statement(metadata, statement.bind([_SAMPLE_VALUES.get(kind) for kind in types])):
+        return None
+    if None in types:
+        report_error("Некорректное значение: ?. Попробуйте снова.")
+        return None
+    return statement, types, dict(schema)
+
+
+def _handle_prepare(metadata, statement):
+    prepared = _prepare_statement(metadata, statement.statement, statement.parameter_count)
+    if prepared is None:
         return
+    _current_session.get().prepared[statement.name] = prepared
+    print(f"Команда \"{statement.name}\" подготовлена, параметров: {statement.parameter_count}.")
+
+
+def _bind_prepared(metadata, statement):
+    """Bind the values of an execute to its prepared statement of this session. Returns it or None."""
+    prepared_statements = _current_session.get().prepared
+    prepared = prepared_statements.get(statement.name)
+    if prepared is None:
+        report_error(f"Ошибка: Подготовленная команда \"{statement.name}\" не найдена.")
+        return None
+    prepared_statement, types, schema = prepared
+    if _statement_schema(metadata, prepared_statement) != schema:
+        # The table changed since prepare: validate against the current schema.
+        prepared = _prepare_statement(metadata, prepared_statement, len(types))
+        if prepared is None:
+            return None
+        prepared_statements[statement.name] = prepared
+        prepared_statement, types, schema = prepared
+    values = statement.values
+    if len(values) != len(types):
+        report_error(f"Некорректное количество параметров. Ожидалось {len(types)}, передано {len(values)}.")
+        return None
+    for number, (value, expected_type) in enumerate(zip(values, types), start=1):
+        if not _value_matches_type(value, expected_type) or (isinstance(value, bool) and expected_type != TYPE_BOOL):
+            report_error(f"Некорректный тип параметра {number}. Ожидался {expected_type}.")
+            return None
+    return prepared_statement.bind(values)
+
+
+def _handle_execute(metadata, statement):
+    bound = _bind_prepared(metadata, statement)
+    if bound is not None:
+        _STATEMENT_HANDLERS[type(bound)][1](metadata, bound)
+
+
+def _run_statement(metadata, text):
+    statement = _get_statement(metadata, text)
+    if statement is None:
+        return
+    if isinstance(statement, PrepareStatement):
+        _handle_prepare(metadata, statement)
+    elif isinstance(statement, ExecuteStatement):
+        _handle_execute(metadata, statement)
+    else:
+        _STATEMENT_HANDLERS[type(statement)][1](metadata, statement)
 
-    set_raw = after_set[:where_index].strip()
-    where_raw = after_set[where_index + len(where_keyword):].strip()
 
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица \"{table_name}\" не существует.")
+@handle_db_errors
+def _handle_compact(metadata, args):
+    if len(args) != 2:
+        report_error("Некорректное значение: имя_таблицы. Попробуйте снова.")
         return
 
-    schema = metadata[table_name]
-    set_clause = parse_set_clause(set_raw)
-    if RESERVED_ID_NAME in set_clause:
-        print(f"Изменение столбца {RESERVED_ID_NAME} запрещено.")
+    table_name = args[1]
+    if not table_exists(metadata, table_name):
+        report_error(f"Ошибка: Таблица \"{table_name}\" не существует.")
         return
 
-    if not _validate_clause(schema, set_clause):
-        return
+    row_count = _database.compact(table_name)
+    print(f"Таблица \"{table_name}\" сжата, записей: {row_count}.")
 
-    where_clause = parse_where_clause(where_raw)
-    if not where_clause:
-        print("Некорректное значение: условие. Попробуйте снова.")
-        return
 
-    if not _validate_clause(schema, where_clause):
-        return
+@handle_db_errors
+def _create_table(table_name, columns):
+    schema = _database.create_table(table_name, columns).schema
+    columns_desc = ", ".join(f"{name}:{column_type}" for name, column_type in schema.items())
+    print(f"Таблица \"{table_name}\" успешно создана со столбцами: {columns_desc}")
 
-    table_data = load_table_data(table_name)
-    before_snapshot = [dict(record) for record in table_data]
-    updated_data = update(table_data, set_clause, where_clause, table_name)
-    if updated_data is None:
-        return
-    if before_snapshot != updated_data:
-        save_table_data(table_name, updated_data)
 
+@handle_db_errors
+@confirm_action("удаление таблицы")
+def _drop_table(table_name):
+    _database.drop_table(table_name)
+    print(f"Таблица \"{table_name}\" успешно удалена.")
 
-def _handle_delete(metadata, raw_command):
-    lower_command = raw_command.lower()
-    if not lower_command.startswith("delete from "):
-        print("Некорректное значение: delete. Попробуйте снова.")
-        return
 
-    rest = raw_command[len("delete from "):]
-    lower_rest = lower_command[len("delete from "):]
-    where_keyword = " where "
-    where_index = lower_rest.find(where_keyword)
-    if where_index == -1:
-        print("Некорректное значение: where. Попробуйте снова.")
-        return
+@handle_db_errors
+def _create_index(table_name, column, kind=INDEX_HASH):
+    _database.create_index(table_name, column, kind)
+    print(f"Индекс {kind} по столбцу {column} в таблице \"{table_name}\" успешно создан.")
 
-    table_name = rest[:where_index].strip()
-    where_raw = rest[where_index + len(where_keyword):].strip()
 
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица \"{table_name}\" не существует.")
-        return
+@handle_db_errors
+def _drop_index(table_name, column):
+    _database.drop_index(table_name, column)
+    print(f"Индекс по столбцу {column} в таблице \"{table_name}\" успешно удален.")
 
-    schema = metadata[table_name]
-    where_clause = parse_where_clause(where_raw)
-    if not where_clause:
-        print("Некорректное значение: условие. Попробуйте снова.")
-        return
 
-    if not _validate_clause(schema, where_clause):
+@handle_db_errors
+def _set_layout(table_name, layout):
+    _database.set_layout(table_name, layout)
+    print(f"Таблица \"{table_name}\" хранится в памяти в формате {layout}.")
+
+
+@handle_db_errors
+def _convert_table(table_name, storage):
+    _database.convert_table(table_name, storage)
+    print(f"Таблица \"{table_name}\" преобразована в формат {storage}.")
+
+
+@handle_db_errors
+def _handle_alter_table(args):
+    action = args[2].lower() if len(args) > 2 else None
+    if action == 'add' and len(args) in (4, 6) and (len(args) == 4 or args[4].lower() == 'default'):
+        table_name, column = args[1], args[3]
+        default = None
+        if len(args) == 6:
+            column_type = column.split(":", 1)[1].strip() if ":" in column else None
+            # A bad column spec is reported by add_column itself.
+            default = value_from_text(args[5], column_type) if column_type in ALLOWED_TYPES else None
+        _database.add_column(table_name, column, default)
+        name = column.split(":", 1)[0].strip()
+        print(f"Столбец {name} добавлен в таблицу \"{table_name}\".")
+        return
+    if action == 'drop' and len(args) == 4:
+        _database.drop_column(args[1], args[3])
+        print(f"Столбец {args[3]} удален из таблицы \"{args[1]}\".")
         return
+    report_error("Некорректное значение: параметры. Попробуйте снова.")
+
 
-    table_data = load_table_data(table_name)
-    before_count = len(table_data)
-    updated_data = delete(table_data, where_clause, table_name)
-    if updated_data is None:
+def _format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.3f}"
+
+
+def _print_metrics():
+    snapshot = metrics.snapshot()
+    if not snapshot["histograms"] and not snapshot["counters"]:
+        if snapshot["enabled"]:
+            print("Метрик пока нет.")
+        else:
+            print("Сбор метрик выключен. Включите его командой stats on.")
         return
-    if len(updated_data) != before_count:
-        save_table_data(table_name, updated_data)
+    table = PrettyTable()
+    table.field_names = ["Операция", "Вызовов", "p50, мс", "p95, мс", "p99, мс", "max, мс", "всего, мс"]
+    table.align["Операция"] = "l"
+    for name, summary in snapshot["histograms"].items():
+        table.add_row([
+            name,
+            summary["count"],
+            _format_ms(summary["p50"]),
+            _format_ms(summary["p95"]),
+            _format_ms(summary["p99"]),
+            _format_ms(summary["max"]),
+            _format_ms(summary["total"]),
+        ])
+    print(table)
+    for name, value in snapshot["counters"].items():
+        print(f"{name}: {value}")
 
 
-def _handle_info(metadata, raw_command):
-    parts = raw_command.split()
-    if len(parts) != 2:
-        print("Некорректное значение: имя_таблицы. Попробуйте снова.")
+def _handle_stats(args):
+    if len(args) == 1:
+        _print_metrics()
+        return
+    action = args[1].lower()
+    if action in ("on", "off") and len(args) == 2:
+        metrics.enable(action == "on")
+        print(f"Сбор метрик {'включен' if action == 'on' else 'выключен'}.")
+        return
+    if action == "reset" and len(args) == 2:
+        metrics.reset()
+        print("Метрики сброшены.")
+        return
+    if action == "export" and len(args) == 3:
+        if not _file_access_allowed(args[2]):
+            return
+        try:
+            with open(args[2], "w", encoding="utf-8") as f:
+                json.dump(metrics.snapshot(), f, ensure_ascii=False, indent=2)
+        except OSError as error:
+            report_error(f"Ошибка записи в файл {args[2]}: {error}")
+            return
+        print(f"Метрики выгружены в файл {args[2]}.")
         return
+    report_error("Некорректное значение: параметры. Попробуйте снова.")
 
-    table_name = parts[1]
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица \"{table_name}\" не существует.")
+
+def _handle_profile(raw_command):
+    command = raw_command[len("profile "):].strip()
+    if not command:
+        report_error("Некорректное значение: команда. Попробуйте снова.")
         return
+    _, report = metrics.profile(execute_command, command)
+    print(f"Профиль команды \"{command}\":")
+    print(report.rstrip())
+
+
+def _handle_cache_stats():
+    stats = get_select_cache_info()
+    print(f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, вытеснений: {stats['evictions']}")
+    print(f"Записей в кэше: {stats['entries']}, строк: {stats['rows']}")
+    statements = _statement_cache.info()
+    print(
+        f"Кэш разобранных команд: попаданий {statements['hits']}, промахов {statements['misses']}, "
+        f"записей {statements['entries']}, подготовленных команд {len(_current_session.get().prepared)}"
+    )
+
+
+def _handle_transaction(command):
+    if command == 'begin':
+        if _table_pool.in_transaction:
+            report_error("Транзакция уже начата.")
+            return
+        _database.begin()
+        print("Транзакция начата. Изменения будут записаны командой commit.")
+        return
+    if not _table_pool.in_transaction:
+        report_error("Нет активной транзакции.")
+        return
+    if command == 'rollback':
+        _database.rollback()
+        print("Транзакция отменена.")
+        return
+    start = time.monotonic()
+    tables, changes = _database.commit()
+    duration = time.monotonic() - start
+    print(f"Транзакция зафиксирована: таблиц {tables}, изменений {changes}, время: {duration:.3f} секунд.")
 
-    schema = metadata[table_name]
-    table_data = load_table_data(table_name)
-    columns_desc = ", ".join(f"{name}:{value}" for name, value in schema.items())
-    print(f"Таблица: {table_name}")
-    print(f"Столбцы: {columns_desc}")
-    print(f"Количество записей: {len(table_data)}")
+
+def _refuse_in_transaction(command):
+    if _table_pool.in_transaction:
+        report_error(f"Команда {command} недоступна внутри транзакции. Выполните commit или rollback.")
+        return True
+    return False
+
+
+def recover():
+    recovered = _table_pool.recover()
+    if recovered:
+        print("Восстановлена транзакция, прерванная при записи.")
+    elif recovered is False:
+        print("Отброшен незавершенный журнал транзакции.")
+
+
+def _finish_session():
+    if _table_pool.in_transaction:
+        _database.rollback()
+        print("Незафиксированная транзакция отменена.")
 
 
 def run():
     """Main REPL loop for table management."""
     print("***База данных***")
     print_help()
+    recover()
 
     while True:
-        metadata = load_metadata(META_FILEPATH)
         try:
             user_input = prompt.string('>>>Введите команду: ')
         except (EOFError, KeyboardInterrupt):
             print()
+            _finish_session()
             break
 
         user_input = user_input.strip()
@@ -297,66 +986,226 @@ def run():
             print_help()
             continue
         if lower_input == 'exit':
+            _finish_session()
             break
 
-        if lower_input.startswith('insert into '):
-            _handle_insert(metadata, user_input)
-            continue
+        execute_command(user_input)
+
+
+def execute_command(user_input):
+    """Run one command (anything but help and exit).
+
+    Results and messages are printed. Returns False if the command reported
+    an error.
+    """
+    errors_before = get_error_count()
+    name = user_input.split(maxsplit=1)[0].lower() if user_input.strip() else ""
+    if name in METRICS_COMMANDS:
+        _dispatch(_table_pool.get_metadata(), user_input)
+        return get_error_count() == errors_before
+    with metrics.command(name):
+        _dispatch(_table_pool.get_metadata(), user_input)
+    ok = get_error_count() == errors_before
+    if not ok:
+        metrics.increment(f"{name}.errors")
+    return ok
+
+
+# Output is captured per thread: while any capture is active, sys.stdout is a
+# stand-in sending the prints of a capturing thread to its own buffer.
+_captured = threading.local()
+_capture_lock = threading.Lock()
+_capture_state = {"count": 0, "stdout": None}
+
+
+class _ThreadStdout:
+    def _target(self):
+        buffer = getattr(_captured, "buffer", None)
+        return _capture_state["stdout"] if buffer is None else buffer
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(_capture_state["stdout"], name)
+
+
+_THREAD_STDOUT = _ThreadStdout()
+
+
+def capture_output(func, *args):
+    """Call func and return (result, everything it printed in this thread)."""
+    buffer = io.StringIO()
+    previous = getattr(_captured, "buffer", None)
+    with _capture_lock:
+        if not _capture_state["count"]:
+            _capture_state["stdout"] = sys.stdout
+            sys.stdout = _THREAD_STDOUT
+        _capture_state["count"] += 1
+    _captured.buffer = buffer
+    try:
+        result = func(*args)
+    finally:
+        _captured.buffer = previous
+        with _capture_lock:
+            _capture_state["count"] -= 1
+            if not _capture_state["count"]:
+                sys.stdout = _capture_state["stdout"]
+    return result, buffer.getvalue()
+
+
+def _returns_rows(command):
+    """Return True for a select, or execute of a prepared select, without into: it returns rows.
+
+    A select with into writes a file instead and runs like other commands.
+    """
+    lower = command.lower()
+    if lower.startswith("select "):
+        if "into" not in lower.split():
+            return True
+        try:
+            statement = parse_statement(command)
+        except ValueError:
+            return True
+        return not (isinstance(statement, SelectQuery) and statement.into is not None)
+    if lower.startswith("execute "):
+        try:
+            statement = parse_statement(command)
+        except ValueError:
+            return False
+        prepared = _current_session.get().prepared.get(getattr(statement, "name", None))
+        return prepared is not None and isinstance(prepared[0], SelectQuery) and prepared[0].into is None
+    return False
 
-        if lower_input.startswith('select from '):
-            _handle_select(metadata, user_input)
-            continue
 
-        if lower_input.startswith('update '):
-            _handle_update(metadata, user_input)
-            continue
+def execute_captured(command):
+    """Run one command for a program: returns a dict instead of printing.
+
+    The dict has ok and the printed output; for select and execute of a
+    prepared select it also has columns and rows (lists of values in column
+    order). A select with into writes its file and, like other commands,
+    reports only ok and output.
+    """
+    command = command.strip()
+    if _returns_rows(command):
+        name = command.split(maxsplit=1)[0].lower()
+        with metrics.command(name):
+            selected, output = capture_output(select_rows, command)
+            if selected is None:
+                metrics.increment(f"{name}.errors")
+                return {"ok": False, "output": output}
+            columns, rows = selected
+            with metrics.phase(metrics.PHASE_PREDICATE):
+                rows, more_output = capture_output(list, rows)
+        return {
+            "ok": True,
+            "output": output + more_output,
+            "columns": columns,
+            "rows": [[record.get(column) for column in columns] for record in rows],
+        }
+    ok, output = capture_output(execute_command, command)
+    return {"ok": ok, "output": output}
+
+
+def _dispatch(metadata, user_input):
+    lower_input = user_input.lower()
+    if lower_input in ('begin', 'commit', 'rollback'):
+        _handle_transaction(lower_input)
+        return
 
-        if lower_input.startswith('delete from '):
-            _handle_delete(metadata, user_input)
-            continue
+    if lower_input.split(maxsplit=1)[0] in STATEMENT_KEYWORDS:
+        _run_statement(metadata, user_input)
+        return
 
-        if lower_input.startswith('info '):
-            _handle_info(metadata, user_input)
-            continue
+    if lower_input.startswith('info '):
+        _handle_info(metadata, user_input)
+        return
 
-        try:
-            args = shlex.split(user_input)
-        except ValueError as e:
-            print(f"Некорректное значение: {e}. Попробуйте снова.")
-            continue
+    if lower_input.startswith('profile '):
+        _handle_profile(user_input)
+        return
 
-        command = args[0]
-        if command == 'list_tables':
-            for name in metadata.keys():
-                print(f"- {name}")
-            continue
+    try:
+        args = shlex.split(user_input)
+    except ValueError as e:
+        report_error(f"Некорректное значение: {e}. Попробуйте снова.")
+        return
 
-        if command == 'create_table':
-            if len(args) < 3:
-                missing = 'параметры' if len(args) == 1 else 'столбцы'
-                print(f"Некорректное значение: {missing}. Попробуйте снова.")
-                continue
-            table_name = args[1]
-            columns = args[2:]
-            before = metadata
-            after = create_table(before, table_name, columns)
-            if after is None:
-                continue
-            _save_if_changed(before, after)
-            continue
+    command = args[0]
+    if command == 'list_tables':
+        for name in get_table_names(metadata):
+            print(f"- {name}")
+        return
 
-        if command == 'drop_table':
-            if len(args) != 2:
-                bad = args[2:] if len(args) > 2 else 'имя_таблицы'
-                print(f"Некорректное значение: {bad}. Попробуйте снова.")
-                continue
-            table_name = args[1]
-            before = metadata
-            after = drop_table(before, table_name)
-            if after is None:
-                continue
-            _save_if_changed(before, after)
-            continue
+    if command == 'create_table':
+        if len(args) < 3:
+            missing = 'параметры' if len(args) == 1 else 'столбцы'
+            report_error(f"Некорректное значение: {missing}. Попробуйте снова.")
+            return
+        _create_table(args[1], args[2:])
+        return
+
+    if command in ('set_layout', 'convert_table', 'compact', 'alter_table') and _refuse_in_transaction(command):
+        return
+
+    if command == 'set_layout':
+        if len(args) != 3:
+            report_error("Некорректное значение: параметры. Попробуйте снова.")
+            return
+        _set_layout(*args[1:])
+        return
 
-        print(f"Функции {command} нет. Попробуйте снова.")
+    if command == 'convert_table':
+        if len(args) != 3:
+            report_error("Некорректное значение: параметры. Попробуйте снова.")
+            return
+        _convert_table(*args[1:])
+        return
+
+    if command == 'alter_table':
+        _handle_alter_table(args)
+        return
+
+    if command == 'import':
+        _handle_import(metadata, args)
+        return
+
+    if command == 'cache_stats':
+        _handle_cache_stats()
+        return
+
+    if command == 'stats':
+        _handle_stats(args)
+        return
+
+    if command == 'compact':
+        _handle_compact(metadata, args)
+        return
+
+    if command == 'analyze':
+        _handle_analyze(metadata, args)
+        return
+
+    if command in ('create_index', 'drop_index'):
+        max_args = 4 if command == 'create_index' else 3
+        if not 3 <= len(args) <= max_args:
+            report_error("Некорректное значение: параметры. Попробуйте снова.")
+            return
+        if command == 'create_index':
+            _create_index(*args[1:])
+        else:
+            _drop_index(*args[1:])
+        return
+
+    if command == 'drop_table':
+        if len(args) != 2:
+            bad = args[2:] if len(args) > 2 else 'имя_таблицы'
+            report_error(f"Некорректное значение: {bad}. Попробуйте снова.")
+            return
+        _drop_table(args[1])
+        return
 
+    report_error(f"Функции {command} нет. Попробуйте снова.")
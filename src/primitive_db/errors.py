@@ -0,0 +1,29 @@
+"""Exceptions raised by core and the Database API.
+
+They subclass KeyError and ValueError, so handle_db_errors keeps turning
+them into the same console messages.
+"""
+
+
+class DatabaseError(Exception):
+    """Base of the errors raised by the database."""
+
+
+class TableNotFoundError(DatabaseError, KeyError):
+    """The table does not exist; args[0] is its name."""
+
+
+class ColumnNotFoundError(DatabaseError, KeyError):
+    """The table has no such column; args[0] is its name."""
+
+
+class ValidationError(DatabaseError, ValueError):
+    """A name, type or value does not fit the schema; the message is user-facing."""
+
+
+class TableExistsError(ValidationError):
+    """A table with this name already exists."""
+
+
+class TransactionError(DatabaseError):
+    """The operation is not allowed in the current transaction state."""
@@ -0,0 +1,323 @@
+"""WHERE expressions: a small tuple-based AST, type checking and compilation.
+
+Nodes are plain hashable tuples, so an expression can be a cache key:
+
+    ("cmp", column, op, value)       op is one of =, !=, <, <=, >, >=
+    ("between", column, low, high)
+    ("in", column, (value, ...))
+    ("not", node)
+    ("and", (node, ...))
+    ("or", (node, ...))
+"""
+from functools import lru_cache
+
+from src.constants import (
+    OP_BETWEEN,
+    OP_EQ,
+    OP_GE,
+    OP_GT,
+    OP_LE,
+    OP_LT,
+    OP_NE,
+    RANGE_TYPES,
+    TYPE_BOOL,
+    TYPE_INT,
+    TYPE_STR,
+)
+
+NODE_CMP = "cmp"
+NODE_BETWEEN = "between"
+NODE_IN = "in"
+NODE_NOT = "not"
+NODE_AND = "and"
+NODE_OR = "or"
+
+_ORDER_OPERATORS = {OP_LT, OP_LE, OP_GT, OP_GE}
+_PYTHON_TYPES = {
+    TYPE_INT: int,
+    TYPE_STR: str,
+    TYPE_BOOL: bool,
+}
+
+
+def comparison(column, op, value):
+    return NODE_CMP, column, op, value
+
+
+def between(column, low, high):
+    return NODE_BETWEEN, column, low, high
+
+
+def in_list(column, values):
+    return NODE_IN, column, tuple(values)
+
+
+def negate(node):
+    return NODE_NOT, node
+
+
+def conjunction(nodes):
+    return _combine(NODE_AND, nodes)
+
+
+def disjunction(nodes):
+    return _combine(NODE_OR, nodes)
+
+
+def _combine(kind, nodes):
+    flat = []
+    for node in nodes:
+        if node[0] == kind:
+            flat.extend(node[1])
+        else:
+            flat.append(node)
+    if len(flat) == 1:
+        return flat[0]
+    return kind, tuple(flat)
+
+
+def from_dict(where_clause):
+    """Convert the legacy {column: value | (op, value)} form into an expression."""
+    nodes = []
+    for column, expected in where_clause.items():
+        if not isinstance(expected, tuple):
+            nodes.append(comparison(column, OP_EQ, expected))
+        elif expected[0] == OP_BETWEEN:
+            nodes.append(between(column, *expected[1]))
+        else:
+            nodes.append(comparison(column, *expected))
+    return conjunction(nodes) if nodes else None
+
+
+def normalize(where):
+    """Return an expression in canonical form (AND/OR children sorted), or None."""
+    if not where:
+        return None
+    if isinstance(where, dict):
+        where = from_dict(where)
+    return _normalize(where)
+
+
+def _normalize(node):
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        children = sorted((_normalize(child) for child in node[1]), key=repr)
+        return _combine(kind, children)
+    if kind == NODE_NOT:
+        return negate(_normalize(node[1]))
+    if kind == NODE_IN:
+        return in_list(node[1], sorted(set(node[2]), key=repr))
+    return node
+
+
+def iter_columns(node):
+    """Yield every column referenced by an expression."""
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        for child in node[1]:
+            yield from iter_columns(child)
+    elif kind == NODE_NOT:
+        yield from iter_columns(node[1])
+    else:
+        yield node[1]
+
+
+def iter_column_values(node):
+    """Yield (column, value) for every value in an expression."""
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        for child in node[1]:
+            yield from iter_column_values(child)
+    elif kind == NODE_NOT:
+        yield from iter_column_values(node[1])
+    elif kind == NODE_IN:
+        for value in node[2]:
+            yield node[1], value
+    elif kind == NODE_BETWEEN:
+        yield node[1], node[2]
+        yield node[1], node[3]
+    else:
+        yield node[1], node[3]
+
+
+def map_values(node, func):
+    """Return a copy of an expression with func applied to every value (binds parameters)."""
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        return kind, tuple(map_values(child, func) for child in node[1])
+    if kind == NODE_NOT:
+        return negate(map_values(node[1], func))
+    if kind == NODE_IN:
+        return in_list(node[1], [func(value) for value in node[2]])
+    if kind == NODE_BETWEEN:
+        return between(node[1], func(node[2]), func(node[3]))
+    return comparison(node[1], node[2], func(node[3]))
+
+
+def map_columns(node, func):
+    """Return a copy of an expression with func applied to every column name."""
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        return kind, tuple(map_columns(child, func) for child in node[1])
+    if kind == NODE_NOT:
+        return negate(map_columns(node[1], func))
+    return (kind, func(node[1]), *node[2:])
+
+
+def check_expression(node, schema):
+    """Type-check an expression against a table schema.
+
+    Returns None if it is valid, otherwise a user-facing error message.
+    """
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        for child in node[1]:
+            error = check_expression(child, schema)
+            if error:
+                return error
+        return None
+    if kind == NODE_NOT:
+        return check_expression(node[1], schema)
+
+    column = node[1]
+    if column not in schema:
+        return f"Некорректное значение: {column}. Попробуйте снова."
+    expected_type = schema[column]
+    if kind == NODE_CMP:
+        op, values = node[2], [node[3]]
+    elif kind == NODE_BETWEEN:
+        op, values = OP_BETWEEN, [node[2], node[3]]
+    else:
+        op, values = OP_EQ, list(node[2])
+    if (op in _ORDER_OPERATORS or op == OP_BETWEEN) and expected_type not in RANGE_TYPES:
+        return f"Оператор {op} не поддерживается для типа {expected_type}."
+    python_type = _PYTHON_TYPES.get(expected_type)
+    for value in values:
+        if type(value) is not python_type:
+            return f"Некорректный тип для столбца {column}. Ожидался {expected_type}."
+    return None
+
+
+def as_condition(node):
+    """Translate a single-column node into the (op, value) form indexes accept.
+
+    Returns None for nodes that an index can't answer directly.
+    """
+    kind = node[0]
+    if kind == NODE_BETWEEN:
+        return OP_BETWEEN, (node[2], node[3])
+    if kind == NODE_CMP and node[2] == OP_EQ:
+        return node[3]
+    if kind == NODE_CMP and node[2] in _ORDER_OPERATORS:
+        return node[2], node[3]
+    return None
+
+
+def conjuncts(node):
+    """Return nodes that must all hold: the children of a top-level AND."""
+    if node[0] == NODE_AND:
+        return node[1]
+    return (node,)
+
+
+def may_match(node, minimums, maximums):
+    """Return False if no row with values inside the given bounds can satisfy an expression.
+
+    minimums and maximums map columns to the least and greatest value of a
+    set of rows (a table segment). A column without bounds may hold any
+    value or None, so it never rules a match out; neither does NOT.
+    """
+    kind = node[0]
+    if kind == NODE_AND:
+        return all(may_match(child, minimums, maximums) for child in node[1])
+    if kind == NODE_OR:
+        return any(may_match(child, minimums, maximums) for child in node[1])
+    if kind == NODE_NOT or node[1] not in minimums:
+        return True
+
+    low, high = minimums[node[1]], maximums[node[1]]
+    if kind == NODE_IN:
+        return any(low <= value <= high for value in node[2])
+    if kind == NODE_BETWEEN:
+        return node[2] <= high and low <= node[3]
+    op, value = node[2], node[3]
+    if op == OP_EQ:
+        return low <= value <= high
+    if op == OP_NE:
+        return not low == high == value
+    if op == OP_LT:
+        return low < value
+    if op == OP_LE:
+        return low <= value
+    if op == OP_GT:
+        return high > value
+    return high >= value
+
+
+@lru_cache(maxsize=256)
+def compile_predicate(node, row_class=None):
+    """Compile an expression into one Python function of a record.
+
+    The expression is turned into Python source once and evaluated into a
+    lambda; values are bound as constants, so per-row evaluation is just the
+    generated comparisons. With a row class (see rows.py) the predicate
+    reads the slots of such rows directly instead of calling get().
+    """
+    constants = {}
+    source = _to_source(node, constants, row_class)
+    return eval(f"lambda r: {source}", {"__builtins__": {}, **constants})
+
+
+def _bind(value, constants):
+    name = f"v{len(constants)}"
+    constants[name] = value
+    return name
+
+
+def _to_source(node, constants, row_class=None):
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        return f" {kind} ".join(f"({_to_source(child, constants, row_class)})" for child in node[1])
+    if kind == NODE_NOT:
+        return f"not ({_to_source(node[1], constants, row_class)})"
+
+    if row_class is not None and node[1] in row_class.fields:
+        field = f"r.{row_class.fields[node[1]]}"
+    else:
+        field = f"r.get({node[1]!r})"
+    if kind == NODE_IN:
+        return f"{field} in {_bind(frozenset(node[2]), constants)}"
+    if kind == NODE_BETWEEN:
+        low, high = _bind(node[2], constants), _bind(node[3], constants)
+        return f"({field} is not None and {low} <= {field} <= {high})"
+    op, value = node[2], _bind(node[3], constants)
+    if op == OP_EQ:
+        return f"{field} == {value}"
+    if op == OP_NE:
+        return f"{field} != {value}"
+    return f"({field} is not None and {field} {op} {value})"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return f"\"{value}\""
+    return str(value)
+
+
+def format_expression(node):
+    """Render an expression back in the REPL WHERE syntax."""
+    kind = node[0]
+    if kind in (NODE_AND, NODE_OR):
+        return f" {kind} ".join(
+            f"({format_expression(child)})" if child[0] in (NODE_AND, NODE_OR) else format_expression(child)
+            for child in node[1]
+        )
+    if kind == NODE_NOT:
+        return f"not ({format_expression(node[1])})"
+    if kind == NODE_IN:
+        return f"{node[1]} in ({', '.join(_format_value(value) for value in node[2])})"
+    if kind == NODE_BETWEEN:
+        return f"{node[1]} between {_format_value(node[2])} and {_format_value(node[3])}"
+    return f"{node[1]} {node[2]} {_format_value(node[3])}"
@@ -0,0 +1,249 @@
+from bisect import bisect_left, insort
+
+from src.constants import INDEX_HASH, INDEX_SORTED, OP_BETWEEN, OP_GE, OP_GT, OP_LE, OP_LT, RESERVED_ID_NAME
+from src.primitive_db.rows import value_getter
+
+# Sorts after every (value, ID) entry with the same value: (value,) sorts before all of them.
+_AFTER_IDS = float("inf")
+# Up to this many entries are inserted or removed one by one (each shifts the array once);
+# larger batches rebuild it in one pass, which costs about as much as this many shifts.
+_SINGLE_CHANGES_MAX = 1000
+
+
+class HashIndex:
+    """Secondary index mapping a column value to the IDs of matching records."""
+
+    kind = INDEX_HASH
+
+    def __init__(self, column):
+        self.column = column
+        self._buckets = {}
+
+    def build(self, records):
+        self._buckets = {}
+        for record in records:
+            self.add(record)
+        return self
+
+    def add(self, record):
+        self._buckets.setdefault(record.get(self.column), []).append(record[RESERVED_ID_NAME])
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def remove(self, record):
+        value = record.get(self.column)
+        ids = self._buckets.get(value)
+        if not ids:
+            return
+        try:
+            ids.remove(record[RESERVED_ID_NAME])
+        except ValueError:
+            return
+        if not ids:
+            del self._buckets[value]
+
+    def remove_many(self, records):
+        for record in records:
+            self.remove(record)
+
+    def lookup(self, value):
+        return list(self._buckets.get(value, ()))
+
+    def lookup_condition(self, expected):
+        """Return IDs for a WHERE condition or None if the index can't answer it."""
+        if isinstance(expected, tuple):
+            return None
+        return self.lookup(expected)
+
+
+class SortedIndex:
+    """Ordered index: a sorted array of (value, ID) searched with binary search."""
+
+    kind = INDEX_SORTED
+
+    def __init__(self, column):
+        self.column = column
+        self._entries = []
+
+    def build(self, records):
+        self._entries = sorted(self._entries_of(records))
+        return self
+
+    def _entries_of(self, records):
+        column = self.column
+        return [(record[column], record[RESERVED_ID_NAME]) for record in records if record.get(column) is not None]
+
+    def add(self, record):
+        value = record.get(self.column)
+        if value is not None:
+            insort(self._entries, (value, record[RESERVED_ID_NAME]))
+
+    def add_many(self, records):
+        """Add records in one batch: a large batch is appended and the array sorted once.
+
+        Inserting one entry at a time shifts the whole array each time, so a
+        bulk load would take quadratic time.
+        """
+        entries = self._entries_of(records)
+        if len(entries) <= _SINGLE_CHANGES_MAX:
+            for entry in entries:
+                insort(self._entries, entry)
+            return
+        self._entries.extend(entries)
+        self._entries.sort()
+
+    def _remove_entry(self, entry):
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def remove(self, record):
+        value = record.get(self.column)
+        if value is not None:
+            self._remove_entry((value, record[RESERVED_ID_NAME]))
+
+    def remove_many(self, records):
+        """Remove records in one batch: a large batch is filtered out in a single pass."""
+        entries = self._entries_of(records)
+        if len(entries) <= _SINGLE_CHANGES_MAX:
+            for entry in entries:
+                self._remove_entry(entry)
+            return
+        removed = set(entries)
+        self._entries = [entry for entry in self._entries if entry not in removed]
+
+    def range(self, low=None, high=None, include_low=True, include_high=True):
+        """Return IDs whose value lies between low and high (None means unbounded).
+
+        Bounds are searched as (value,) and (value, inf) entries, which sort
+        before and after every entry holding that value.
+        """
+        entries = self._entries
+        if low is None:
+            start = 0
+        elif include_low:
+            start = bisect_left(entries, (low,))
+        else:
+            start = bisect_left(entries, (low, _AFTER_IDS))
+        if high is None:
+            stop = len(entries)
+        elif include_high:
+            stop = bisect_left(entries, (high, _AFTER_IDS))
+        else:
+            stop = bisect_left(entries, (high,))
+        return [record_id for _, record_id in entries[start:stop]]
+
+    def lookup(self, value):
+        return self.range(value, value)
+
+    def lookup_condition(self, expected):
+        if not isinstance(expected, tuple):
+            return self.lookup(expected)
+        op, operand = expected
+        if op == OP_BETWEEN:
+            return self.range(operand[0], operand[1])
+        if op == OP_LT:
+            return self.range(high=operand, include_high=False)
+        if op == OP_LE:
+            return self.range(high=operand)
+        if op == OP_GT:
+            return self.range(low=operand, include_low=False)
+        if op == OP_GE:
+            return self.range(low=operand)
+        return None
+
+    def min(self):
+        return self._entries[0][0] if self._entries else None
+
+    def max(self):
+        return self._entries[-1][0] if self._entries else None
+
+
+INDEX_TYPES = {
+    INDEX_HASH: HashIndex,
+    INDEX_SORTED: SortedIndex,
+}
+
+
+def build_index(kind, column, records):
+    return INDEX_TYPES[kind](column).build(records)
+
+
+def search_id(records, record_id, right=False):
+    """Binary-search records sorted by ID like bisect_left (bisect_right with right).
+
+    bisect only takes key= from Python 3.10 on, so the search is spelled out.
+    """
+    get_id = value_getter(records, RESERVED_ID_NAME)
+    low, high = 0, len(records)
+    if right:
+        while low < high:
+            middle = (low + high) // 2
+            if record_id < get_id(records[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+    while low < high:
+        middle = (low + high) // 2
+        if get_id(records[middle]) < record_id:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def find_position(records, record_id):
+    """Return the position of record_id in records sorted by ID, or -1."""
+    if hasattr(records, "position_of"):
+        return records.position_of(record_id)
+    position = search_id(records, record_id)
+    if position < len(records) and records[position][RESERVED_ID_NAME] == record_id:
+        return position
+    return -1
+
+
+def _bisect_id(records, record_id, right=False):
+    if hasattr(records, "bisect_id"):
+        return records.bisect_id(record_id, right)
+    return search_id(records, record_id, right)
+
+
+def find_id_range(records, expected):
+    """Return positions of records whose ID satisfies a range condition."""
+    op, operand = expected
+    start, stop = 0, len(records)
+    if op == OP_BETWEEN:
+        start = _bisect_id(records, operand[0])
+        stop = _bisect_id(records, operand[1], right=True)
+    elif op == OP_LT:
+        stop = _bisect_id(records, operand)
+    elif op == OP_LE:
+        stop = _bisect_id(records, operand, right=True)
+    elif op == OP_GT:
+        start = _bisect_id(records, operand, right=True)
+    elif op == OP_GE:
+        start = _bisect_id(records, operand)
+    return list(range(start, max(start, stop)))
+
+
+def find_positions(records, ids):
+    """Return sorted positions of the given IDs, skipping missing ones."""
+    positions = []
+    for record_id in ids:
+        position = find_position(records, record_id)
+        if position != -1:
+            positions.append(position)
+    positions.sort()
+    return positions
+
+
+def ensure_sorted_by_id(records):
+    """Sort records by ID in place unless they already are."""
+    get_id = value_getter(records, RESERVED_ID_NAME)
+    ids = list(map(get_id, records))
+    if any(previous > current for previous, current in zip(ids, ids[1:])):
+        records.sort(key=get_id)
+    return records
@@ -1,8 +1,42 @@
+import argparse
+import sys
+
+from src.constants import SERVER_HOST, SERVER_PORT
+from src.primitive_db.batch import run_batch, run_script, split_statements
 from src.primitive_db.engine import run
+from src.primitive_db.metrics import enable as enable_metrics
+from src.primitive_db.server import serve
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="database", description="Консольная база данных")
+    parser.add_argument(
+        "--execute", "-e", action="append", metavar="КОМАНДА", help="выполнить команду (можно повторять)"
+    )
+    parser.add_argument("--script", "-s", metavar="ФАЙЛ", help="выполнить команды из файла")
+    parser.add_argument("--yes", "-y", action="store_true", help="не запрашивать подтверждения")
+    parser.add_argument("--autocommit", action="store_true", help="сохранять каждую команду отдельно")
+    parser.add_argument("--metrics", action="store_true", help="собирать метрики задержек с запуска")
+    commands = parser.add_subparsers(dest="mode")
+    serve_parser = commands.add_parser("serve", help="запустить сетевой сервер")
+    serve_parser.add_argument("--host", default=SERVER_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVER_PORT)
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.metrics:
+        enable_metrics()
+    if args.mode == "serve":
+        serve(args.host, args.port)
+        return
+    if args.script:
+        sys.exit(run_script(args.script, args.yes, args.autocommit))
+    if args.execute:
+        statements = [statement for command in args.execute for statement in split_statements(command)]
+        sys.exit(run_batch(statements, args.yes, args.autocommit))
     run()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,240 @@
+"""Latency histograms and counters per command and per phase of a command.
+
+Collection is off until enable() is called. While off, phase() returns a
+shared no-op context manager and increment() returns at once, so
+instrumented code pays one function call per use.
+
+While on, every command is timed as a whole, together with the time spent
+in each phase inside it:
+
+    with command("select"):
+        with phase(PHASE_TABLE_LOAD):
+            ...
+
+Phases are exclusive: time spent in a nested phase is not counted in the
+enclosing one. At the end of a command, its total time and the total time
+of each phase used are recorded into histograms named "select" and
+"select.table_load". Latencies are bucketed on a geometric scale, so
+percentiles are estimates within one bucket (about 10%). Commands running
+side by side in server threads are timed separately and recorded into the
+same histograms.
+"""
+import cProfile
+import io
+import math
+import pstats
+import threading
+import time
+from functools import wraps
+
+from src.constants import METRICS_BUCKET_GROWTH, METRICS_PROFILE_TOP_ENTRIES
+
+PHASE_METADATA_LOAD = "metadata_load"
+PHASE_TABLE_LOAD = "table_load"
+PHASE_PREDICATE = "predicate"
+PHASE_MUTATION = "mutation"
+PHASE_SERIALIZATION = "serialization"
+PHASE_FILE_WRITE = "file_write"
+PHASE_RENDER = "render"
+
+PERCENTILES = (50, 95, 99)
+# Bucket i holds latencies up to _BUCKET_BASE * METRICS_BUCKET_GROWTH ** i seconds.
+_BUCKET_BASE = 1e-6
+_LOG_GROWTH = math.log(METRICS_BUCKET_GROWTH)
+
+_state = {"enabled": False}
+# The command being timed and its open phases belong to the thread running it.
+_current = threading.local()
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Latency distribution over geometric buckets with count, total, min and max."""
+
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        bucket = math.ceil(math.log(seconds / _BUCKET_BASE) / _LOG_GROWTH) if seconds > _BUCKET_BASE else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Return the upper bound of the bucket holding the given percentile (capped by max)."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(_BUCKET_BASE * METRICS_BUCKET_GROWTH ** bucket, self.max)
+        return self.max
+
+    def summary(self):
+        result = {"count": self.count, "total": self.total, "min": self.min, "max": self.max}
+        for percent in PERCENTILES:
+            result[f"p{percent}"] = self.percentile(percent)
+        return result
+
+
+def enable(enabled=True):
+    _state["enabled"] = enabled
+
+
+def is_enabled():
+    return _state["enabled"]
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    """Record one latency into the histogram name."""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.record(seconds)
+
+
+def increment(name, amount=1):
+    if _state["enabled"]:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def _phases():
+    return getattr(_current, "phases", None)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        now = time.perf_counter()
+        stack = _current.stack
+        if stack:
+            _add_phase_time(stack[-1], now)
+        self.start = now
+        stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        now = time.perf_counter()
+        stack = _current.stack
+        _add_phase_time(self, now)
+        stack.pop()
+        if stack:
+            stack[-1].start = now
+        return False
+
+
+def _add_phase_time(current, now):
+    phases = _phases()
+    if phases is not None:
+        phases[current.name] = phases.get(current.name, 0.0) + now - current.start
+
+
+def phase(name):
+    """Context manager timing a phase of the current command (no-op when disabled or outside a command)."""
+    if not _state["enabled"] or _phases() is None:
+        return _NULL_PHASE
+    return _Phase(name)
+
+
+class _Command:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        _current.phases = {}
+        _current.stack = []
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        phases = _current.phases
+        _current.phases = None
+        _current.stack = []
+        observe(self.name, elapsed)
+        for phase_name, seconds in phases.items():
+            observe(f"{self.name}.{phase_name}", seconds)
+        return False
+
+
+def command(name):
+    """Context manager timing a whole command and collecting its phases."""
+    if not _state["enabled"] or _phases() is not None:
+        return _NULL_PHASE
+    return _Command(name)
+
+
+def measured(phase_name):
+    """Decorator running a function inside a phase."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return func(*args, **kwargs)
+            with phase(phase_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot():
+    """Return all metrics as a JSON-friendly dict."""
+    with _lock:
+        return {
+            "enabled": _state["enabled"],
+            "histograms": {name: histogram.summary() for name, histogram in sorted(_histograms.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+def profile(func, *args):
+    """Run func under cProfile. Returns (result, report of the top functions by cumulative time)."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(METRICS_PROFILE_TOP_ENTRIES)
+    return result, stream.getvalue()
@@ -1,22 +1,59 @@
-def _split_values(raw):
-    items = []
-    current = []
-    in_quotes = False
-    for char in raw:
-        if char == '"':
-            in_quotes = not in_quotes
-            current.append(char)
-            continue
-        if char == ',' and not in_quotes:
-            item = ''.join(current).strip()
-            if item:
-                items.append(item)
-            current = []
-            continue
-        current.append(char)
-    if current:
-        items.append(''.join(current).strip())
-    return items
+"""Tokenizer and recursive-descent parser of the data statements.
+
+A command is split into tokens in one regex pass and parsed into a
+statement object:
+
+    select [items] from table [join other on table.column = other.column]
+           [where ...] [group by column]
+           [limit n] [offset m] [into file]           -> SelectQuery
+    insert into table values (v, ...), (v, ...)        -> InsertStatement
+    update table set column = v, ... where ...         -> UpdateStatement
+    delete from table where ...                        -> DeleteStatement
+    explain select ...                                 -> ExplainStatement
+    prepare name as <select|insert|update|delete>      -> PrepareStatement
+    execute name [(v, ...)]                            -> ExecuteStatement
+
+In a select with join, columns are written as table.column. Statements
+are independent of any schema, so a parsed statement can be cached and
+reused. In a prepared statement a value may be "?": it is parsed into a
+Parameter and replaced with an actual value by bind().
+"""
+import re
+
+from src.constants import AGG_COUNT, AGGREGATE_FUNCTIONS, OP_NE, RESERVED_ID_NAME
+from src.primitive_db.aggregates import ALL_COLUMNS
+from src.primitive_db.expressions import (
+    between,
+    comparison,
+    conjunction,
+    disjunction,
+    in_list,
+    iter_column_values,
+    map_values,
+    negate,
+)
+
+_TOKEN_PATTERN = re.compile(
+    r'(?P<string>"[^"]*")|(?P<op><=|>=|!=|<>|=|<|>)|(?P<punct>[(),])|(?P<word>[^\s()<>=!,"]+)|(?P<error>\S)'
+)
+PARAMETER_MARK = "?"
+STATEMENT_KEYWORDS = {"select", "insert", "update", "delete", "explain", "prepare", "execute"}
+_PREPARABLE_KEYWORDS = {"select", "insert", "update", "delete"}
+
+
+def tokenize(raw):
+    """Split a command into (kind, text) tokens in one pass.
+
+    Kinds are string (with its quotes), op, punct and word. Raises
+    ValueError with a character that can't start any token.
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(raw):
+        kind = match.lastgroup
+        if kind == "error":
+            raise ValueError(match.group())
+        tokens.append((kind, match.group()))
+    return tokens
 
 
 def _parse_value(raw):
@@ -36,31 +73,445 @@ def _parse_value(raw):
         return value
 
 
-def parse_values_list(raw):
-    if not raw:
-        return []
-    parts = _split_values(raw)
-    return [_parse_value(part) for part in parts]
+class Parameter:
+    """A "?" of a prepared statement; index is its position among the statement's parameters."""
 
+    __slots__ = ("index",)
 
-def parse_where_clause(raw):
-    clause = raw.strip()
-    if "=" not in clause:
-        return {}
-    left, right = clause.split("=", 1)
-    key = left.strip()
-    value = _parse_value(right)
-    return {key: value}
-
-
-def parse_set_clause(raw):
-    assignments = {}
-    for part in _split_values(raw):
-        if "=" not in part:
-            continue
-        left, right = part.split("=", 1)
-        key = left.strip()
-        assignments[key] = _parse_value(right)
-    return assignments
+    def __init__(self, index):
+        self.index = index
+
+    def __repr__(self):
+        return PARAMETER_MARK
+
+
+def _binder(values):
+    def bind_value(value):
+        return values[value.index] if isinstance(value, Parameter) else value
+
+    return bind_value
+
+
+def _parameters(pairs):
+    return [(column, value) for column, value in pairs if isinstance(value, Parameter)]
+
+
+class JoinClause:
+    """join table on ...; left_column is a column of the selected table, right_column one of the joined table."""
+
+    __slots__ = ("table", "left_column", "right_column")
+
+    def __init__(self, table, left_column, right_column):
+        self.table = table
+        self.left_column = left_column
+        self.right_column = right_column
+
+
+class SelectQuery:
+    """Parts of a select command; items is empty for whole records."""
+
+    __slots__ = ("table", "items", "where", "group_by", "limit", "offset", "into", "join")
+
+    def __init__(self, table, items=(), where=None, group_by=None, limit=None, offset=0, into=None, join=None):
+        self.table = table
+        self.items = list(items)
+        self.where = where
+        self.group_by = group_by
+        self.limit = limit
+        self.offset = offset
+        self.into = into
+        self.join = join
+
+    @property
+    def is_aggregate(self):
+        return self.group_by is not None or any(function is not None for function, _ in self.items)
+
+    def parameters(self, schema):
+        """Return (column, Parameter) pairs of the statement."""
+        return _parameters(iter_column_values(self.where)) if self.where else []
+
+    def bind(self, values):
+        where = map_values(self.where, _binder(values)) if self.where else None
+        return SelectQuery(self.table, self.items, where, self.group_by, self.limit, self.offset, self.into, self.join)
+
+
+class InsertStatement:
+    """insert into table values ...; rows are lists of values without ID."""
+
+    __slots__ = ("table", "rows")
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+
+    def parameters(self, schema):
+        columns = [column for column in schema if column != RESERVED_ID_NAME]
+        return _parameters(
+            (columns[position] if position < len(columns) else None, value)
+            for row in self.rows
+            for position, value in enumerate(row)
+        )
+
+    def bind(self, values):
+        bind_value = _binder(values)
+        return InsertStatement(self.table, [[bind_value(value) for value in row] for row in self.rows])
+
+
+class UpdateStatement:
+    """update table set assignments where ...; assignments maps columns to new values."""
+
+    __slots__ = ("table", "assignments", "where")
+
+    def __init__(self, table, assignments, where):
+        self.table = table
+        self.assignments = assignments
+        self.where = where
+
+    def parameters(self, schema):
+        return _parameters(self.assignments.items()) + _parameters(iter_column_values(self.where))
+
+    def bind(self, values):
+        bind_value = _binder(values)
+        assignments = {column: bind_value(value) for column, value in self.assignments.items()}
+        return UpdateStatement(self.table, assignments, map_values(self.where, bind_value))
+
+
+class DeleteStatement:
+    """delete from table where ..."""
+
+    __slots__ = ("table", "where")
+
+    def __init__(self, table, where):
+        self.table = table
+        self.where = where
+
+    def parameters(self, schema):
+        return _parameters(iter_column_values(self.where))
+
+    def bind(self, values):
+        return DeleteStatement(self.table, map_values(self.where, _binder(values)))
+
+
+class ExplainStatement:
+    """explain select ..."""
+
+    __slots__ = ("query",)
+
+    def __init__(self, query):
+        self.query = query
+
+    @property
+    def table(self):
+        return self.query.table
 
 
+class PrepareStatement:
+    """prepare name as statement; parameter_count is the number of "?" in it."""
+
+    __slots__ = ("name", "statement", "parameter_count")
+
+    def __init__(self, name, statement, parameter_count):
+        self.name = name
+        self.statement = statement
+        self.parameter_count = parameter_count
+
+
+class ExecuteStatement:
+    """execute name (values)."""
+
+    __slots__ = ("name", "values")
+
+    def __init__(self, name, values):
+        self.name = name
+        self.values = values
+
+
+class _Parser:
+    """Recursive-descent parser over the tokens of one command.
+
+    Keywords are matched case-insensitively by position, so they are not
+    reserved as column or table names. WHERE expressions:
+
+    expr      := and_expr ("or" and_expr)*
+    and_expr  := not_expr ("and" not_expr)*
+    not_expr  := "not" not_expr | "(" expr ")" | predicate
+    predicate := column op value
+               | column ["not"] "in" "(" value ("," value)* ")"
+               | column ["not"] "between" value "and" value
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.parameter_count = 0
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def _take(self, kind=None, text=None):
+        token_kind, token_text = self._peek()
+        if token_kind is None or (kind and token_kind != kind) or (text and token_text != text):
+            raise ValueError(token_text)
+        self.position += 1
+        return token_text
+
+    def _accept(self, kind, text):
+        if self._peek() == (kind, text):
+            self.position += 1
+            return True
+        return False
+
+    def _accept_keyword(self, keyword):
+        kind, text = self._peek()
+        if kind == "word" and text.lower() == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def _expect_keyword(self, keyword):
+        if not self._accept_keyword(keyword):
+            raise ValueError(keyword)
+
+    def _name(self, part):
+        kind, text = self._peek()
+        if kind != "word" or text == PARAMETER_MARK:
+            raise ValueError(part)
+        self.position += 1
+        return text
+
+    def end(self):
+        if self.position != len(self.tokens):
+            raise ValueError(self._peek()[1])
+
+    def statement(self, allowed=STATEMENT_KEYWORDS):
+        kind, text = self._peek()
+        keyword = text.lower() if kind == "word" else None
+        if keyword not in allowed:
+            raise ValueError(text)
+        self.position += 1
+        return getattr(self, f"_{keyword}")()
+
+    def _select(self):
+        items = [] if self._accept_keyword("from") else self._select_items()
+        table = self._name("имя_таблицы")
+        join = self._join(table) if self._accept_keyword("join") else None
+        where = self._where() if self._accept_keyword("where") else None
+        group_by = None
+        if self._accept_keyword("group"):
+            self._expect_keyword("by")
+            group_by = self._name("group by")
+        limit = self._number("limit") if self._accept_keyword("limit") else None
+        offset = self._number("offset") if self._accept_keyword("offset") else 0
+        into = None
+        if self._accept_keyword("into"):
+            kind, text = self._peek()
+            if kind not in ("string", "word"):
+                raise ValueError("into")
+            self.position += 1
+            into = _parse_value(text) if kind == "string" else text
+        return SelectQuery(table, items, where, group_by, limit, offset, into, join)
+
+    def _join(self, table):
+        """Parse "other on a.column = b.column"; the condition may name the tables in either order."""
+        other = self._name("join")
+        self._expect_keyword("on")
+        first = self._name("on")
+        self._take("op", "=")
+        second = self._name("on")
+        if other == table:
+            raise ValueError("join")
+        if first.startswith(f"{other}.") and second.startswith(f"{table}."):
+            first, second = second, first
+        if not (first.startswith(f"{table}.") and second.startswith(f"{other}.")):
+            raise ValueError("on")
+        return JoinClause(other, first[len(table) + 1:], second[len(other) + 1:])
+
+    def _select_items(self):
+        """Parse items up to and including "from" into (function, column) pairs."""
+        items = []
+        while True:
+            name = self._name("from")
+            if self._accept("punct", "("):
+                function, column = name.lower(), self._name(f"{name}(")
+                self._take("punct", ")")
+                if function not in AGGREGATE_FUNCTIONS or (column == ALL_COLUMNS and function != AGG_COUNT):
+                    raise ValueError(f"{name}({column})")
+                items.append((function, column))
+            elif name == ALL_COLUMNS:
+                raise ValueError(name)
+            else:
+                items.append((None, name))
+            if self._accept_keyword("from"):
+                return items
+            if not self._accept("punct", ","):
+                raise ValueError("from")
+
+    def _number(self, part):
+        kind, text = self._peek()
+        if kind != "word" or not text.isdigit():
+            raise ValueError(part)
+        self.position += 1
+        return int(text)
+
+    def _insert(self):
+        self._expect_keyword("into")
+        table = self._name("имя_таблицы")
+        self._expect_keyword("values")
+        rows = [self._value_group("скобки")]
+        while self._accept("punct", ","):
+            rows.append(self._value_group("скобки"))
+        if self.position != len(self.tokens):
+            raise ValueError("скобки")
+        return InsertStatement(table, rows)
+
+    def _value_group(self, part):
+        """Parse "(value, ...)"; the group may be empty."""
+        if not self._accept("punct", "("):
+            raise ValueError(part)
+        values = []
+        if self._accept("punct", ")"):
+            return values
+        try:
+            values.append(self._value())
+            while self._accept("punct", ","):
+                values.append(self._value())
+            self._take("punct", ")")
+        except ValueError:
+            raise ValueError(part) from None
+        return values
+
+    def _update(self):
+        table = self._name("имя_таблицы")
+        self._expect_keyword("set")
+        assignments = {}
+        try:
+            while True:
+                column = self._name("set")
+                self._take("op", "=")
+                assignments[column] = self._value()
+                if not self._accept("punct", ","):
+                    break
+        except ValueError:
+            raise ValueError("set") from None
+        self._expect_keyword("where")
+        return UpdateStatement(table, assignments, self._where())
+
+    def _delete(self):
+        self._expect_keyword("from")
+        table = self._name("имя_таблицы")
+        self._expect_keyword("where")
+        return DeleteStatement(table, self._where())
+
+    def _explain(self):
+        return ExplainStatement(self.statement({"select"}))
+
+    def _prepare(self):
+        name = self._name("имя")
+        self._expect_keyword("as")
+        statement = self.statement(_PREPARABLE_KEYWORDS)
+        return PrepareStatement(name, statement, self.parameter_count)
+
+    def _execute(self):
+        name = self._name("имя")
+        values = []
+        if self._peek()[0] is not None:
+            values = self._value_group("параметры")
+        if any(isinstance(value, Parameter) for value in values):
+            raise ValueError(PARAMETER_MARK)
+        return ExecuteStatement(name, values)
+
+    def expression(self):
+        return self._or()
+
+    def _where(self):
+        try:
+            return self._or()
+        except ValueError:
+            raise ValueError("условие") from None
+
+    def _or(self):
+        nodes = [self._and()]
+        while self._accept_keyword("or"):
+            nodes.append(self._and())
+        return disjunction(nodes)
+
+    def _and(self):
+        nodes = [self._not()]
+        while self._accept_keyword("and"):
+            nodes.append(self._not())
+        return conjunction(nodes)
+
+    def _not(self):
+        if self._accept_keyword("not"):
+            return negate(self._not())
+        if self._accept("punct", "("):
+            node = self._or()
+            self._take("punct", ")")
+            return node
+        return self._predicate()
+
+    def _value(self):
+        kind, text = self._peek()
+        if kind not in ("string", "word"):
+            raise ValueError(text)
+        self.position += 1
+        if kind == "word" and text == PARAMETER_MARK:
+            self.parameter_count += 1
+            return Parameter(self.parameter_count - 1)
+        return _parse_value(text)
+
+    def _predicate(self):
+        column = self._name(self._peek()[1])
+        negated = self._accept_keyword("not")
+        if self._accept_keyword("in"):
+            self._take("punct", "(")
+            values = [self._value()]
+            while self._accept("punct", ","):
+                values.append(self._value())
+            self._take("punct", ")")
+            node = in_list(column, values)
+        elif self._accept_keyword("between"):
+            low = self._value()
+            self._expect_keyword("and")
+            node = between(column, low, self._value())
+        elif negated:
+            raise ValueError(column)
+        else:
+            op = self._take("op")
+            node = comparison(column, OP_NE if op == "<>" else op, self._value())
+        return negate(node) if negated else node
+
+
+def parse_statement(raw):
+    """Parse a data statement (see the module docstring).
+
+    Raises ValueError naming the invalid part. "?" is only allowed inside
+    prepare.
+    """
+    parser = _Parser(tokenize(raw))
+    statement = parser.statement()
+    parser.end()
+    if parser.parameter_count and not isinstance(statement, PrepareStatement):
+        raise ValueError(PARAMETER_MARK)
+    return statement
+
+
+def parse_where_clause(raw):
+    """Parse a WHERE expression into an expression tree (see expressions.py).
+
+    Supports =, !=, <, <=, >, >=, BETWEEN, IN (...), AND, OR, NOT and
+    parentheses. Returns None if the text is not a valid expression.
+    """
+    try:
+        parser = _Parser(tokenize(raw))
+        if not parser.tokens:
+            return None
+        node = parser.expression()
+        parser.end()
+    except ValueError:
+        return None
+    if parser.parameter_count:
+        return None
+    return node
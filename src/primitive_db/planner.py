@@ -0,0 +1,310 @@
+"""Table statistics and a cost-based choice of access path for a WHERE.
+
+Statistics live in the table service info of db_meta.json:
+
+    {"rows": N, "columns": {column: {"distinct": D, "min": v, "max": v}}}
+
+They are kept up to date approximately by insert, update and delete, and
+recomputed exactly by the analyze command. Min/max only ever widen between
+analyzes, so they stay valid bounds.
+"""
+from math import prod
+
+from src.constants import (
+    INDEX_SORTED,
+    OP_EQ,
+    OP_NE,
+    PLANNER_DEFAULT_EQ_SELECTIVITY,
+    PLANNER_DEFAULT_RANGE_SELECTIVITY,
+    PLANNER_JOIN_LOOKUP_ROW_COST,
+    PLANNER_LOOKUP_ROW_COST,
+    PLANNER_MASK_ROW_COST,
+    PLANNER_SCAN_ROW_COST,
+    RESERVED_ID_NAME,
+)
+from src.primitive_db.expressions import (
+    NODE_AND,
+    NODE_BETWEEN,
+    NODE_CMP,
+    NODE_IN,
+    NODE_NOT,
+    NODE_OR,
+    as_condition,
+    conjuncts,
+)
+from src.primitive_db.rows import value_getter
+
+ACCESS_FULL_SCAN = "full_scan"
+ACCESS_COLUMN_MASK = "column_mask"
+ACCESS_ID_LOOKUP = "id_lookup"
+ACCESS_ID_RANGE = "id_range"
+ACCESS_INDEX_LOOKUP = "index_lookup"
+JOIN_HASH = "hash_join"
+JOIN_INDEX = "index_join"
+
+
+def empty_stats():
+    return {"rows": 0, "columns": {}}
+
+
+def collect_stats(schema, records):
+    """Compute exact statistics of a table in one pass over its records."""
+    if isinstance(records, list):
+        distinct = {column: set(map(value_getter(records, column), records)) for column in schema}
+        rows = len(records)
+    else:
+        distinct = {column: set() for column in schema}
+        rows = 0
+        for record in records:
+            rows += 1
+            for column, values in distinct.items():
+                values.add(record.get(column))
+    columns = {}
+    for column, values in distinct.items():
+        values.discard(None)
+        if values:
+            columns[column] = {"distinct": len(values), "min": min(values), "max": max(values)}
+    return {"rows": rows, "columns": columns}
+
+
+def _widen(column_stats, values):
+    """Extend column min/max by new values; values outside the old range count as new distinct ones."""
+    values = [value for value in values if value is not None]
+    if not values:
+        return column_stats
+    if not column_stats:
+        return {"distinct": len(set(values)), "min": min(values), "max": max(values)}
+    low, high = column_stats["min"], column_stats["max"]
+    new_distinct = len({value for value in values if value < low or value > high})
+    if not new_distinct:
+        return column_stats
+    return {
+        "distinct": column_stats["distinct"] + new_distinct,
+        "min": min(low, min(values)),
+        "max": max(high, max(values)),
+    }
+
+
+def stats_after_insert(stats, records):
+    if not records:
+        return stats
+    rows = stats["rows"] + len(records)
+    columns = dict(stats["columns"])
+    for column in records[0]:
+        column_stats = _widen(columns.get(column), list(map(value_getter(records, column), records)))
+        if column_stats:
+            if column_stats["distinct"] > rows:
+                column_stats = {**column_stats, "distinct": rows}
+            columns[column] = column_stats
+    return {"rows": rows, "columns": columns}
+
+
+def stats_after_update(stats, set_clause, count):
+    columns = dict(stats["columns"])
+    for column, value in set_clause.items():
+        if count >= stats["rows"]:
+            columns[column] = {"distinct": 1, "min": value, "max": value}
+        else:
+            columns[column] = _widen(columns.get(column), [value])
+    return {"rows": stats["rows"], "columns": columns}
+
+
+def stats_after_delete(stats, count):
+    rows = max(0, stats["rows"] - count)
+    if not rows:
+        return empty_stats()
+    columns = {
+        column: {**column_stats, "distinct": min(column_stats["distinct"], rows)}
+        for column, column_stats in stats["columns"].items()
+    }
+    return {"rows": rows, "columns": columns}
+
+
+def _range_fraction(column_stats, low, high):
+    """Share of an int column within [low, high], assuming uniform values."""
+    minimum, maximum = column_stats["min"], column_stats["max"]
+    if low is None:
+        low = minimum
+    if high is None:
+        high = maximum
+    if high < low or high < minimum or low > maximum:
+        return 0.0
+    span = maximum - minimum + 1
+    return (min(high, maximum) - max(low, minimum) + 1) / span
+
+
+def _eq_selectivity(column_stats, value):
+    if not column_stats:
+        return PLANNER_DEFAULT_EQ_SELECTIVITY
+    try:
+        if value < column_stats["min"] or value > column_stats["max"]:
+            return 0.0
+    except TypeError:
+        return 0.0
+    return 1 / max(1, column_stats["distinct"])
+
+
+def _order_selectivity(column_stats, op, value):
+    if not column_stats or not isinstance(column_stats["min"], int) or isinstance(column_stats["min"], bool):
+        return PLANNER_DEFAULT_RANGE_SELECTIVITY
+    if op.startswith("<"):
+        high = value if op.endswith("=") else value - 1
+        return _range_fraction(column_stats, None, high)
+    low = value if op.endswith("=") else value + 1
+    return _range_fraction(column_stats, low, None)
+
+
+def estimate_selectivity(node, stats):
+    """Estimate the share of rows satisfying an expression (0..1)."""
+    if node is None:
+        return 1.0
+    kind = node[0]
+    if kind == NODE_AND:
+        return prod(estimate_selectivity(child, stats) for child in node[1])
+    if kind == NODE_OR:
+        return 1 - prod(1 - estimate_selectivity(child, stats) for child in node[1])
+    if kind == NODE_NOT:
+        return 1 - estimate_selectivity(node[1], stats)
+
+    column_stats = (stats or {}).get("columns", {}).get(node[1])
+    if kind == NODE_IN:
+        return min(1.0, sum(_eq_selectivity(column_stats, value) for value in node[2]))
+    if kind == NODE_BETWEEN:
+        if column_stats and isinstance(column_stats["min"], int) and not isinstance(column_stats["min"], bool):
+            return _range_fraction(column_stats, node[2], node[3])
+        return PLANNER_DEFAULT_RANGE_SELECTIVITY
+    op, value = node[2], node[3]
+    if op == OP_EQ:
+        return _eq_selectivity(column_stats, value)
+    if op == OP_NE:
+        return 1 - _eq_selectivity(column_stats, value)
+    return _order_selectivity(column_stats, op, value)
+
+
+class QueryPlan:
+    """Chosen access path of a WHERE with its estimates.
+
+    access is one of the ACCESS_* names; node is the condition used for
+    the access path (None for scans). The rest of the WHERE is checked on
+    every fetched row.
+    """
+
+    __slots__ = ("access", "node", "index_kind", "total_rows", "access_rows", "result_rows", "cost", "scan_cost")
+
+    def __init__(self, access, total_rows, access_rows, result_rows, cost, scan_cost, node=None, index_kind=None):
+        self.access = access
+        self.node = node
+        self.index_kind = index_kind
+        self.total_rows = total_rows
+        self.access_rows = access_rows
+        self.result_rows = result_rows
+        self.cost = cost
+        self.scan_cost = scan_cost
+
+    @property
+    def column(self):
+        return self.node[1] if self.node is not None else None
+
+
+def _access_candidate(node, indexes):
+    """Return (access, index_kind) usable for one condition of a top-level AND, or None."""
+    kind, column = node[0], node[1]
+    if kind not in (NODE_CMP, NODE_BETWEEN, NODE_IN):
+        return None
+    condition = as_condition(node)
+    is_range = isinstance(condition, tuple)
+    if kind != NODE_IN and condition is None:
+        return None
+    if column == RESERVED_ID_NAME:
+        return (ACCESS_ID_RANGE, None) if is_range else (ACCESS_ID_LOOKUP, None)
+    index = (indexes or {}).get(column)
+    if index is None or (is_range and index.kind != INDEX_SORTED):
+        return None
+    return ACCESS_INDEX_LOOKUP, index.kind
+
+
+def plan_query(where, table_data, indexes=None, stats=None, columnar=False):
+    """Pick the cheapest access path for a normalized WHERE.
+
+    A full scan (or a column mask for columnar tables) is compared with
+    using one condition of a top-level AND: a binary search over IDs or a
+    secondary index lookup. Row estimates come from table statistics, or
+    from fixed default selectivities when there are none.
+    """
+    total = len(table_data)
+    result_rows = total * estimate_selectivity(where, stats)
+    if columnar:
+        scan_cost = total * PLANNER_MASK_ROW_COST
+        best = QueryPlan(ACCESS_COLUMN_MASK, total, total, result_rows, scan_cost, scan_cost)
+    else:
+        scan_cost = total * PLANNER_SCAN_ROW_COST
+        best = QueryPlan(ACCESS_FULL_SCAN, total, total, result_rows, scan_cost, scan_cost)
+    if where is None:
+        return best
+
+    for node in conjuncts(where):
+        candidate = _access_candidate(node, indexes)
+        if candidate is None:
+            continue
+        access, index_kind = candidate
+        access_rows = total * estimate_selectivity(node, stats)
+        if access == ACCESS_ID_LOOKUP:
+            access_rows = min(access_rows, len(node[2]) if node[0] == NODE_IN else 1)
+        row_cost = PLANNER_SCAN_ROW_COST if access == ACCESS_ID_RANGE else PLANNER_LOOKUP_ROW_COST
+        cost = access_rows * row_cost
+        if cost < best.cost:
+            best = QueryPlan(access, total, access_rows, result_rows, cost, scan_cost, node, index_kind)
+    return best
+
+
+def estimate_rows_per_value(stats, column):
+    """Return the expected number of rows holding one value of a column (at least 1)."""
+    column_stats = (stats or {}).get("columns", {}).get(column)
+    if not column_stats or not column_stats.get("distinct"):
+        return 1
+    return max(1, stats["rows"] / column_stats["distinct"])
+
+
+class JoinPlan:
+    """Chosen strategy of a join of two tables (side 0 is the left one).
+
+    The build side is looked up for every row of the probe side, which is
+    streamed: through a hash table of its matching rows (JOIN_HASH) or
+    through the ID column or an index on its join column (JOIN_INDEX).
+    plans are the QueryPlans of the WHERE parts pushed down to each side;
+    where is (left part, right part, the rest checked on joined rows).
+    """
+
+    __slots__ = ("strategy", "build", "cost", "plans", "where")
+
+    def __init__(self, strategy, build, cost, plans, where):
+        self.strategy = strategy
+        self.build = build
+        self.cost = cost
+        self.plans = plans
+        self.where = where
+
+    @property
+    def probe(self):
+        return 1 - self.build
+
+
+def plan_join(plans, lookup_rows, where=(None, None, None)):
+    """Pick how to join two tables given the plans of their pushed-down WHEREs.
+
+    lookup_rows[side] is the expected number of rows per join key when the
+    side can be looked up by its join column, else None. A hash join reads
+    both sides and builds on the one expected to match fewer rows; an index
+    join reads only the probe side and pays a lookup per probe row, so it
+    wins when few rows are probed against a large table.
+    """
+    build = 0 if plans[0].result_rows <= plans[1].result_rows else 1
+    best = JoinPlan(JOIN_HASH, build, plans[0].cost + plans[1].cost, plans, where)
+    for side, rows_per_key in enumerate(lookup_rows):
+        if rows_per_key is None:
+            continue
+        probe = plans[1 - side]
+        cost = probe.cost + probe.result_rows * rows_per_key * PLANNER_JOIN_LOOKUP_ROW_COST
+        if cost < best.cost:
+            best = JoinPlan(JOIN_INDEX, side, cost, plans, where)
+    return best
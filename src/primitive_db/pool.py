@@ -0,0 +1,561 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from itertools import count
+
+from src.constants import (
+    COMMIT_LOG_EXTENSION,
+    DATA_DIRECTORY_NAME,
+    LAYOUT_COLUMNAR,
+    META_FILEPATH,
+    META_TABLES_INFO_KEY,
+    STORAGE_BINARY,
+    STORAGE_JSON,
+    STORAGE_SEGMENTED,
+    TABLE_POOL_MEMORY_BUDGET,
+    TABLE_POOL_SIZE_SAMPLE,
+)
+from src.primitive_db.binary import (
+    BinaryTable,
+    get_binary_filepath,
+    get_heap_filepath,
+    load_binary_table,
+    remove_binary_table,
+    save_binary_changes,
+    save_binary_table,
+)
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.core import invalidate_table
+from src.primitive_db.indexes import build_index, ensure_sorted_by_id
+from src.primitive_db.metrics import PHASE_METADATA_LOAD, PHASE_TABLE_LOAD, increment, phase
+from src.primitive_db.segments import (
+    SegmentedTable,
+    load_segmented_table,
+    remove_segmented_table,
+    remove_stale_segments,
+    save_segmented_table,
+)
+from src.primitive_db.utils import (
+    append_table_log,
+    compact_table,
+    fsync_directory,
+    fsync_file,
+    get_table_filepath,
+    get_table_log_filepath,
+    load_commit_log,
+    load_metadata,
+    load_table_data,
+    remove_commit_log,
+    remove_table_data,
+    save_metadata,
+    save_table_changes,
+    save_table_data,
+    write_commit_log,
+)
+
+
+def _file_signature(filepath):
+    """Return (mtime_ns, size) of a file or None if it does not exist."""
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Pools get distinct numbers, so select cache entries of same-named tables of two databases never mix.
+_pool_numbers = count()
+
+
+def _table_signature(table_name, info, data_dir, schema=None):
+    """Return file signatures of a table, plus its segment files (never rewritten in place) and its columns.
+
+    Records are built for the columns of the schema, so alter_table makes
+    loaded records stale although no file changed.
+    """
+    filepaths = (
+        get_table_filepath(table_name, data_dir),
+        get_table_log_filepath(table_name, data_dir),
+        get_binary_filepath(table_name, data_dir),
+        get_heap_filepath(table_name, data_dir),
+    )
+    segments = tuple(entry["file"] for entry in info.get("segments", ()))
+    columns = tuple(schema.items()) if schema is not None else ()
+    return tuple(_file_signature(filepath) for filepath in filepaths) + (segments, columns)
+
+
+def estimate_table_size(records):
+    """Roughly estimate memory used by records, extrapolating from a sample."""
+    if isinstance(records, ColumnarTable):
+        return records.memory_size()
+    if isinstance(records, (BinaryTable, SegmentedTable)) or not records:
+        return sys.getsizeof(records)
+    step = max(1, len(records) // TABLE_POOL_SIZE_SAMPLE)
+    sample = records[::step]
+    sample_size = 0
+    for record in sample:
+        sample_size += sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+    return sys.getsizeof(records) + sample_size * len(records) // len(sample)
+
+
+class _PooledTable:
+    __slots__ = ("records", "signature", "size", "length", "indexes")
+
+    def __init__(self, records, signature, indexes=None, size=None):
+        self.records = records
+        self.signature = signature
+        self.size = size if size is not None else estimate_table_size(records)
+        self.length = len(records)
+        self.indexes = indexes if indexes is not None else {}
+
+
+def _resized(previous, records):
+    """Scale the size estimate of a table changed in place, or return None.
+
+    Sampling rows again on every saved change would cost more than the
+    change itself, so the per-row estimate of the same records is reused.
+    """
+    if previous is None or previous.records is not records or not previous.length:
+        return None
+    return previous.size * len(records) // previous.length
+
+
+class _Transaction:
+    """Changes made since begin: whether metadata changed, log entries and changed rows per table.
+
+    A table saved whole (save_table) is marked as a snapshot; its entries
+    are no longer needed, but the rows it changed are still counted.
+    Tables whose files are deleted at commit are listed in dropped.
+    """
+
+    __slots__ = ("metadata_changed", "entries", "snapshots", "counts", "dropped")
+
+    def __init__(self):
+        self.metadata_changed = False
+        self.entries = {}
+        self.snapshots = set()
+        self.counts = {}
+        self.dropped = set()
+
+    @property
+    def tables(self):
+        return self.entries.keys() | self.snapshots
+
+    def count_changes(self, table_name, change_count):
+        self.counts[table_name] = self.counts.get(table_name, 0) + change_count
+
+
+class TablePool:
+    """Keeps parsed metadata and tables in memory between REPL commands.
+
+    Cached entries are checked against file mtime and size, so files changed
+    by another process are reloaded. Tables are evicted whole, least recently
+    used first, once their estimated size exceeds memory_budget.
+
+    Between begin() and commit() nothing is written: changed metadata and
+    tables stay in memory (and are never evicted) until commit() writes them
+    through a write-ahead log, or rollback() drops them.
+
+    Table files live in data_dir, by default the data directory next to the
+    metadata file.
+    """
+
+    def __init__(self, meta_filepath=META_FILEPATH, memory_budget=TABLE_POOL_MEMORY_BUDGET, data_dir=None):
+        self.meta_filepath = meta_filepath
+        self.commit_log_filepath = f"{meta_filepath}{COMMIT_LOG_EXTENSION}"
+        self.data_dir = data_dir or os.path.join(os.path.dirname(meta_filepath), DATA_DIRECTORY_NAME)
+        self.memory_budget = memory_budget
+        self._number = next(_pool_numbers)
+        self._metadata = None
+        self._meta_signature = None
+        self._tables = OrderedDict()
+        self._used = 0
+        self._transaction = None
+        # Server reads run in parallel threads; loading and caching is done by one at a time.
+        self._lock = threading.RLock()
+
+    @property
+    def used_memory(self):
+        return self._used
+
+    @property
+    def in_transaction(self):
+        return self._transaction is not None
+
+    def cache_key(self, table_name):
+        """Return the select cache group of a table of this pool (see core.iter_select)."""
+        return self._number, table_name
+
+    def get_metadata(self):
+        if self._transaction is not None and self._transaction.metadata_changed:
+            return self._metadata
+        with self._lock:
+            signature = _file_signature(self.meta_filepath)
+            if self._metadata is None or signature != self._meta_signature:
+                with phase(PHASE_METADATA_LOAD):
+                    self._metadata = load_metadata(self.meta_filepath)
+                self._meta_signature = signature
+            return self._metadata
+
+    def save_metadata(self, metadata):
+        self._metadata = metadata
+        if self._transaction is not None:
+            self._transaction.metadata_changed = True
+            return
+        save_metadata(self.meta_filepath, metadata)
+        self._meta_signature = _file_signature(self.meta_filepath)
+
+    def begin(self):
+        if self._transaction is not None:
+            raise RuntimeError("transaction already started")
+        self._transaction = _Transaction()
+
+    def commit(self):
+        """Write all changes of the transaction atomically. Returns (tables, changes).
+
+        The new metadata and the changes of every table go to the
+        write-ahead log first (a single fsync). Only then are the table and
+        metadata files replaced; once they are on disk, the log is removed.
+        A crash in between is repaired by recover() on the next start.
+        """
+        transaction = self._transaction
+        if transaction is None:
+            raise RuntimeError("no transaction")
+        self._transaction = None
+        metadata = self._metadata
+        tables = [name for name in transaction.tables if name in metadata and name in self._tables]
+        if not transaction.metadata_changed and not tables:
+            return 0, 0
+
+        # Files of dropped tables go first, so a table created again under the same name starts empty.
+        changes = [{"table": table_name, "drop": True} for table_name in sorted(transaction.dropped)]
+        for table_name in tables:
+            storage = metadata.get(META_TABLES_INFO_KEY, {}).get(table_name, {}).get("storage", STORAGE_JSON)
+            if storage == STORAGE_SEGMENTED:
+                # Changed segments go to new files now; the logged metadata already points to them.
+                self._write_segments(table_name, self._tables[table_name].records)
+                continue
+            if table_name in transaction.snapshots or storage == STORAGE_BINARY:
+                changes.append({"table": table_name, "snapshot": list(self._tables[table_name].records)})
+            else:
+                changes.append({"table": table_name, "entries": transaction.entries[table_name]})
+        write_commit_log(self.commit_log_filepath, metadata, changes)
+
+        self.save_metadata(metadata)
+        for table_name in transaction.dropped:
+            self._remove_table_files(table_name)
+        for table_name in tables:
+            records = self._tables[table_name].records
+            if self._table_info(table_name).get("storage") == STORAGE_SEGMENTED:
+                remove_stale_segments(table_name, self._table_info(table_name)["segments"], self.data_dir)
+                self._store(table_name, records, self._signature(table_name), self._current_indexes(table_name))
+                continue
+            if table_name in transaction.entries and table_name not in transaction.snapshots:
+                if self._table_info(table_name).get("storage") != STORAGE_BINARY:
+                    self.save_changes(table_name, transaction.entries[table_name], records)
+                    continue
+            self.save_table(table_name, records)
+        self._sync_tables(tables)
+        remove_commit_log(self.commit_log_filepath)
+        return len(tables), sum(transaction.counts.get(table_name, 0) for table_name in tables)
+
+    def rollback(self):
+        """Drop uncommitted changes; the files on disk were never touched."""
+        transaction = self._transaction
+        if transaction is None:
+            raise RuntimeError("no transaction")
+        self._transaction = None
+        for table_name in transaction.tables:
+            self.evict(table_name)
+            invalidate_table(self.cache_key(table_name))
+        self._metadata = None
+        self._meta_signature = None
+
+    def recover(self):
+        """Finish or discard a commit interrupted by a crash.
+
+        Returns True if a complete write-ahead log was replayed, False if a
+        torn one was discarded and None if there was nothing to do. Replaying
+        is idempotent: log entries carry whole rows and snapshots whole tables.
+        """
+        try:
+            logged = load_commit_log(self.commit_log_filepath)
+        except FileNotFoundError:
+            return None
+        if logged is None:
+            remove_commit_log(self.commit_log_filepath)
+            return False
+
+        metadata, changes = logged
+        for change in changes:
+            table_name = change["table"]
+            if change.get("drop"):
+                self._remove_table_files(table_name)
+            elif "entries" in change:
+                append_table_log(table_name, change["entries"], self.data_dir)
+            elif metadata.get(META_TABLES_INFO_KEY, {}).get(table_name, {}).get("storage") == STORAGE_BINARY:
+                save_binary_table(table_name, metadata[table_name], change["snapshot"], self.data_dir)
+            else:
+                save_table_data(table_name, change["snapshot"], self.data_dir)
+        save_metadata(self.meta_filepath, metadata)
+        for table_name, info in metadata.get(META_TABLES_INFO_KEY, {}).items():
+            if info.get("storage") == STORAGE_SEGMENTED:
+                remove_stale_segments(table_name, info.get("segments", []), self.data_dir)
+        self._sync_tables(change["table"] for change in changes)
+        remove_commit_log(self.commit_log_filepath)
+        self.clear()
+        return True
+
+    def _sync_tables(self, table_names):
+        """Flush table files written without fsync (log appends, in-place binary changes) and the data directory.
+
+        Snapshots, metadata and segments are fsynced as they are written;
+        until this returns, the write-ahead log must stay.
+        """
+        for table_name in table_names:
+            for filepath in (
+                get_table_log_filepath(table_name, self.data_dir),
+                get_binary_filepath(table_name, self.data_dir),
+                get_heap_filepath(table_name, self.data_dir),
+            ):
+                fsync_file(filepath)
+        fsync_directory(self.data_dir)
+
+    def _table_info(self, table_name):
+        return self.get_metadata().get(META_TABLES_INFO_KEY, {}).get(table_name, {})
+
+    def _signature(self, table_name):
+        return _table_signature(
+            table_name, self._table_info(table_name), self.data_dir, self.get_metadata().get(table_name)
+        )
+
+    def _is_pending(self, table_name):
+        return self._transaction is not None and table_name in self._transaction.tables
+
+    def get_table(self, table_name):
+        with self._lock:
+            return self._get_table(table_name)
+
+    def _get_table(self, table_name):
+        entry = self._tables.get(table_name)
+        if entry is not None and self._is_pending(table_name):
+            self._tables.move_to_end(table_name)
+            return entry.records
+        if self._transaction is not None and table_name in self._transaction.dropped:
+            # The files still on disk belong to the dropped table; they are deleted at commit.
+            self._store(table_name, [], None)
+            return self._tables[table_name].records
+        signature = self._signature(table_name)
+        if entry is not None and entry.signature == signature:
+            self._tables.move_to_end(table_name)
+            increment("pool.table_hits")
+            return entry.records
+        increment("pool.table_loads")
+        info = self._table_info(table_name)
+        metadata = self.get_metadata()
+        defaults = info.get("defaults")
+        with phase(PHASE_TABLE_LOAD):
+            if info.get("storage") == STORAGE_BINARY:
+                records = load_binary_table(table_name, self.data_dir, metadata[table_name], defaults)
+            elif info.get("storage") == STORAGE_SEGMENTED:
+                manifest = info.get("segments", [])
+                records = load_segmented_table(table_name, metadata[table_name], manifest, self.data_dir, defaults)
+            else:
+                # Columnar tables are built from plain records; row tables, and tables whose
+                # stored records may lack added columns, keep compact rows.
+                schema = metadata.get(table_name)
+                if info.get("layout") == LAYOUT_COLUMNAR and not defaults:
+                    schema = None
+                records = ensure_sorted_by_id(load_table_data(table_name, schema, self.data_dir, defaults))
+            if info.get("layout") == LAYOUT_COLUMNAR and table_name in metadata:
+                records = ColumnarTable.from_records(metadata[table_name], list(records))
+        invalidate_table(self.cache_key(table_name))
+        self._store(table_name, records, signature)
+        return records
+
+    def get_table_for_write(self, table_name):
+        """Return table records that core may change in place.
+
+        A lazy binary view is decoded into a list first; the list stays cached
+        until the next change on disk.
+        """
+        records = self.get_table(table_name)
+        if isinstance(records, BinaryTable):
+            entry = self._tables[table_name]
+            with phase(PHASE_TABLE_LOAD):
+                records = records.materialize()
+            self._store(table_name, records, entry.signature, entry.indexes)
+        return records
+
+    def get_indexes(self, table_name):
+        """Return live indexes of a table, building the ones declared in metadata.
+
+        Index definitions live in metadata; index contents are rebuilt from
+        the records when a table is loaded and then maintained by core.
+        """
+        with self._lock:
+            return self._get_indexes(table_name)
+
+    def _get_indexes(self, table_name):
+        records = self.get_table(table_name)
+        entry = self._tables[table_name]
+        declared = self.get_metadata().get(META_TABLES_INFO_KEY, {}).get(table_name, {}).get("indexes", {})
+        for column in list(entry.indexes):
+            if declared.get(column) != entry.indexes[column].kind:
+                del entry.indexes[column]
+        for column, kind in declared.items():
+            if column not in entry.indexes:
+                with phase(PHASE_TABLE_LOAD):
+                    entry.indexes[column] = build_index(kind, column, records)
+        return entry.indexes
+
+    def save_table(self, table_name, records, change_count=0):
+        """Write a table whole; change_count is the number of rows changed, counted by a transaction."""
+        if self._transaction is not None:
+            self._transaction.entries.pop(table_name, None)
+            self._transaction.snapshots.add(table_name)
+            self._transaction.count_changes(table_name, change_count)
+            self._keep_pending(table_name, records)
+            return
+        storage = self._table_info(table_name).get("storage")
+        if storage == STORAGE_BINARY:
+            save_binary_table(table_name, self.get_metadata()[table_name], records, self.data_dir)
+            records = self._reopen_binary(table_name, records)
+        elif storage == STORAGE_SEGMENTED:
+            records = self._save_segments(table_name, records)
+        else:
+            save_table_data(table_name, records, self.data_dir)
+        self._store(table_name, records, self._signature(table_name), self._current_indexes(table_name))
+
+    def save_changes(self, table_name, entries, records):
+        if self._transaction is not None:
+            if table_name not in self._transaction.snapshots:
+                self._transaction.entries.setdefault(table_name, []).extend(entries)
+            self._transaction.count_changes(table_name, len(entries))
+            self._keep_pending(table_name, records)
+            return
+        storage = self._table_info(table_name).get("storage")
+        if storage == STORAGE_BINARY:
+            save_binary_changes(table_name, self.get_metadata()[table_name], entries, records, self.data_dir)
+            records = self._reopen_binary(table_name, records)
+        elif storage == STORAGE_SEGMENTED:
+            # A segmented table knows its changed segments; the entries are not needed.
+            records = self._save_segments(table_name, records)
+        else:
+            save_table_changes(table_name, entries, records, self.data_dir)
+        self._store(table_name, records, self._signature(table_name), self._current_indexes(table_name))
+
+    def compact(self, table_name):
+        records = self.get_table(table_name)
+        storage = self._table_info(table_name).get("storage")
+        if storage == STORAGE_SEGMENTED:
+            # Segments shrunk by deletes are merged back into full ones.
+            self.save_table(table_name, list(records))
+            return self.get_table(table_name)
+        if storage == STORAGE_BINARY:
+            self.save_table(table_name, records)
+            return self.get_table(table_name)
+        records = compact_table(table_name, records, self.data_dir)
+        self._store(table_name, records, self._signature(table_name), self._current_indexes(table_name))
+        return records
+
+    def convert(self, table_name, metadata):
+        """Rewrite a table in the storage format recorded in metadata.
+
+        The records are read in the old format first; metadata is saved before
+        the new files are written and the old ones removed.
+        """
+        records = self.get_table(table_name)
+        if isinstance(records, (BinaryTable, SegmentedTable)):
+            records = list(records)
+        self.save_metadata(metadata)
+        self.save_table(table_name, records)
+        storage = self._table_info(table_name).get("storage", STORAGE_JSON)
+        if storage != STORAGE_JSON:
+            remove_table_data(table_name, self.data_dir)
+        if storage != STORAGE_BINARY:
+            remove_binary_table(table_name, self.data_dir)
+        if storage != STORAGE_SEGMENTED:
+            remove_segmented_table(table_name, self.data_dir)
+        self.evict(table_name)
+
+    def _write_segments(self, table_name, records):
+        """Write changed segments and put the new manifest into metadata (not saved yet).
+
+        Returns the records to keep: the written SegmentedTable, or the
+        columnar table it was written from.
+        """
+        metadata = self.get_metadata()
+        table = save_segmented_table(table_name, metadata[table_name], records, self.data_dir)
+        metadata[META_TABLES_INFO_KEY][table_name]["segments"] = table.manifest()
+        return records if isinstance(records, ColumnarTable) else table
+
+    def _save_segments(self, table_name, records):
+        records = self._write_segments(table_name, records)
+        self.save_metadata(self.get_metadata())
+        remove_stale_segments(table_name, self._table_info(table_name)["segments"], self.data_dir)
+        return records
+
+    def _keep_pending(self, table_name, records):
+        entry = self._tables.get(table_name)
+        signature = entry.signature if entry is not None else self._signature(table_name)
+        self._store(table_name, records, signature, self._current_indexes(table_name))
+
+    def _reopen_binary(self, table_name, records):
+        """Swap a lazy view for a fresh one; decoded lists are kept as they are."""
+        if isinstance(records, BinaryTable):
+            info = self._table_info(table_name)
+            return load_binary_table(table_name, self.data_dir, self.get_metadata()[table_name], info.get("defaults"))
+        return records
+
+    def _current_indexes(self, table_name):
+        entry = self._tables.get(table_name)
+        return entry.indexes if entry is not None else None
+
+    def evict(self, table_name):
+        if self._transaction is not None:
+            self._transaction.entries.pop(table_name, None)
+            self._transaction.snapshots.discard(table_name)
+            self._transaction.counts.pop(table_name, None)
+        entry = self._tables.pop(table_name, None)
+        if entry is not None:
+            self._used -= entry.size
+
+    def remove_table_files(self, table_name):
+        """Forget a table and delete its files: those of a dropped table, or stale ones a new table must not read.
+
+        Inside a transaction the files are deleted by commit, so rollback
+        still finds them; until then the table reads as empty.
+        """
+        self.evict(table_name)
+        invalidate_table(self.cache_key(table_name))
+        if self._transaction is not None:
+            self._transaction.dropped.add(table_name)
+            self._transaction.metadata_changed = True
+            return
+        self._remove_table_files(table_name)
+
+    def _remove_table_files(self, table_name):
+        remove_table_data(table_name, self.data_dir)
+        remove_binary_table(table_name, self.data_dir)
+        remove_segmented_table(table_name, self.data_dir)
+
+    def clear(self):
+        self._tables.clear()
+        self._used = 0
+        self._metadata = None
+        self._meta_signature = None
+
+    def _store(self, table_name, records, signature, indexes=None):
+        previous = self._tables.pop(table_name, None)
+        if previous is not None:
+            self._used -= previous.size
+        entry = _PooledTable(records, signature, indexes, _resized(previous, records))
+        self._tables[table_name] = entry
+        self._used += entry.size
+        for name in list(self._tables):
+            if self._used <= self.memory_budget or name == table_name:
+                break
+            if not self._is_pending(name):
+                self._used -= self._tables.pop(name).size
@@ -0,0 +1,153 @@
+"""Compact records: one __slots__ class per set of columns.
+
+A record of a JSON or binary table is an instance of a class generated
+from the table columns, so values sit in fixed slots instead of a dict that
+repeats every column name. Records still behave like mappings (get, [],
+keys, items, in, ==, dict(record)), so code reading them does not care.
+
+Slots are named f0, f1, ... by column position (column names need not be
+identifiers); row_class.fields maps columns to slot names, which lets
+expressions.compile_predicate read a slot directly. All records of one list
+table share the row class of the table schema.
+
+Records written before alter_table added a column lack it in storage;
+mapping_reader builds rows that get the column default instead.
+"""
+from functools import lru_cache
+from operator import attrgetter, methodcaller
+
+
+class Row:
+    """Base of the generated row classes."""
+
+    __slots__ = ()
+    columns = ()
+    fields = {}
+
+    def keys(self):
+        return self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __contains__(self, column):
+        return column in self.fields
+
+    def items(self):
+        return zip(self.columns, self.values())
+
+    def to_dict(self):
+        return dict(zip(self.columns, self.values()))
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return self.columns == other.columns and self.values() == other.values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+@lru_cache(maxsize=None)
+def row_class(columns):
+    """Return the row class for a tuple of column names (created once per tuple)."""
+    columns = tuple(columns)
+    fields = {column: f"f{position}" for position, column in enumerate(columns)}
+    getters = {column: attrgetter(field) for column, field in fields.items()}
+    slots = tuple(fields.values())
+    all_values = attrgetter(*slots) if len(slots) > 1 else lambda row: tuple(getter(row) for getter in getters.values())
+
+    # Constructors are generated, so building a row is straight-line slot assignments.
+    arguments = ", ".join(f"{slot}=None" for slot in slots)
+    body = "".join(f"\n    self.{slot} = {slot}" for slot in slots) or "\n    pass"
+    from_mapping_body = "".join(f"\n    row.{fields[column]} = get({column!r})" for column in columns)
+    namespace = {"new": object.__new__}
+    exec(
+        f"def __init__(self, {arguments}):{body}\n\n"
+        f"def from_mapping(mapping):\n    get = mapping.get\n    row = new(cls){from_mapping_body}\n    return row",
+        namespace,
+    )
+
+    def get(self, column, default=None):
+        getter = getters.get(column)
+        return default if getter is None else getter(self)
+
+    def __getitem__(self, column):
+        return getters[column](self)
+
+    def __setitem__(self, column, value):
+        setattr(self, fields[column], value)
+
+    def values(self):
+        return all_values(self)
+
+    cls = namespace["cls"] = type("Row", (Row,), {
+        "__slots__": slots,
+        "__init__": namespace["__init__"],
+        "columns": columns,
+        "fields": fields,
+        "get": get,
+        "__getitem__": __getitem__,
+        "__setitem__": __setitem__,
+        "values": values,
+        # Build a row from a mapping; missing columns are None.
+        "from_mapping": staticmethod(namespace["from_mapping"]),
+    })
+    return cls
+
+
+def schema_row_class(schema):
+    """Return the row class of a table schema ({column: type}, ID first)."""
+    return row_class(tuple(schema))
+
+
+@lru_cache(maxsize=None)
+def _defaults_reader(cls, defaults):
+    values = dict(defaults)
+    namespace = {"new": object.__new__, "cls": cls}
+    lines = []
+    for position, column in enumerate(cls.columns):
+        if column in values:
+            namespace[f"d{position}"] = values[column]
+            lines.append(f"\n    row.{cls.fields[column]} = get({column!r}, d{position})")
+        else:
+            lines.append(f"\n    row.{cls.fields[column]} = get({column!r})")
+    body = "".join(lines)
+    exec(f"def from_mapping(mapping):\n    get = mapping.get\n    row = new(cls){body}\n    return row", namespace)
+    return namespace["from_mapping"]
+
+
+def mapping_reader(cls, defaults=None):
+    """Return a function building rows of cls from mappings.
+
+    Like cls.from_mapping, but a column missing from the mapping gets its
+    value from defaults ({column: value}) instead of None.
+    """
+    defaults = {column: value for column, value in (defaults or {}).items() if column in cls.fields}
+    if not defaults:
+        return cls.from_mapping
+    return _defaults_reader(cls, tuple(defaults.items()))
+
+
+def value_getter(records, column):
+    """Return a fast getter of column for the records of one table (slot access for rows).
+
+    Like record.get(column): None for a column dict records lack.
+    """
+    if len(records) and isinstance(records[0], Row) and column in records[0].fields:
+        return attrgetter(records[0].fields[column])
+    return methodcaller("get", column)
+
+
+def to_json(value):
+    """json.dumps default= hook serializing rows as objects."""
+    if isinstance(value, Row):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
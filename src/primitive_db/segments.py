@@ -0,0 +1,427 @@
+"""Segmented tables: records split by ID range into segment files.
+
+A segmented table is stored in data/<table>.segments/ as numbered JSON
+files, each holding up to SEGMENT_MAX_ROWS records of one contiguous ID
+range as value lists:
+
+    {"columns": ["ID", ...], "rows": [[1, ...], ...]}
+
+The manifest - a list in the table service info of db_meta.json -
+describes every segment in ID order:
+
+    {"file": 3, "rows": N, "min": {column: v}, "max": {column: v}}
+
+A column holding None somewhere in a segment has no bounds there. Segments
+written before alter_table keep their old columns: a dropped column is
+skipped when they are read and an added one gets its default.
+
+Segment files are never rewritten in place: a changed segment goes to a
+new file, and the replaced file is removed only after metadata points to
+the new one (remove_stale_segments), so a crash in between leaves the old
+manifest valid. A write touches only the segments it changed.
+
+Segments are loaded on first access. A scan skips the segments whose
+bounds rule out the WHERE (expressions.may_match); loaded segments are
+filtered in this process, and when enough of the rest are on disk they are
+read and filtered on a process pool instead, one segment per task, without
+being kept in memory.
+"""
+import copy
+import gc
+import json
+import os
+import shutil
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat, starmap
+from operator import attrgetter
+
+from src.constants import (
+    DATA_DIR,
+    RESERVED_ID_NAME,
+    SEGMENT_MAX_ROWS,
+    SEGMENT_PARALLEL_MIN_SEGMENTS,
+    SEGMENT_SCAN_WORKERS,
+    SEGMENTS_DIR_EXTENSION,
+    TABLE_FILE_EXTENSION,
+)
+from src.primitive_db.expressions import compile_predicate, may_match
+from src.primitive_db.indexes import search_id
+from src.primitive_db.metrics import PHASE_SERIALIZATION, phase
+from src.primitive_db.rows import mapping_reader, row_class, schema_row_class, value_getter
+from src.primitive_db.utils import fsync_directory, write_atomic
+
+# Process pool of parallel scans, started on first use.
+_state = {"executor": None}
+
+
+def get_segments_dirpath(table_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{table_name}{SEGMENTS_DIR_EXTENSION}")
+
+
+def _segment_filepath(dirpath, number):
+    return os.path.join(dirpath, f"{number}{TABLE_FILE_EXTENSION}")
+
+
+def _segment_numbers(dirpath):
+    """Return numbers of the segment files present in a segments directory."""
+    try:
+        names = os.listdir(dirpath)
+    except FileNotFoundError:
+        return []
+    stems = (name[:-len(TABLE_FILE_EXTENSION)] for name in names if name.endswith(TABLE_FILE_EXTENSION))
+    return [int(stem) for stem in stems if stem.isdigit()]
+
+
+def _read_segment(filepath, cls, defaults=None):
+    """Return the records of a segment file as rows of cls.
+
+    A segment written with other columns is read by column name, missing
+    columns getting their defaults.
+
+    The cyclic garbage collector is paused meanwhile: the new rows hold no
+    cycles, and collections triggered by allocating them would rescan every
+    row built so far (about half of the load time).
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if tuple(data["columns"]) == cls.columns:
+            return list(starmap(cls, data["rows"]))
+        columns = data["columns"]
+        make_row = mapping_reader(cls, defaults)
+        return [make_row(dict(zip(columns, values))) for values in data["rows"]]
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def _segment_text(columns, records):
+    return json.dumps({"columns": list(columns), "rows": [record.values() for record in records]})
+
+
+def _scan_segment_file(filepath, columns, where, projection, defaults=None):
+    """Process pool task: read a segment file and return value tuples of its matching rows."""
+    cls = row_class(columns)
+    records = _read_segment(filepath, cls, defaults)
+    if where is not None:
+        records = filter(compile_predicate(where, cls), records)
+    if len(projection) == 1:
+        get = attrgetter(cls.fields[projection[0]])
+        return [(get(record),) for record in records]
+    return list(map(attrgetter(*(cls.fields[column] for column in projection)), records))
+
+
+def _get_executor():
+    if _state["executor"] is None:
+        _state["executor"] = ProcessPoolExecutor(max_workers=SEGMENT_SCAN_WORKERS)
+    return _state["executor"]
+
+
+class _Segment:
+    """A manifest entry and, once loaded, the records of the segment.
+
+    Bounds of a segment changed in memory are only ever widened, so they
+    stay valid for skipping; they are recomputed exactly when it is written.
+    """
+
+    __slots__ = ("number", "rows", "minimums", "maximums", "records", "dirty")
+
+    def __init__(self, number=None, rows=0, minimums=None, maximums=None, records=None, dirty=False):
+        self.number = number
+        self.rows = rows
+        self.minimums = minimums if minimums is not None else {}
+        self.maximums = maximums if maximums is not None else {}
+        self.records = records
+        self.dirty = dirty
+
+    @classmethod
+    def from_entry(cls, entry):
+        return cls(entry["file"], entry["rows"], dict(entry["min"]), dict(entry["max"]))
+
+    def entry(self):
+        return {"file": self.number, "rows": len(self), "min": dict(self.minimums), "max": dict(self.maximums)}
+
+    def __len__(self):
+        return self.rows if self.records is None else len(self.records)
+
+    def refresh(self, columns):
+        """Recompute exact bounds from the loaded records."""
+        self.minimums, self.maximums = {}, {}
+        for column in columns:
+            values = list(map(value_getter(self.records, column), self.records))
+            if values and None not in values:
+                self.minimums[column], self.maximums[column] = min(values), max(values)
+
+    def widen(self, record):
+        """Extend the bounds by a record added or changed in memory."""
+        if len(self) == 1:
+            self.minimums = {column: value for column, value in record.items() if value is not None}
+            self.maximums = dict(self.minimums)
+            return
+        for column in list(self.minimums):
+            value = record.get(column)
+            if value is None:
+                del self.minimums[column], self.maximums[column]
+            elif value < self.minimums[column]:
+                self.minimums[column] = value
+            elif value > self.maximums[column]:
+                self.maximums[column] = value
+
+
+class SegmentedTable:
+    """Records of a segmented table; segment files are read on first access.
+
+    Behaves like a list of records sorted by ID: len() comes from the
+    manifest, positions and IDs are mapped to segments and append goes to
+    the last segment (or a new one once it is full). Segments changed in
+    memory are marked dirty, and only they are written by
+    save_segmented_table. Records changed in place must be reported with
+    touch(), so that their segments are written and their bounds widened.
+    defaults are the values of columns added after some segments were written.
+    """
+
+    def __init__(self, table_name, schema, segments, data_dir=DATA_DIR, defaults=None):
+        self.table_name = table_name
+        self.data_dir = data_dir
+        self.defaults = defaults
+        self.dirpath = get_segments_dirpath(table_name, data_dir)
+        self.schema = schema
+        self.row_class = schema_row_class(schema)
+        self._segments = segments
+        self._offsets = None
+        self._projection = None
+
+    @classmethod
+    def from_records(cls, table_name, schema, records, data_dir=DATA_DIR):
+        """Split records sorted by ID into new dirty segments."""
+        table_class = schema_row_class(schema)
+        records = [record if type(record) is table_class else table_class.from_mapping(record) for record in records]
+        segments = []
+        for start in range(0, len(records), SEGMENT_MAX_ROWS):
+            segment = _Segment(records=records[start:start + SEGMENT_MAX_ROWS], dirty=True)
+            segment.refresh(schema)
+            segments.append(segment)
+        return cls(table_name, schema, segments, data_dir)
+
+    def with_columns(self, columns):
+        """Return a view of the same segments whose scan yields only the given columns."""
+        view = copy.copy(self)
+        view._projection = tuple(columns)
+        return view
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
+
+    def manifest(self):
+        return [segment.entry() for segment in self._segments]
+
+    def _load(self, segment):
+        if segment.records is None:
+            segment.records = _read_segment(
+                _segment_filepath(self.dirpath, segment.number), self.row_class, self.defaults
+            )
+        return segment.records
+
+    def _offsets_list(self):
+        """Return the position of the first record of every segment, plus the total length."""
+        if self._offsets is None:
+            offsets = [0]
+            for segment in self._segments:
+                offsets.append(offsets[-1] + len(segment))
+            self._offsets = offsets
+        return self._offsets
+
+    def _id_maxima(self):
+        return [segment.maximums[RESERVED_ID_NAME] for segment in self._segments]
+
+    def __len__(self):
+        return self._offsets_list()[-1]
+
+    def row(self, position):
+        offsets = self._offsets_list()
+        index = bisect_right(offsets, position) - 1
+        return self._load(self._segments[index])[position - offsets[index]]
+
+    def _iter_range(self, start, stop):
+        offsets = self._offsets_list()
+        index = bisect_right(offsets, start) - 1
+        while start < stop and index < len(self._segments):
+            records = self._load(self._segments[index])
+            end = min(stop, offsets[index + 1])
+            yield from records[start - offsets[index]:end - offsets[index]]
+            start = end
+            index += 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self.row(position) for position in range(start, stop, step)]
+            return list(self._iter_range(start, stop))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self.row(item)
+
+    def __iter__(self):
+        for segment in self._segments:
+            yield from self._load(segment)
+
+    def append(self, record):
+        if not self._segments or len(self._segments[-1]) >= SEGMENT_MAX_ROWS:
+            self._segments.append(_Segment(records=[]))
+            if self._offsets is not None:
+                self._offsets.append(self._offsets[-1])
+        segment = self._segments[-1]
+        self._load(segment).append(record)
+        segment.dirty = True
+        segment.widen(record)
+        if self._offsets is not None:
+            self._offsets[-1] += 1
+
+    def bisect_id(self, record_id, right=False):
+        """Return the position record_id would be inserted at (after equal IDs with right)."""
+        search = bisect_right if right else bisect_left
+        index = search(self._id_maxima(), record_id)
+        if index == len(self._segments):
+            return len(self)
+        records = self._load(self._segments[index])
+        return self._offsets_list()[index] + search_id(records, record_id, right)
+
+    def position_of(self, record_id):
+        """Return the position of record_id or -1; only the segment of its ID range is read."""
+        position = self.bisect_id(record_id)
+        if position < len(self) and self.row(position)[RESERVED_ID_NAME] == record_id:
+            return position
+        return -1
+
+    def touch(self, records):
+        """Mark the segments of records changed in place as dirty and widen their bounds."""
+        maxima = self._id_maxima()
+        for record in records:
+            segment = self._segments[bisect_left(maxima, record[RESERVED_ID_NAME])]
+            segment.dirty = True
+            segment.widen(record)
+
+    def without(self, records):
+        """Return a table without the given records; untouched segments are shared with this one."""
+        maxima = self._id_maxima()
+        removed = {}
+        for record in records:
+            record_id = record[RESERVED_ID_NAME]
+            removed.setdefault(bisect_left(maxima, record_id), set()).add(record_id)
+        segments = []
+        for index, segment in enumerate(self._segments):
+            ids = removed.get(index)
+            if ids is None:
+                segments.append(segment)
+                continue
+            records = self._load(segment)
+            get_id = value_getter(records, RESERVED_ID_NAME)
+            kept = [record for record in records if get_id(record) not in ids]
+            if kept:
+                segments.append(_Segment(None, 0, dict(segment.minimums), dict(segment.maximums), kept, True))
+        return SegmentedTable(self.table_name, self.schema, segments, self.data_dir, self.defaults)
+
+    def matching_segments(self, where):
+        """Return the segments whose bounds allow a row matching where."""
+        if where is None:
+            return list(self._segments)
+        return [segment for segment in self._segments if may_match(where, segment.minimums, segment.maximums)]
+
+    def candidates(self, where):
+        """Return the records of the segments that may match where, loading them."""
+        records = []
+        for segment in self.matching_segments(where):
+            records.extend(self._load(segment))
+        return records
+
+    def scan(self, where):
+        """Yield the records matching where in ID order, skipping segments ruled out by their bounds.
+
+        Loaded segments are filtered here. When at least
+        SEGMENT_PARALLEL_MIN_SEGMENTS of the others are on disk and there is
+        more than one worker, those are read and filtered on the process
+        pool and not kept; otherwise they are loaded first. With
+        with_columns records hold only the projected columns.
+        """
+        segments = self.matching_segments(where)
+        on_disk = [segment.records is None for segment in segments]
+        predicate = compile_predicate(where, self.row_class) if where is not None else None
+        project = row_class(self._projection).from_mapping if self._projection is not None else None
+        results = None
+        if SEGMENT_SCAN_WORKERS > 1 and sum(on_disk) >= SEGMENT_PARALLEL_MIN_SEGMENTS:
+            columns = tuple(self.schema)
+            filepaths = [
+                _segment_filepath(self.dirpath, segment.number)
+                for segment, remote in zip(segments, on_disk) if remote
+            ]
+            projection = self._projection or columns
+            results = _get_executor().map(
+                _scan_segment_file, filepaths, repeat(columns), repeat(where), repeat(projection), repeat(self.defaults)
+            )
+            make_row = row_class(projection)
+
+        for segment, remote in zip(segments, on_disk):
+            if results is not None and remote:
+                for values in next(results):
+                    yield make_row(*values)
+                continue
+            records = self._load(segment)
+            if predicate is not None:
+                records = filter(predicate, records)
+            yield from records if project is None else map(project, records)
+
+
+def load_segmented_table(table_name, schema, manifest, data_dir=DATA_DIR, defaults=None):
+    """Open a segmented table from its manifest; no segment is read yet."""
+    segments = [_Segment.from_entry(entry) for entry in manifest]
+    return SegmentedTable(table_name, schema, segments, data_dir, defaults)
+
+
+def save_segmented_table(table_name, schema, records, data_dir=DATA_DIR):
+    """Write the dirty segments of a table - every segment of a plain list - to new files.
+
+    Returns the SegmentedTable written. Its manifest() has to be saved to
+    metadata before remove_stale_segments drops the replaced files.
+    """
+    if isinstance(records, SegmentedTable):
+        table = records
+    else:
+        table = SegmentedTable.from_records(table_name, schema, records, data_dir)
+    dirty = [segment for segment in table._segments if segment.dirty]
+    if not dirty:
+        return table
+    os.makedirs(table.dirpath, exist_ok=True)
+    number = max(_segment_numbers(table.dirpath), default=0) + 1
+    for segment in dirty:
+        with phase(PHASE_SERIALIZATION):
+            text = _segment_text(table.row_class.columns, segment.records)
+        write_atomic(_segment_filepath(table.dirpath, number), text, sync_directory=False)
+        segment.number = number
+        segment.refresh(schema)
+        segment.dirty = False
+        number += 1
+    fsync_directory(table.dirpath)
+    return table
+
+
+def remove_stale_segments(table_name, manifest, data_dir=DATA_DIR):
+    """Delete segment files the manifest no longer refers to."""
+    live = {entry["file"] for entry in manifest}
+    dirpath = get_segments_dirpath(table_name, data_dir)
+    for number in _segment_numbers(dirpath):
+        if number not in live:
+            try:
+                os.remove(_segment_filepath(dirpath, number))
+            except FileNotFoundError:
+                pass
+
+
+def remove_segmented_table(table_name, data_dir=DATA_DIR):
+    shutil.rmtree(get_segments_dirpath(table_name, data_dir), ignore_errors=True)
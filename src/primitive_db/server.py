@@ -0,0 +1,173 @@
+"""Asyncio TCP server: many clients over one shared engine.
+
+The protocol is one JSON object per line in both directions:
+
+    -> {"id": 1, "command": "select from users where age > 30"}
+    <- {"id": 1, "ok": true, "output": "", "columns": ["ID", ...], "rows": [[1, ...], ...]}
+
+Commands are the REPL commands. They run over the engine's shared table
+pool, so tables are parsed once and stay in memory, but never on the event
+loop thread: reads go to a pool of threads and run side by side, writes go
+to a single writer thread, so they are applied one at a time in arrival
+order. A read-write lock keeps reads out while a write is applied.
+
+Every connection has its own engine session without file access: select
+into, import and stats export would reach files of the server machine.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src.constants import SERVER_HOST, SERVER_MAX_LINE, SERVER_PORT, SERVER_READ_WORKERS
+from src.decorators import set_auto_confirm
+from src.primitive_db.engine import Session, capture_output, execute_captured, recover, use_session
+
+READ_PREFIXES = ("select ", "explain ", "info ")
+READ_COMMANDS = {"list_tables", "cache_stats", "stats"}
+# Commands tied to a single interactive session make no sense for a shared server.
+SESSION_COMMANDS = {"begin", "commit", "rollback", "help", "exit"}
+
+
+def is_read_command(command):
+    lower = command.strip().lower()
+    return lower in READ_COMMANDS or lower.startswith(READ_PREFIXES)
+
+
+def execute_request(command, session=None):
+    """Execute one command in a session (a fresh one without file access by default) and build the response."""
+    lower = command.strip().lower()
+    if lower in SESSION_COMMANDS:
+        return {"ok": False, "output": f"Команда {lower} недоступна в режиме сервера.\n"}
+    with use_session(session or Session(file_access=False)):
+        return execute_captured(command)
+
+
+class ReadWriteLock:
+    """Many readers or one writer; a waiting writer holds new readers back."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writing and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._condition:
+            self._writers_waiting += 1
+            self._condition.wait_for(lambda: not self._writing and not self._readers)
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class DatabaseServer:
+    """Serve the database over TCP. Use start() and close() or serve_forever()."""
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, read_workers=SERVER_READ_WORKERS):
+        self.host = host
+        self.port = port
+        self.read_workers = read_workers
+        self._server = None
+        self._lock = ReadWriteLock()
+        self._readers = None
+        self._writer = None
+
+    async def start(self):
+        set_auto_confirm(True)
+        capture_output(recover)
+        self._readers = ThreadPoolExecutor(self.read_workers, thread_name_prefix="db-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=SERVER_MAX_LINE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for executor in (self._readers, self._writer):
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read(self, command, session):
+        with self._lock.reading():
+            return execute_request(command, session)
+
+    def _write(self, command, session):
+        with self._lock.writing():
+            return execute_request(command, session)
+
+    async def _execute(self, command, session):
+        loop = asyncio.get_running_loop()
+        if is_read_command(command):
+            return await loop.run_in_executor(self._readers, self._read, command, session)
+        return await loop.run_in_executor(self._writer, self._write, command, session)
+
+    async def _handle_client(self, reader, writer):
+        session = Session(file_access=False)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    response = {"id": None, "ok": False, "output": "Ошибка: слишком длинный запрос.\n"}
+                    writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    command = request["command"]
+                    if not isinstance(command, str):
+                        raise TypeError(command)
+                except (ValueError, KeyError, TypeError):
+                    request = {}
+                    response = {"ok": False, "output": "Ошибка: некорректный запрос.\n"}
+                else:
+                    response = await self._execute(command, session)
+                response["id"] = request.get("id")
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT):
+    """Run the server until interrupted."""
+
+    async def main():
+        server = await DatabaseServer(host, port).start()
+        print(f"Сервер базы данных слушает {server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nСервер остановлен.")
@@ -1,7 +1,25 @@
+import csv
 import json
 import os
 
-from src.constants import DATA_DIR, TABLE_FILE_EXTENSION
+from src.constants import (
+    CSV_FILE_EXTENSION,
+    DATA_DIR,
+    JSONL_FILE_EXTENSION,
+    LOG_COMPACTION_MIN_ENTRIES,
+    LOG_COMPACTION_RATIO,
+    LOG_OP_DELETE,
+    LOG_OP_INSERT,
+    LOG_OP_UPDATE,
+    RESERVED_ID_NAME,
+    TABLE_FILE_EXTENSION,
+    TABLE_LOG_EXTENSION,
+)
+from src.primitive_db.metrics import PHASE_FILE_WRITE, PHASE_SERIALIZATION, phase
+from src.primitive_db.rows import mapping_reader, schema_row_class, to_json, value_getter
+
+# Number of entries in each table log by its path, known after a replay or an append.
+_log_lengths = {}
 
 
 def load_metadata(filepath):
@@ -17,33 +35,345 @@ def load_metadata(filepath):
         return {}
 
 
+def fsync_file(filepath):
+    """Flush a file that was written without fsync to disk; a missing file is skipped."""
+    try:
+        with open(filepath, "rb") as f:
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        pass
+
+
+def fsync_directory(dirpath):
+    """Make file creations, renames and removals in a directory durable.
+
+    Systems that can't open a directory (Windows) have nothing to sync.
+    """
+    try:
+        fd = os.open(dirpath or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(filepath, data, sync_directory=True):
+    """Write text or bytes aside and rename them over filepath, so a crash never leaves a torn file.
+
+    The new file is fsynced before the rename; with sync_directory the
+    rename itself is made durable too. Callers writing several files into
+    one directory may sync it once with fsync_directory instead.
+    """
+    temp_filepath = f"{filepath}.tmp"
+    with phase(PHASE_FILE_WRITE):
+        if isinstance(data, str):
+            f = open(temp_filepath, "w", encoding="utf-8")
+        else:
+            f = open(temp_filepath, "wb")
+        with f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filepath, filepath)
+        if sync_directory:
+            fsync_directory(os.path.dirname(filepath))
+
+
 def save_metadata(filepath, data):
     """Persist metadata dictionary to a JSON file with pretty formatting."""
     directory = os.path.dirname(filepath)
     if directory and not os.path.exists(directory):
         os.makedirs(directory, exist_ok=True)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+    with phase(PHASE_SERIALIZATION):
+        text = json.dumps(data)
+    write_atomic(filepath, text)
+
+
+def get_table_filepath(table_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{table_name}{TABLE_FILE_EXTENSION}")
 
 
-def get_table_filepath(table_name):
-    return os.path.join(DATA_DIR, f"{table_name}{TABLE_FILE_EXTENSION}")
+def get_table_log_filepath(table_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{table_name}{TABLE_LOG_EXTENSION}")
 
 
-def load_table_data(table_name):
-    filepath = get_table_filepath(table_name)
+def _iter_log(log_filepath):
+    """Yield the entries of a table log, cutting off a torn tail.
+
+    Every entry is a whole line ending in a newline. A crash during an append
+    leaves a last line that is unterminated or not valid JSON; it and
+    anything after it are truncated away once the valid entries were read,
+    so the next append starts on a clean line. A missing log has no entries.
+    """
+    try:
+        f = open(log_filepath, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        valid_length = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                yield entry
+            valid_length += len(line)
+        if valid_length < os.fstat(f.fileno()).st_size:
+            f.truncate(valid_length)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _replay_log(log_filepath, records, make_row=None):
+    """Apply the table log on top of snapshot records.
+
+    Each log line is a JSON object: inserts and updates carry the full row,
+    deletes carry only the ID. A torn tail (crash during append) ends the
+    replay and is truncated. With make_row logged rows are turned into
+    compact rows.
+    """
+    get_id = value_getter(records, RESERVED_ID_NAME)
+    by_id = {get_id(record): record for record in records}
+    count = 0
+    for entry in _iter_log(log_filepath):
+        op = entry.get("op")
+        if op in (LOG_OP_INSERT, LOG_OP_UPDATE):
+            row = entry["row"]
+            by_id[row[RESERVED_ID_NAME]] = row if make_row is None else make_row(row)
+        elif op == LOG_OP_DELETE:
+            by_id.pop(entry["id"], None)
+        count += 1
+    _log_lengths[log_filepath] = count
+    return list(by_id.values()) if count else records
+
+
+def load_table_data(table_name, schema=None, data_dir=DATA_DIR, defaults=None):
+    """Load table records: the JSON snapshot with the append log replayed on top.
+
+    With the table schema records are compact rows (see rows.py), each built
+    as soon as its object is parsed; without it they are dicts. Stored rows
+    keep the columns they were written with: columns dropped since are
+    skipped and added ones get their defaults ({column: value}).
+    """
+    filepath = get_table_filepath(table_name, data_dir)
+    make_row = mapping_reader(schema_row_class(schema), defaults) if schema is not None else None
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
+            records = json.load(f, object_hook=make_row)
     except FileNotFoundError:
-        return []
+        records = []
+    return _replay_log(get_table_log_filepath(table_name, data_dir), records, make_row)
+
+
+def save_table_data(table_name, data, data_dir=DATA_DIR):
+    """Rewrite the table snapshot and drop its append log."""
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+    with phase(PHASE_SERIALIZATION):
+        text = json.dumps(data if isinstance(data, list) else list(data), default=to_json)
+    write_atomic(get_table_filepath(table_name, data_dir), text)
+    log_filepath = get_table_log_filepath(table_name, data_dir)
+    try:
+        os.remove(log_filepath)
+    except FileNotFoundError:
+        pass
+    _log_lengths[log_filepath] = 0
+
+
+def remove_table_data(table_name, data_dir=DATA_DIR):
+    """Delete the JSON snapshot and the log of a table."""
+    log_filepath = get_table_log_filepath(table_name, data_dir)
+    for filepath in (get_table_filepath(table_name, data_dir), log_filepath):
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+    _log_lengths[log_filepath] = 0
+
+
+def make_insert_entry(record):
+    return {"op": LOG_OP_INSERT, "row": record}
+
 
+def make_update_entry(record):
+    return {"op": LOG_OP_UPDATE, "row": record}
 
-def save_table_data(table_name, data):
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR, exist_ok=True)
-    filepath = get_table_filepath(table_name)
+
+def make_delete_entry(record_id):
+    return {"op": LOG_OP_DELETE, "id": record_id}
+
+
+def _get_log_length(log_filepath):
+    """Return the number of log entries; the first call per log also repairs a torn tail."""
+    if log_filepath not in _log_lengths:
+        _log_lengths[log_filepath] = sum(1 for _ in _iter_log(log_filepath))
+    return _log_lengths[log_filepath]
+
+
+def append_table_log(table_name, entries, data_dir=DATA_DIR):
+    """Append mutation entries to the table log in a single write."""
+    if not entries:
+        return
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+    log_filepath = get_table_log_filepath(table_name, data_dir)
+    length = _get_log_length(log_filepath)
+    with phase(PHASE_SERIALIZATION):
+        payload = "".join(json.dumps(entry, default=to_json) + "\n" for entry in entries)
+    with phase(PHASE_FILE_WRITE), open(log_filepath, "a", encoding="utf-8") as f:
+        f.write(payload)
+    _log_lengths[log_filepath] = length + len(entries)
+
+
+def needs_compaction(table_name, live_rows, data_dir=DATA_DIR):
+    """Return True when the log outgrew the live table by LOG_COMPACTION_RATIO."""
+    length = _get_log_length(get_table_log_filepath(table_name, data_dir))
+    return length >= LOG_COMPACTION_MIN_ENTRIES and length > LOG_COMPACTION_RATIO * live_rows
+
+
+def prefers_snapshot(change_count, live_rows):
+    """Return True when a batch touching change_count rows is cheaper as a snapshot.
+
+    A batch touching at least half of the table costs about as much to write
+    row by row as the whole table does in one go.
+    """
+    return change_count >= LOG_COMPACTION_MIN_ENTRIES and change_count * 2 >= live_rows
+
+
+def save_table_changes(table_name, entries, data, data_dir=DATA_DIR):
+    """Append changes to the log and compact the table once the log is too long."""
+    if prefers_snapshot(len(entries), len(data)):
+        save_table_data(table_name, data, data_dir)
+        return
+    append_table_log(table_name, entries, data_dir)
+    if needs_compaction(table_name, len(data), data_dir):
+        save_table_data(table_name, data, data_dir)
+
+
+def compact_table(table_name, data=None, data_dir=DATA_DIR):
+    """Fold the append log into a fresh snapshot. Returns the live records."""
+    if data is None:
+        data = load_table_data(table_name, data_dir=data_dir)
+    save_table_data(table_name, data, data_dir)
+    return data
+
+
+def write_commit_log(filepath, metadata, changes):
+    """Durably write a transaction: metadata, per-table changes and a commit mark.
+
+    Each line is a JSON object; the last one is {"commit": true}. The file is
+    written in one go and fsynced together with its directory - after that
+    the transaction survives a crash and is replayed by load_commit_log on
+    the next start.
+    """
+    lines = [json.dumps({"metadata": metadata})]
+    lines.extend(json.dumps(change, default=to_json) for change in changes)
+    lines.append(json.dumps({"commit": True}))
     with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    fsync_directory(os.path.dirname(filepath))
 
 
+def load_commit_log(filepath):
+    """Read a transaction written by write_commit_log.
+
+    Returns (metadata, changes), or None if the log is torn (no commit mark).
+    Raises FileNotFoundError if there is no log.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    try:
+        entries = [json.loads(line) for line in lines if line.strip()]
+    except json.JSONDecodeError:
+        return None
+    if len(entries) < 2 or entries[-1] != {"commit": True} or "metadata" not in entries[0]:
+        return None
+    return entries[0]["metadata"], entries[1:-1]
+
+
+def remove_commit_log(filepath):
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+
+def iter_csv_rows(filepath, columns):
+    """Stream CSV rows as lists of strings in column order.
+
+    A first row consisting of the column names is treated as a header and
+    may list them in any order; otherwise cells are taken positionally.
+    """
+    with open(filepath, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        order = None
+        for row in reader:
+            if order is None:
+                if sorted(cell.strip() for cell in row) == sorted(columns):
+                    positions = {cell.strip(): position for position, cell in enumerate(row)}
+                    order = [positions[column] for column in columns]
+                    continue
+                order = list(range(len(columns)))
+            if not row:
+                continue
+            if len(row) != len(columns):
+                yield row
+                continue
+            yield [row[position] for position in order]
+
+
+def iter_jsonl_rows(filepath, columns):
+    """Stream JSONL rows as value lists in column order.
+
+    Each line is either an object keyed by column names or a list of values.
+    Lines that can't be decoded are yielded as None.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+                continue
+            if isinstance(item, dict):
+                if len(item) != len(columns):
+                    yield None
+                    continue
+                yield [item.get(column) for column in columns]
+            elif isinstance(item, list):
+                yield item
+            else:
+                yield None
+
+
+def write_rows(filepath, columns, rows):
+    """Stream records into a CSV (with header) or JSONL file. Returns the row count.
+
+    Raises ValueError for other file extensions.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in (CSV_FILE_EXTENSION, JSONL_FILE_EXTENSION):
+        raise ValueError(f"Некорректное значение: {filepath}. Попробуйте снова.")
+    count = 0
+    with open(filepath, "w", encoding="utf-8", newline="") as f:
+        if extension == CSV_FILE_EXTENSION:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for record in rows:
+                writer.writerow([record.get(column, "") for column in columns])
+                count += 1
+        else:
+            for record in rows:
+                f.write(json.dumps({column: record.get(column) for column in columns}) + "\n")
+                count += 1
+    return count
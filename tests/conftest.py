@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# The engine opens its database at import time, so it is pointed at a scratch directory first.
+_ENGINE_HOME = tempfile.mkdtemp(prefix="primitive_db_tests_")
+os.environ["PRIMITIVE_DB_HOME"] = _ENGINE_HOME
+
+from src.decorators import set_auto_confirm  # noqa: E402
+from src.primitive_db import engine  # noqa: E402
+from src.primitive_db.database import Database  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "db")
+
+
+@pytest.fixture
+def db(db_path):
+    """A Database in a fresh directory, committing every change at once."""
+    database = Database(db_path, autocommit=True)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def run():
+    """Run engine commands against an empty engine database; returns execute_captured's result dict."""
+    pool = engine.get_pool()
+    if pool.in_transaction:
+        pool.rollback()
+    pool.clear()
+    for name in os.listdir(_ENGINE_HOME):
+        path = os.path.join(_ENGINE_HOME, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    engine._current_session.get().prepared.clear()
+    set_auto_confirm(True)
+    yield engine.execute_captured
+    set_auto_confirm(False)
+    if pool.in_transaction:
+        pool.rollback()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_ENGINE_HOME, ignore_errors=True)
@@ -0,0 +1,84 @@
+import pytest
+
+from src.constants import AGG_AVG, AGG_COUNT, AGG_MAX, AGG_MIN, AGG_SUM
+from src.primitive_db import core
+from src.primitive_db.aggregates import ALL_COLUMNS, aggregate_rows, item_label
+from src.primitive_db.indexes import SortedIndex
+
+RECORDS = [
+    {"ID": 1, "name": "Ann", "age": 30, "city": "A"},
+    {"ID": 2, "name": "Bob", "age": 25, "city": "B"},
+    {"ID": 3, "name": "Eve", "age": None, "city": "A"},
+    {"ID": 4, "name": "Kim", "age": 41, "city": "A"},
+]
+ITEMS = [
+    (AGG_COUNT, ALL_COLUMNS),
+    (AGG_COUNT, "age"),
+    (AGG_SUM, "age"),
+    (AGG_AVG, "age"),
+    (AGG_MIN, "name"),
+    (AGG_MAX, "age"),
+]
+
+
+def test_item_labels():
+    assert [item_label(item) for item in ITEMS[:3]] == ["count(*)", "count(age)", "sum(age)"]
+    assert item_label((None, "city")) == "city"
+
+
+def test_aggregates_skip_nulls():
+    (row,) = aggregate_rows(RECORDS, ITEMS)
+    assert row == {"count(*)": 4, "count(age)": 3, "sum(age)": 96, "avg(age)": 32.0, "min(name)": "Ann", "max(age)": 41}
+
+
+def test_no_rows_give_one_row():
+    (row,) = aggregate_rows([], ITEMS)
+    assert row == {
+        "count(*)": 0, "count(age)": 0, "sum(age)": None, "avg(age)": None, "min(name)": None, "max(age)": None,
+    }
+    assert list(aggregate_rows([], [(None, "city"), (AGG_COUNT, ALL_COLUMNS)], group_by="city")) == []
+
+
+def test_group_by_keeps_first_appearance_order():
+    rows = list(aggregate_rows(RECORDS, [(AGG_SUM, "age"), (None, "city"), (AGG_COUNT, ALL_COLUMNS)], group_by="city"))
+    assert rows == [{"sum(age)": 71, "city": "A", "count(*)": 3}, {"sum(age)": 25, "city": "B", "count(*)": 1}]
+
+
+def test_whole_table_answers_skip_the_scan():
+    indexes = {"age": SortedIndex("age").build(RECORDS[:2] + RECORDS[3:])}
+    items = [(AGG_COUNT, ALL_COLUMNS), (AGG_MIN, "ID"), (AGG_MAX, "ID"), (AGG_MIN, "age"), (AGG_MAX, "age")]
+    (row,) = core.aggregate(RECORDS, items, indexes=indexes)
+    assert list(row.values()) == [4, 1, 4, 25, 41]
+    (row,) = core.aggregate([], [(AGG_MIN, "ID")])
+    assert row == {"min(ID)": None}
+
+
+@pytest.mark.parametrize("layout", ["rows", "columnar"])
+def test_aggregate_commands(run, layout):
+    run("create_table people name:str age:int city:str")
+    run("insert into people values (\"Ann\", 30, \"A\"), (\"Bob\", 25, \"B\"), (\"Eve\", 41, \"A\")")
+    assert run(f"set_layout people {layout}")["ok"]
+    result = run("select count(*), sum(age), avg(age), min(name), max(age) from people")
+    assert result["columns"] == ["count(*)", "sum(age)", "avg(age)", "min(name)", "max(age)"]
+    assert result["rows"] == [[3, 96, 32.0, "Ann", 41]]
+    assert run("select city, count(*), max(age) from people group by city")["rows"] == [["A", 2, 41], ["B", 1, 25]]
+    assert run("select count(*) from people where age > 26")["rows"] == [[2]]
+    assert run("select avg(age) from people where age > 100")["rows"] == [[None]]
+    run("create_index people age sorted")
+    assert run("select min(age), max(age), min(ID), max(ID) from people")["rows"] == [[25, 41, 1, 3]]
+
+
+@pytest.mark.parametrize(
+    "command, error",
+    [
+        ("select sum(name) from people", "Функция sum неприменима к столбцу name типа str"),
+        ("select name, count(*) from people", "Некорректное значение: name"),
+        ("select count(*) from people group by missing", "Некорректное значение: missing"),
+        ("select foo(age) from people", "Некорректное значение: foo(age)"),
+    ],
+)
+def test_aggregate_errors(run, command, error):
+    run("create_table people name:str age:int")
+    result = run(command)
+    assert not result["ok"]
+    assert error in result["output"]
@@ -0,0 +1,111 @@
+import pytest
+
+from src.primitive_db.database import Database
+from src.primitive_db.errors import ColumnNotFoundError, TransactionError, ValidationError
+
+# (layout, storage) of the four ways a table is held.
+LAYOUTS = {
+    "json": ("rows", "json"),
+    "binary": ("rows", "binary"),
+    "segmented": ("rows", "segmented"),
+    "columnar": ("columnar", "json"),
+}
+
+
+@pytest.fixture(params=list(LAYOUTS))
+def users(request, db):
+    layout, storage = LAYOUTS[request.param]
+    table = db.create_table("users", ["name:str", "age:int"])
+    table.insert_many([["Ann", 30], ["Bob", 25]])
+    if storage != "json":
+        db.convert_table("users", storage)
+    if layout != "rows":
+        db.set_layout("users", layout)
+    return table
+
+
+def _reopened(db):
+    return Database(db.path, autocommit=True).table("users")
+
+
+def _rows(table, where=None, columns=("name", "city", "active")):
+    return [[record[column] for column in columns] for record in table.select(where)]
+
+
+def test_added_columns_read_their_default_or_none(db, users):
+    db.add_column("users", "city:str")
+    db.add_column("users", "active:bool", True)
+    db.add_column("users", "score:int")
+    users.insert(["Eve", 41, "Rome", False, 7])
+    expected = [["Ann", None, True], ["Bob", None, True], ["Eve", "Rome", False]]
+    for table in (users, _reopened(db)):
+        assert _rows(table) == expected
+        assert _rows(table, "city = \"Rome\"") == [["Eve", "Rome", False]]
+        assert _rows(table, "city != \"Rome\"") == expected[:2]
+        assert _rows(table, "score > 0 and active = false") == expected[2:]
+        assert _rows(table, "score < 5") == []
+        assert _rows(table, "not (score < 5)") == expected
+        assert _rows(table, "city < \"S\"") == [["Eve", "Rome", False]]
+        assert table.count("score between 0 and 10") == 1
+
+
+def test_nulls_survive_updates_deletes_and_compact(db, users):
+    db.add_column("users", "score:int")
+    users.update({"score": 5}, "name = \"Bob\"")
+    users.insert(["Eve", 41, 7])
+    users.delete("score = 7")
+    assert _rows(users, columns=("name", "score")) == [["Ann", None], ["Bob", 5]]
+    db.compact("users")
+    table = _reopened(db)
+    assert _rows(table, columns=("name", "score")) == [["Ann", None], ["Bob", 5]]
+    table.update({"age": 42}, "name = \"Ann\"")
+    assert _rows(_reopened(db), columns=("age", "score")) == [[42, None], [25, 5]]
+
+
+def test_dropped_columns_disappear(db, users):
+    db.add_column("users", "city:str", "Oslo")
+    db.drop_column("users", "age")
+    users.insert(["Eve", "Rome"])
+    assert users.columns == ["ID", "name", "city"]
+    assert [dict(record) for record in _reopened(db).select()] == [
+        {"ID": 1, "name": "Ann", "city": "Oslo"},
+        {"ID": 2, "name": "Bob", "city": "Oslo"},
+        {"ID": 3, "name": "Eve", "city": "Rome"},
+    ]
+    with pytest.raises(ValidationError):
+        db.add_column("users", "age:int")
+    db.compact("users")
+    db.add_column("users", "age:int")
+    assert _rows(_reopened(db), columns=("name", "age")) == [["Ann", None], ["Bob", None], ["Eve", None]]
+
+
+def test_alter_table_errors(db, users):
+    with pytest.raises(ValidationError):
+        db.add_column("users", "name:str")
+    with pytest.raises(ValidationError):
+        db.add_column("users", "city:str", 5)
+    with pytest.raises(ValidationError):
+        db.add_column("users", "city:text")
+    with pytest.raises(ValidationError):
+        db.drop_column("users", "ID")
+    with pytest.raises(ColumnNotFoundError):
+        db.drop_column("users", "missing")
+    db.begin()
+    with pytest.raises(TransactionError):
+        db.add_column("users", "city:str")
+    db.rollback()
+    assert users.columns == ["ID", "name", "age"]
+
+
+def test_alter_table_commands(run):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+    assert run("set_layout users columnar")["ok"]
+    assert run("alter_table users add age:int")["ok"]
+    assert run("alter_table users add active:bool default true")["ok"]
+    assert run("select name, age, active from users")["rows"] == [["Ann", None, True]]
+    assert run("alter_table users drop age")["ok"]
+    assert run("select from users")["columns"] == ["ID", "name", "active"]
+    assert not run("alter_table users add active:bool")["ok"]
+    assert not run("alter_table users drop age")["ok"]
+    assert not run("alter_table users rename name")["ok"]
@@ -0,0 +1,145 @@
+import builtins
+import io
+import json
+
+import pytest
+
+from src.primitive_db import utils
+from src.primitive_db.batch import run_batch, run_script, split_statements
+
+
+def _run(statements, **kwargs):
+    out = io.StringIO()
+    code = run_batch(statements, out=out, **kwargs)
+    return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_split_statements():
+    text = '-- comment\n# another\ncreate_table t name:str\n\ninsert into t values ("a;b"); select from t ;\n'
+    assert split_statements(text) == ["create_table t name:str", 'insert into t values ("a;b")', "select from t"]
+
+
+def test_batch_commits_once(run):
+    code, results = _run([
+        "create_table users name:str age:int",
+        "insert into users values (\"Ann\", 30)",
+        "insert into users values (\"Bob\", 25)",
+        "update users set age = 31 where name = \"Ann\"",
+        "select name, age from users where age > 26",
+    ])
+    assert code == 0
+    assert [result["ok"] for result in results[:-1]] == [True] * 5
+    assert results[4]["rows"] == [["Ann", 31]]
+    assert results[-1]["committed"] is True
+    assert (results[-1]["tables"], results[-1]["changes"]) == (1, 3)
+    assert run("select name from users")["rows"] == [["Ann"], ["Bob"]]
+
+
+def test_changes_count_tables_saved_whole(run, monkeypatch):
+    monkeypatch.setattr(utils, "LOG_COMPACTION_MIN_ENTRIES", 2)
+    run("create_table users name:str")
+    statements = ["insert into users values (\"Ann\"), (\"Bob\"), (\"Eve\")", "delete from users where ID = 1"]
+    code, results = _run(statements, auto_confirm=True)
+    assert code == 0
+    assert (results[-1]["tables"], results[-1]["changes"]) == (1, 4)
+
+
+def test_first_failure_rolls_back(run):
+    run("create_table users name:str")
+    code, results = _run(
+        ["insert into users values (\"Ann\")", "select from missing", "insert into users values (\"Bob\")"],
+    )
+    assert code == 1
+    assert results[-1] == {"ok": False, "rolled_back": True}
+    assert [result.get("statement") for result in results[:-1]] == [1, 2]
+    assert run("select from users")["rows"] == []
+
+
+def test_autocommit_runs_every_statement(run):
+    run("create_table users name:str")
+    code, results = _run(
+        ["insert into users values (\"Ann\")", "insert into users values (1)", "insert into users values (\"Bob\")"],
+        autocommit=True,
+    )
+    assert code == 1
+    assert [result["ok"] for result in results] == [True, False, True]
+    assert run("select name from users")["rows"] == [["Ann"], ["Bob"]]
+
+
+def test_select_into_writes_its_file(run, tmp_path):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+    target = tmp_path / "users.jsonl"
+    code, results = _run([f"select name from users into {target}"])
+    assert code == 0
+    assert "Выгружено записей: 1" in results[0]["output"]
+    assert "rows" not in results[0]
+    assert target.read_text(encoding="utf-8") == '{"name": "Ann"}\n'
+
+    code, results = _run([f"select name from users into {tmp_path / 'users.txt'}"])
+    assert code == 1
+    assert not results[0]["ok"]
+
+
+@pytest.mark.parametrize("answer", ["n", EOFError])
+def test_declined_confirmation_fails_the_statement(run, monkeypatch, answer):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+
+    def fake_input(prompt):
+        if answer is EOFError:
+            raise EOFError
+        return answer
+
+    monkeypatch.setattr(builtins, "input", fake_input)
+    code, results = _run(["delete from users where ID = 1"])
+    assert code == 1
+    assert not results[0]["ok"]
+    assert "Операция отменена." in results[0]["output"]
+    assert results[-1]["rolled_back"] is True
+    assert run("select name from users")["rows"] == [["Ann"]]
+
+    code, results = _run(["delete from users where ID = 1"], auto_confirm=True)
+    assert code == 0
+
+
+def test_run_script(run, tmp_path):
+    script = tmp_path / "setup.sql"
+    script.write_text("create_table users name:str\ninsert into users values (\"Ann\");\n", encoding="utf-8")
+    out = io.StringIO()
+    assert run_script(str(script), out=out) == 0
+    assert run("select name from users")["rows"] == [["Ann"]]
+    assert run_script(str(tmp_path / "missing.sql"), out=out) == 2
+
+
+@pytest.mark.parametrize(
+    "statement",
+    ["commit", "BEGIN", "rollback", "compact users", "convert_table users binary", "alter_table users add age:int"],
+)
+def test_one_transaction_batch_refuses_autocommit_only_commands(run, statement):
+    run("create_table users name:str")
+    code, results = _run(["insert into users values (\"Ann\")", statement, "insert into users values (\"Bob\")"])
+    assert code == 1
+    assert [result.get("ok") for result in results] == [True, False, False]
+    assert "--autocommit" in results[1]["output"]
+    assert results[-1] == {"ok": False, "rolled_back": True}
+    assert run("select from users")["rows"] == []
+    assert "Формат на диске: json" in run("info users")["output"]
+
+
+def test_autocommit_batch_runs_transaction_and_storage_commands(run):
+    run("create_table users name:str")
+    code, results = _run(
+        [
+            "begin",
+            "insert into users values (\"Ann\")",
+            "commit",
+            "compact users",
+            "alter_table users add age:int default 1",
+            "insert into users values (\"Bob\", 2)",
+        ],
+        autocommit=True,
+    )
+    assert code == 0
+    assert all(result["ok"] for result in results)
+    assert run("select name, age from users")["rows"] == [["Ann", 1], ["Bob", 2]]
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from benchmarks import __main__ as bench_main
+from benchmarks import runner
+from benchmarks.cases import ALL_CASES, Case
+from benchmarks.data import BENCH_SCHEMA, generate_records, generate_values, write_csv
+
+SIZE = 200
+
+
+def test_generated_values_follow_the_schema():
+    rows = list(generate_values(BENCH_SCHEMA, 50, seed=3))
+    assert rows == list(generate_values(BENCH_SCHEMA, 50, seed=3))
+    assert rows != list(generate_values(BENCH_SCHEMA, 50, seed=4))
+    types = {"int": int, "str": str, "bool": bool}
+    for row in rows:
+        assert [type(value) for value in row] == [types[column_type] for column_type in BENCH_SCHEMA.values()]
+    assert list(next(generate_records(BENCH_SCHEMA, 1, seed=3))) == list(BENCH_SCHEMA)
+
+
+def test_write_csv(tmp_path):
+    filepath = tmp_path / "bench.csv"
+    write_csv(str(filepath), BENCH_SCHEMA, 10)
+    lines = filepath.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == ",".join(BENCH_SCHEMA)
+    assert len(lines) == 11
+
+
+def test_measure_reports_best_time_and_peak_memory():
+    setups = []
+    case = Case("test.case", lambda size: setups.append(size) or size, lambda size: bytearray(size), lambda size: 2)
+    result = runner.measure(case, 100_000, repeat=2)
+    assert setups == [100_000] * 3
+    assert result["case"] == "test.case"
+    assert result["operations"] == 2
+    assert result["per_operation"] == pytest.approx(result["seconds"] / 2, rel=0.01)
+    assert result["peak_memory"] >= 100_000
+
+
+def _document(seconds, peak_memory, case="core.full_scan"):
+    return {"results": [{"case": case, "size": 10, "seconds": seconds, "peak_memory": peak_memory}]}
+
+
+@pytest.mark.parametrize(
+    "baseline, new, regressed",
+    [
+        (_document(0.1, 10**6), _document(0.12, 10**6), []),
+        (_document(0.1, 10**6), _document(0.2, 10**6), ["seconds"]),
+        (_document(0.1, 10**6), _document(0.1, 3 * 10**6), ["peak_memory"]),
+        (_document(0.001, 1000), _document(0.004, 4000), []),
+        (_document(0.1, 10**6, case="other"), _document(1.0, 10**7), []),
+    ],
+)
+def test_compare_flags_regressions_over_the_threshold(baseline, new, regressed):
+    regressions = runner.compare(new, baseline)
+    assert [metric for _, _, metric, *_ in regressions] == regressed
+    if regressions:
+        assert "core.full_scan" in runner.format_regressions(regressions)
+
+
+def test_results_round_trip(tmp_path):
+    filepath = str(tmp_path / "results.json")
+    assert runner.load_results(filepath) is None
+    runner.save_results(filepath, _document(0.1, 1))
+    assert runner.load_results(filepath) == _document(0.1, 1)
+
+
+def test_every_case_runs(run):
+    document = runner.run_benchmarks(ALL_CASES, [SIZE], repeat=1, progress=lambda line: None)
+    assert [result["case"] for result in document["results"]] == [case.name for case in ALL_CASES]
+    assert all(result["seconds"] >= 0 and result["peak_memory"] > 0 for result in document["results"])
+
+
+def test_main_compares_with_the_baseline(run, tmp_path, monkeypatch):
+    # main points PRIMITIVE_DB_HOME at a scratch directory of its own.
+    monkeypatch.setenv("PRIMITIVE_DB_HOME", os.environ["PRIMITIVE_DB_HOME"])
+    output, baseline = tmp_path / "results.json", tmp_path / "baseline.json"
+    arguments = ["--sizes", str(SIZE), "--cases", "core.point", "--repeat", "1"]
+    arguments += ["--output", str(output), "--baseline", str(baseline)]
+    assert bench_main.main(arguments) == 0
+    assert bench_main.main(arguments + ["--save-baseline"]) == 0
+    assert json.loads(output.read_text(encoding="utf-8")) == json.loads(baseline.read_text(encoding="utf-8"))
+
+    document = json.loads(baseline.read_text(encoding="utf-8"))
+    for result in document["results"]:
+        result["seconds"] = result["peak_memory"] = 1e-9
+    baseline.write_text(json.dumps(document), encoding="utf-8")
+    monkeypatch.setattr(runner, "NOISE_FLOOR", {"seconds": 0, "peak_memory": 0})
+    assert bench_main.main(arguments) == 1
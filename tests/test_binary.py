@@ -0,0 +1,178 @@
+import json
+import os
+
+import pytest
+
+from src.constants import BINARY_LEGACY_MAGIC, BINARY_MAGIC
+from src.primitive_db import binary
+from src.primitive_db.binary import (
+    _HEADER,
+    BinaryTable,
+    _RowCodec,
+    get_binary_filepath,
+    get_heap_filepath,
+    load_binary_table,
+    save_binary_table,
+)
+from src.primitive_db.database import Database
+from src.primitive_db.errors import ValidationError
+from src.primitive_db.utils import get_table_filepath
+
+SCHEMA = {"ID": "int", "name": "str", "age": "int", "active": "bool"}
+
+
+@pytest.fixture
+def users(db):
+    table = db.create_table("users", ["name:str", "age:int", "active:bool"])
+    table.insert_many([["Ann", 30, True], ["Борис", 25, False], ["Eve", 41, True]])
+    db.convert_table("users", "binary")
+    return table
+
+
+def test_binary_file_round_trip(tmp_path):
+    records = [
+        {"ID": 1, "name": "Ann", "age": -5, "active": True},
+        {"ID": 4, "name": "", "age": 2**40, "active": False},
+    ]
+    save_binary_table("t", SCHEMA, records, str(tmp_path))
+    table = load_binary_table("t", str(tmp_path))
+
+    assert isinstance(table, BinaryTable)
+    assert len(table) == 2
+    assert list(table) == records
+    assert table.position_of(4) == 1
+    assert table.position_of(2) == -1
+    assert list(table.with_columns(["age"])) == [{"age": -5}, {"age": 2**40}]
+
+
+def test_missing_and_foreign_files(tmp_path):
+    assert load_binary_table("missing", str(tmp_path)) == []
+    with open(get_binary_filepath("t", str(tmp_path)), "wb") as f:
+        f.write(b"JUNK" + bytes(12))
+    open(get_heap_filepath("t", str(tmp_path)), "wb").close()
+    with pytest.raises(ValueError):
+        BinaryTable("t", str(tmp_path))
+
+
+def test_convert_table_rewrites_the_files(db, users):
+    data_dir = db.pool.data_dir
+    assert os.path.exists(get_binary_filepath("users", data_dir))
+    assert not os.path.exists(get_table_filepath("users", data_dir))
+    assert isinstance(db.pool.get_table("users"), BinaryTable)
+    assert [record["name"] for record in users.select("age > 26")] == ["Ann", "Eve"]
+
+
+def test_changes_are_written_in_place_and_survive_reload(db, users):
+    users.insert(["Kim", 19, False])
+    users.update({"name": "Анна", "age": 31}, "ID = 1")
+    users.delete("name = \"Eve\"")
+    db.close()
+
+    db = Database(db.path, autocommit=True)
+    assert list(db.table("users").select()) == [
+        {"ID": 1, "name": "Анна", "age": 31, "active": True},
+        {"ID": 2, "name": "Борис", "age": 25, "active": False},
+        {"ID": 4, "name": "Kim", "age": 19, "active": False},
+    ]
+
+
+def test_convert_back_to_json(db, users):
+    users.update({"age": 26}, "ID = 2")
+    db.convert_table("users", "json")
+    assert not os.path.exists(get_binary_filepath("users", db.pool.data_dir))
+    assert [record["age"] for record in users.select()] == [30, 26, 41]
+
+
+def test_convert_errors(db, users):
+    with pytest.raises(ValidationError):
+        db.convert_table("users", "binary")
+    with pytest.raises(ValidationError):
+        db.convert_table("users", "xml")
+
+
+def test_convert_command(run):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+    assert run("convert_table users binary")["ok"]
+    assert "Формат на диске: binary" in run("info users")["output"]
+    assert run("select from users")["rows"] == [[1, "Ann"]]
+    assert not run("convert_table users")["ok"]
+
+
+def test_null_values_round_trip(tmp_path):
+    records = [
+        {"ID": 1, "name": None, "age": None, "active": None},
+        {"ID": 2, "name": "Ann", "age": 0, "active": False},
+    ]
+    save_binary_table("t", SCHEMA, records, str(tmp_path))
+    table = load_binary_table("t", str(tmp_path))
+    assert list(table) == records
+    assert list(table.with_columns(["active", "name"])) == [
+        {"active": None, "name": None},
+        {"active": False, "name": "Ann"},
+    ]
+
+
+def test_files_without_null_flags_are_read_and_rewritten(db, users):
+    data_dir = db.pool.data_dir
+    records = list(users.select())
+    codec = _RowCodec(SCHEMA, null_flags=False)
+    schema_bytes = json.dumps(list(SCHEMA.items())).encode("utf-8")
+    rows = bytearray(_HEADER.pack(BINARY_LEGACY_MAGIC, len(records), len(schema_bytes)) + schema_bytes)
+    rows += b"\x00" * (-len(rows) % 8)
+    heap = bytearray()
+    for record in records:
+        rows += codec.pack(record, heap, 0)
+    with open(get_binary_filepath("users", data_dir), "wb") as f:
+        f.write(rows)
+    with open(get_heap_filepath("users", data_dir), "wb") as f:
+        f.write(heap)
+    db.close()
+
+    db = Database(db.path, autocommit=True)
+    assert list(db.table("users").select()) == records
+    db.table("users").update({"age": 26}, "ID = 2")
+    with open(get_binary_filepath("users", data_dir), "rb") as f:
+        assert f.read(4) == BINARY_MAGIC
+    db.add_column("users", "city:str")
+    db.close()
+    db = Database(db.path, autocommit=True)
+    assert [(record["age"], record["city"]) for record in db.table("users").select()] == [
+        (30, None),
+        (26, None),
+        (41, None),
+    ]
+
+
+def test_updates_keep_open_views_unchanged(db, users):
+    view = load_binary_table("users", db.pool.data_dir)
+    users.update({"name": "Анна"}, "ID = 1")
+    assert view[0]["name"] == "Ann"
+    assert [record["name"] for record in load_binary_table("users", db.pool.data_dir)] == ["Анна", "Борис", "Eve"]
+
+
+@pytest.mark.parametrize("failing_write", [1, 2, 3])
+def test_interrupted_append_leaves_a_readable_table(db, users, monkeypatch, failing_write):
+    writes = []
+    write_synced = binary._write_synced
+
+    def crashing_write(filepath, offset, data):
+        writes.append(filepath)
+        if len(writes) == failing_write:
+            raise OSError(28, "No space left on device")
+        write_synced(filepath, offset, data)
+
+    monkeypatch.setattr(binary, "_write_synced", crashing_write)
+    with pytest.raises(OSError):
+        users.insert(["Kim", 19, False])
+    monkeypatch.undo()
+    assert writes[0] == get_heap_filepath("users", db.pool.data_dir)
+    db.close()
+
+    db = Database(db.path, autocommit=True)
+    table = db.table("users")
+    assert [record["name"] for record in table.select()] == ["Ann", "Борис", "Eve"]
+    table.insert(["Ульяна", 22, True])
+    db.close()
+    db = Database(db.path, autocommit=True)
+    assert [record["name"] for record in db.table("users").select()] == ["Ann", "Борис", "Eve", "Ульяна"]
@@ -0,0 +1,82 @@
+import json
+import random
+
+import pytest
+
+from src.primitive_db import indexes
+from src.primitive_db.errors import ValidationError
+from src.primitive_db.indexes import SortedIndex
+from src.primitive_db.rows import row_class
+
+Person = row_class(("ID", "age"))
+
+
+@pytest.mark.parametrize("single_changes_max", [0, 1000])
+def test_sorted_index_batches_match_single_changes(monkeypatch, single_changes_max):
+    monkeypatch.setattr(indexes, "_SINGLE_CHANGES_MAX", single_changes_max)
+    rng = random.Random(7)
+    records = [Person(record_id, rng.randrange(50)) for record_id in range(1, 201)]
+    index = SortedIndex("age").build(records[:100])
+
+    index.add_many(records[100:] + [Person(999, None)])
+    index.remove_many(records[::3])
+
+    kept = [record for position, record in enumerate(records) if position % 3]
+    assert index._entries == sorted((record["age"], record["ID"]) for record in kept)
+    assert sorted(index.range(10, 20)) == sorted(record["ID"] for record in kept if 10 <= record["age"] <= 20)
+
+
+def test_insert_many_keeps_indexes_current(db):
+    people = db.create_table("people", ["name:str", "age:int"])
+    db.create_index("people", "age", "sorted")
+    db.create_index("people", "name")
+    ids = people.insert_many([[f"p{number}", number % 7] for number in range(3000)])
+
+    assert ids == list(range(1, 3001))
+    assert people.count("age = 3") == len([number for number in range(3000) if number % 7 == 3])
+    assert [record["ID"] for record in people.select("name = \"p42\"")] == [43]
+    people.update({"age": 100}, "age < 2")
+    assert people.count("age between 99 and 101") == len([number for number in range(3000) if number % 7 < 2])
+    people.delete("age between 5 and 6")
+    assert db.pool.get_indexes("people")["age"].max() == 100
+
+
+def test_insert_many_is_all_or_nothing(db):
+    people = db.create_table("people", ["name:str", "age:int"])
+    with pytest.raises(ValidationError, match="Строка 2"):
+        people.insert_many([["Ann", 30], ["Bob", "old"]])
+    assert people.count() == 0
+    assert people.insert_many([{"name": "Ann", "age": 30}, ("Bob", 25)]) == [1, 2]
+
+
+def test_multi_row_insert_command(run):
+    run("create_table people name:str age:int")
+    result = run("insert into people values (\"Ann\", 30), (\"Bob\", \"x\"), (\"Eve\", 41)")
+    assert result["ok"]
+    assert "Загружено записей: 2, отклонено: 1" in result["output"]
+    assert run("select name from people")["rows"] == [["Ann"], ["Eve"]]
+
+
+def test_import_csv_and_jsonl(run, tmp_path):
+    run("create_table people name:str age:int active:bool")
+    csv_path = tmp_path / "people.csv"
+    csv_path.write_text("age,name,active\n30,Ann,true\nold,Bob,false\n25,Eve,false\n", encoding="utf-8")
+    jsonl_path = tmp_path / "people.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"name": "Kim", "age": 19, "active": True}) + "\n" + json.dumps(["Dan", 50, False]) + "\n{bad\n",
+        encoding="utf-8",
+    )
+
+    assert "Загружено записей: 2, отклонено: 1" in run(f"import people from {csv_path}")["output"]
+    assert "Загружено записей: 2, отклонено: 1" in run(f"import people from {jsonl_path}")["output"]
+    assert run("select name, age, active from people")["rows"] == [
+        ["Ann", 30, True], ["Eve", 25, False], ["Kim", 19, True], ["Dan", 50, False],
+    ]
+
+
+def test_import_errors(run, tmp_path):
+    run("create_table people name:str")
+    assert not run(f"import people from {tmp_path / 'missing.csv'}")["ok"]
+    assert not run(f"import people from {tmp_path / 'people.txt'}")["ok"]
+    assert not run(f"import nobody from {tmp_path / 'people.csv'}")["ok"]
+    assert not run("import people")["ok"]
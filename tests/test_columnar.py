@@ -0,0 +1,124 @@
+import pytest
+
+from src.primitive_db.columnar import ColumnarTable, and_masks, invert_mask, mask_positions, or_masks
+from src.primitive_db.database import Database
+from src.primitive_db.errors import ValidationError
+from src.primitive_db.parser import parse_where_clause
+
+SCHEMA = {"ID": "int", "name": "str", "age": "int", "active": "bool"}
+RECORDS = [
+    {"ID": 1, "name": "Ann", "age": 30, "active": True},
+    {"ID": 2, "name": "Bob", "age": 25, "active": False},
+    {"ID": 3, "name": "Eve", "age": 41, "active": True},
+    {"ID": 4, "name": "Bob", "age": 19, "active": True},
+]
+
+
+@pytest.fixture
+def table():
+    return ColumnarTable.from_records(SCHEMA, RECORDS)
+
+
+def test_masks_combine_bytewise():
+    assert and_masks(bytearray(b"\x01\x01\x00"), bytearray(b"\x01\x00\x00")) == bytearray(b"\x01\x00\x00")
+    assert or_masks(bytearray(b"\x01\x00\x00"), bytearray(b"\x00\x00\x01")) == bytearray(b"\x01\x00\x01")
+    assert invert_mask(bytearray(b"\x01\x00")) == bytearray(b"\x00\x01")
+    assert mask_positions(bytearray(b"\x00\x01\x00\x01")) == [1, 3]
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        ("name = \"Bob\"", [2, 4]),
+        ("name != \"Bob\"", [1, 3]),
+        ("name >= \"Bob\"", [2, 3, 4]),
+        ("age between 20 and 35", [1, 2]),
+        ("active = false or age > 40", [2, 3]),
+        ("not (active = true) and name in (\"Bob\", \"Eve\")", [2]),
+    ],
+)
+def test_where_is_evaluated_column_at_a_time(table, where, expected):
+    mask = table.mask(parse_where_clause(where))
+    assert [table[position]["ID"] for position in table.positions(mask)] == expected
+
+
+def test_table_behaves_like_a_list_of_records(table):
+    assert len(table) == 4
+    assert table[-1] == RECORDS[-1]
+    assert table[1:3] == RECORDS[1:3]
+    assert list(table) == RECORDS
+    assert table.position_of(3) == 2
+    assert table.position_of(9) == -1
+    with pytest.raises(IndexError):
+        table[4]
+
+
+def test_update_and_delete_positions(table):
+    table.update_positions([0, 2], {"name": "Kim", "active": False})
+    assert [record["name"] for record in table] == ["Kim", "Bob", "Kim", "Bob"]
+    remaining = table.without_positions([1, 3])
+    assert list(remaining) == [
+        {"ID": 1, "name": "Kim", "age": 30, "active": False},
+        {"ID": 3, "name": "Kim", "age": 41, "active": False},
+    ]
+
+
+def test_many_distinct_strings_widen_the_codes():
+    table = ColumnarTable.from_records({"ID": "int", "name": "str"}, [
+        {"ID": number, "name": f"n{number}"} for number in range(1, 301)
+    ])
+    assert table.positions(table.mask(parse_where_clause("name = \"n299\""))) == [298]
+
+
+def test_columnar_layout_through_the_database(db):
+    users = db.create_table("users", ["name:str", "age:int", "active:bool"])
+    users.insert_many([[record["name"], record["age"], record["active"]] for record in RECORDS])
+    db.set_layout("users", "columnar")
+    assert isinstance(db.pool.get_table("users"), ColumnarTable)
+
+    users.insert(["Kim", 52, False])
+    assert users.update({"age": 20}, "name = \"Bob\"") == [2, 4]
+    assert users.delete("active = false") == [2, 5]
+    assert users.count("age < 35") == 2
+
+    db.close()
+    db = Database(db.path, autocommit=True)
+    assert [record["name"] for record in db.table("users").select("age < 35")] == ["Ann", "Bob"]
+    db.set_layout("users", "rows")
+    assert not isinstance(db.pool.get_table("users"), ColumnarTable)
+
+
+def test_unknown_layout_is_rejected(db):
+    db.create_table("users", ["name:str"])
+    with pytest.raises(ValidationError):
+        db.set_layout("users", "diagonal")
+
+
+def test_null_values_match_no_comparison():
+    records = [
+        {"ID": 1, "name": None, "age": 30, "active": None},
+        {"ID": 2, "name": "Bob", "age": None, "active": False},
+        {"ID": 3, "name": "Eve", "age": 41, "active": True},
+    ]
+    table = ColumnarTable.from_records(SCHEMA, records)
+    assert list(table) == records
+
+    def ids(where):
+        return [table[position]["ID"] for position in table.positions(table.mask(parse_where_clause(where)))]
+
+    assert ids("age > 0") == [1, 3]
+    assert ids("age != 41") == [1, 2]
+    assert ids("not (age < 35)") == [2, 3]
+    assert ids("name <= \"Eve\"") == [2, 3]
+    assert ids("active = false or active = true") == [2, 3]
+    assert ids("active != true") == [1, 2]
+
+    table.update_positions([0, 1], {"age": 7, "name": "Ann"})
+    table.append({"ID": 4, "name": None, "age": None, "active": None})
+    remaining = table.without_positions([2])
+    assert list(remaining) == [
+        {"ID": 1, "name": "Ann", "age": 7, "active": None},
+        {"ID": 2, "name": "Ann", "age": 7, "active": False},
+        {"ID": 4, "name": None, "age": None, "active": None},
+    ]
+    assert remaining.positions(remaining.mask(parse_where_clause("age = 7"))) == [0, 1]
@@ -0,0 +1,149 @@
+import pytest
+
+from src.primitive_db.database import Database, Table
+from src.primitive_db.errors import (
+    ColumnNotFoundError,
+    DatabaseError,
+    TableExistsError,
+    TableNotFoundError,
+    TransactionError,
+    ValidationError,
+)
+from src.primitive_db.expressions import comparison
+
+
+@pytest.fixture
+def users(db):
+    table = db.create_table("users", {"name": "str", "age": "int", "active": "bool"})
+    table.insert_many([["Ann", 30, True], {"name": "Bob", "age": 25, "active": False}, ["Eve", 41, True]])
+    return table
+
+
+def test_tables(db, users):
+    assert db.table_names() == ["users"]
+    assert repr(db.table("users")) == "Table('users')"
+    assert users.schema == {"ID": "int", "name": "str", "age": "int", "active": "bool"}
+    assert users.columns == ["ID", "name", "age", "active"]
+    assert len(users) == 3
+    with pytest.raises(TableNotFoundError):
+        db.table("missing")
+    with pytest.raises(TableExistsError):
+        db.create_table("users", ["name:str"])
+    with pytest.raises(ValidationError):
+        db.create_table("other", ["name:text"])
+    db.drop_table("users")
+    assert db.table_names() == []
+    with pytest.raises(TableNotFoundError):
+        users.count()
+    with pytest.raises(TableNotFoundError):
+        db.drop_table("users")
+
+
+def test_select_forms_of_where(users):
+    assert [record["name"] for record in users.select("age > 26 and active = true")] == ["Ann", "Eve"]
+    assert [record["name"] for record in users.select({"name": "Bob"})] == ["Bob"]
+    assert [record["ID"] for record in users.select(comparison("age", "<", 35))] == [1, 2]
+    assert list(users.select(columns=["name"], limit=1, offset=2)) == [{"name": "Eve"}]
+    assert users.get(2) == {"ID": 2, "name": "Bob", "age": 25, "active": False}
+    assert users.get(9) is None
+    assert (users.count(), users.count("age > 26")) == (3, 2)
+
+
+@pytest.mark.parametrize(
+    "where, error",
+    [("age >", ValidationError), ("salary = 1", ValidationError), ("age = \"old\"", ValidationError)],
+)
+def test_invalid_where_raises(users, where, error):
+    with pytest.raises(error):
+        list(users.select(where))
+
+
+def test_changes_return_ids(users):
+    assert users.insert({"name": "Kim", "age": 19, "active": True}) == 4
+    assert users.update({"age": 20}, "name = \"Kim\"") == [4]
+    assert users.update({"age": 20}, "name = \"Nobody\"") == []
+    assert users.delete("age < 26") == [2, 4]
+    assert [record["name"] for record in users.select()] == ["Ann", "Eve"]
+    assert users.delete(None) == [1, 3]
+    assert users.insert_many([]) == []
+
+
+@pytest.mark.parametrize(
+    "call, error",
+    [
+        (lambda users: users.insert(["Kim", "old", True]), ValidationError),
+        (lambda users: users.insert(["Kim"]), ValidationError),
+        (lambda users: users.insert({"salary": 1}), ColumnNotFoundError),
+        (lambda users: users.insert_many([["Kim", 1, True], ["Lee", "x", True]]), ValidationError),
+        (lambda users: users.update({"ID": 5}, None), ValidationError),
+        (lambda users: users.update({"salary": 5}, None), ColumnNotFoundError),
+        (lambda users: users.update({"age": "x"}, None), ValidationError),
+        (lambda users: list(users.select(columns=["salary"])), ColumnNotFoundError),
+    ],
+)
+def test_invalid_changes_raise_and_change_nothing(users, call, error):
+    with pytest.raises(error) as raised:
+        call(users)
+    assert isinstance(raised.value, DatabaseError)
+    assert [record["age"] for record in users.select()] == [30, 25, 41]
+
+
+def test_insert_many_names_the_bad_row(users):
+    with pytest.raises(ValidationError, match="Строка 2"):
+        users.insert_many([["Kim", 1, True], ["Lee", "x", True]])
+
+
+def test_errors_keep_their_builtin_bases():
+    assert issubclass(TableNotFoundError, KeyError)
+    assert issubclass(ValidationError, ValueError)
+
+
+def test_changes_are_written_on_clean_exit(db_path):
+    with Database(db_path) as db:
+        assert db.in_transaction
+        db.create_table("users", ["name:str"]).insert(["Ann"])
+    with pytest.raises(RuntimeError):
+        with Database(db_path) as db:
+            db.table("users").insert(["Bob"])
+            raise RuntimeError
+    db = Database(db_path)
+    assert [record["name"] for record in db.table("users").select()] == ["Ann"]
+    db.table("users").insert(["Eve"])
+    db.rollback()
+    assert db.in_transaction
+    db.table("users").insert(["Kim"])
+    assert db.commit() == (1, 1)
+    db.close()
+    assert [record["name"] for record in Database(db_path).table("users").select()] == ["Ann", "Kim"]
+
+
+def test_autocommit_transactions(db):
+    assert not db.in_transaction
+    with pytest.raises(TransactionError):
+        db.commit()
+    with pytest.raises(TransactionError):
+        db.rollback()
+    db.begin()
+    with pytest.raises(TransactionError):
+        db.begin()
+    db.create_table("users", ["name:str"])
+    db.close()
+    assert not db.in_transaction
+    assert db.table_names() == []
+
+
+def test_storage_operations(db, users):
+    db.create_index("users", "age", "sorted")
+    assert [record["name"] for record in users.select("age between 26 and 45")] == ["Ann", "Eve"]
+    db.drop_index("users", "age")
+    assert db.analyze("users") == 3
+    db.set_layout("users", "columnar")
+    assert users.count("active = true") == 2
+    db.convert_table("users", "binary")
+    assert db.compact("users") == 3
+    with pytest.raises(TableNotFoundError):
+        db.compact("missing")
+    assert isinstance(Database(db.path, autocommit=True).table("users"), Table)
+    assert [record["name"] for record in Database(db.path, autocommit=True).table("users").select()] == [
+        "Ann", "Bob", "Eve",
+    ]
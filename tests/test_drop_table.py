@@ -0,0 +1,93 @@
+import os
+import shutil
+
+import pytest
+
+from src.primitive_db import pool as pool_module
+from src.primitive_db.binary import get_binary_filepath
+from src.primitive_db.database import Database
+from src.primitive_db.segments import get_segments_dirpath
+from src.primitive_db.utils import get_table_filepath, get_table_log_filepath
+
+
+def _files(db, name):
+    paths = [
+        get_table_filepath(name, db.pool.data_dir),
+        get_table_log_filepath(name, db.pool.data_dir),
+        get_binary_filepath(name, db.pool.data_dir),
+        get_segments_dirpath(name, db.pool.data_dir),
+    ]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _names(table):
+    return [record["name"] for record in table.select()]
+
+
+@pytest.mark.parametrize("storage", ["json", "binary", "segmented"])
+def test_drop_deletes_files_and_a_new_table_starts_empty(db, storage):
+    users = db.create_table("users", ["name:str"])
+    users.insert_many([["Ann"], ["Bob"]])
+    if storage != "json":
+        db.convert_table("users", storage)
+    assert _files(db, "users")
+    db.drop_table("users")
+    assert _files(db, "users") == []
+
+    users = db.create_table("users", ["name:str"])
+    assert users.count() == 0
+    users.insert(["Eve"])
+    assert _names(Database(db.path, autocommit=True).table("users")) == ["Eve"]
+
+
+def test_create_table_ignores_stale_files(db):
+    db.create_table("users", ["name:str"]).insert(["Ann"])
+    log_filepath = get_table_log_filepath("users", db.pool.data_dir)
+    shutil.copy(log_filepath, log_filepath + ".stale")
+    db.drop_table("users")
+    os.replace(log_filepath + ".stale", log_filepath)
+    assert db.create_table("users", ["name:str"]).count() == 0
+
+
+def test_drop_inside_a_transaction_waits_for_commit(db):
+    db.create_table("users", ["name:str"]).insert(["Ann"])
+    db.begin()
+    db.drop_table("users")
+    assert _files(db, "users")
+    db.rollback()
+    assert _names(db.table("users")) == ["Ann"]
+
+    db.begin()
+    db.drop_table("users")
+    users = db.create_table("users", ["name:str"])
+    assert users.count() == 0
+    users.insert(["Bob"])
+    db.commit()
+    assert _names(Database(db.path, autocommit=True).table("users")) == ["Bob"]
+
+
+def test_drop_is_replayed_from_the_write_ahead_log(db, tmp_path, monkeypatch):
+    db.create_table("users", ["name:str"]).insert(["Ann"])
+    before = tmp_path / "before"
+    shutil.copytree(db.path, before)
+    monkeypatch.setattr(pool_module, "remove_commit_log", lambda filepath: None)
+    db.begin()
+    db.drop_table("users")
+    db.create_table("users", ["name:str"])
+    db.commit()
+    monkeypatch.undo()
+
+    shutil.copy(db.pool.commit_log_filepath, before)
+    db = Database(str(before), autocommit=True)
+    assert db.pool.recover() is True
+    assert db.table("users").count() == 0
+
+
+def test_drop_table_command(run):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+    assert run("drop_table users")["ok"]
+    assert not run("select from users")["ok"]
+    run("create_table users name:str")
+    assert run("select from users")["rows"] == []
+    assert not run("drop_table missing")["ok"]
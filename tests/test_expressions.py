@@ -0,0 +1,97 @@
+import pytest
+
+from src.primitive_db import expressions
+from src.primitive_db.parser import parse_where_clause
+from src.primitive_db.rows import row_class
+
+SCHEMA = {"ID": "int", "name": "str", "age": "int", "active": "bool"}
+RECORDS = [
+    {"ID": 1, "name": "Ann", "age": 30, "active": True},
+    {"ID": 2, "name": "Bob", "age": 25, "active": False},
+    {"ID": 3, "name": "Eve", "age": None, "active": True},
+    {"ID": 4, "name": "Kim", "age": 19, "active": True},
+]
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        ("age > 20 and active = true", [1]),
+        ("age < 20 or name = \"Bob\"", [2, 4]),
+        ("not (age >= 25)", [3, 4]),
+        ("age != 30", [2, 3, 4]),
+        ("age <> 30 and (name in (\"Ann\", \"Eve\") or active = false)", [2, 3]),
+        ("age between 19 and 25", [2, 4]),
+        ("NOT active = true AND age <= 30", [2]),
+        ("(((ID = 1)))", [1]),
+    ],
+)
+def test_compiled_predicates(where, expected):
+    predicate = expressions.compile_predicate(parse_where_clause(where))
+    assert [record["ID"] for record in RECORDS if predicate(record)] == expected
+
+
+def test_row_class_predicates_read_slots():
+    Person = row_class(tuple(SCHEMA))
+    rows = [Person(*record.values()) for record in RECORDS]
+    predicate = expressions.compile_predicate(parse_where_clause("age > 20 or name = \"Eve\""), Person)
+    assert [row["ID"] for row in rows if predicate(row)] == [1, 2, 3]
+
+
+@pytest.mark.parametrize(
+    "where",
+    ["", "age >", "age = 1 and", "(age = 1", "age in ()", "age between 1", "age = ?", "age ~ 3"],
+)
+def test_invalid_expressions(where):
+    assert parse_where_clause(where) is None
+
+
+def test_normalize_makes_equivalent_expressions_equal():
+    first = expressions.normalize(parse_where_clause("name in (\"b\", \"a\", \"a\") and age > 1"))
+    second = expressions.normalize(parse_where_clause("age > 1 and name in (\"a\", \"b\")"))
+    assert first == second
+    assert expressions.normalize({"age": (">", 1), "name": "Ann"}) == expressions.normalize(
+        parse_where_clause("name = \"Ann\" and age > 1"),
+    )
+    assert expressions.normalize(None) is None
+
+
+@pytest.mark.parametrize(
+    "where, error",
+    [
+        ("age > 1", None),
+        ("salary = 1", "Некорректное значение: salary"),
+        ("age = \"old\"", "Некорректный тип для столбца age"),
+        ("active > true", "Оператор > не поддерживается"),
+        ("not (name in (\"Ann\", 3))", "Некорректный тип для столбца name"),
+    ],
+)
+def test_check_expression(where, error):
+    result = expressions.check_expression(parse_where_clause(where), SCHEMA)
+    if error is None:
+        assert result is None
+    else:
+        assert error in result
+
+
+def test_may_match_prunes_by_bounds():
+    minimums, maximums = {"age": 20}, {"age": 30}
+    assert expressions.may_match(parse_where_clause("age between 25 and 40"), minimums, maximums)
+    assert not expressions.may_match(parse_where_clause("age > 30 or age in (1, 2)"), minimums, maximums)
+    assert expressions.may_match(parse_where_clause("name = \"x\""), minimums, maximums)
+    assert expressions.may_match(parse_where_clause("not (age = 25)"), minimums, maximums)
+
+
+def test_format_expression_round_trips():
+    node = parse_where_clause("(age > 1 or name = \"A b\") and not (active = false) and ID in (1, 2)")
+    assert parse_where_clause(expressions.format_expression(node)) == node
+
+
+def test_compound_where_command(run):
+    run("create_table people name:str age:int")
+    run("insert into people values (\"Ann\", 30), (\"Bob\", 25), (\"Eve\", 41)")
+    assert run("select name from people where age > 26 and not name = \"Eve\"")["rows"] == [["Ann"]]
+    assert run("delete from people where name = \"Bob\" or age > 40")["ok"]
+    assert run("select name from people")["rows"] == [["Ann"]]
+    assert not run("select from people where age > \"x\"")["ok"]
+    assert not run("select from people where (age > 1")["ok"]
@@ -0,0 +1,97 @@
+import pytest
+
+from src.primitive_db.database import Database
+from src.primitive_db.errors import ColumnNotFoundError, TableNotFoundError, ValidationError
+from src.primitive_db.indexes import HashIndex
+
+
+@pytest.fixture
+def users(db):
+    table = db.create_table("users", ["name:str", "city:str", "age:int"])
+    table.insert_many([["Ann", "Oslo", 30], ["Bob", "Rome", 25], ["Eve", "Oslo", 41], ["Dan", "Rome", 30]])
+    db.create_index("users", "city")
+    return table
+
+
+def _names(table, where):
+    return sorted(record["name"] for record in table.select(where))
+
+
+def test_hash_index_tracks_inserts_updates_and_deletes(db, users):
+    index = db.pool.get_indexes("users")["city"]
+    assert sorted(index.lookup("Oslo")) == [1, 3]
+
+    users.insert(["Kim", "Oslo", 19])
+    users.update({"city": "Rome"}, "name = \"Ann\"")
+    users.delete("name = \"Eve\"")
+
+    index = db.pool.get_indexes("users")["city"]
+    assert index.lookup("Oslo") == [5]
+    assert sorted(index.lookup("Rome")) == [1, 2, 4]
+    assert _names(users, "city = \"Rome\"") == ["Ann", "Bob", "Dan"]
+
+
+def test_index_survives_reload(db, users):
+    users.update({"city": "Paris"}, "name = \"Bob\"")
+    db.close()
+
+    db = Database(db.path, autocommit=True)
+    assert db.get_metadata()["__tables_info__"]["users"]["indexes"] == {"city": "hash"}
+    index = db.pool.get_indexes("users")["city"]
+    assert isinstance(index, HashIndex)
+    assert index.lookup("Paris") == [2]
+    assert _names(db.table("users"), "city = \"Oslo\"") == ["Ann", "Eve"]
+
+
+def test_index_survives_compaction(db, users):
+    users.delete("name = \"Ann\"")
+    db.compact("users")
+
+    assert db.pool.get_indexes("users")["city"].lookup("Oslo") == [3]
+    assert _names(users, "city = \"Oslo\"") == ["Eve"]
+
+
+def test_index_survives_alter_table(db, users):
+    db.add_column("users", "active:bool", True)
+    db.drop_column("users", "age")
+
+    index = db.pool.get_indexes("users")["city"]
+    assert sorted(index.lookup("Rome")) == [2, 4]
+    users.insert(["Kim", "Rome", False])
+    assert _names(users, "city = \"Rome\"") == ["Bob", "Dan", "Kim"]
+
+
+def test_dropping_an_indexed_column_drops_its_index(db, users):
+    db.drop_column("users", "city")
+    assert db.pool.get_indexes("users") == {}
+    with pytest.raises(ValidationError):
+        db.drop_index("users", "city")
+
+
+def test_drop_index(db, users):
+    db.drop_index("users", "city")
+    assert db.pool.get_indexes("users") == {}
+    assert _names(users, "city = \"Oslo\"") == ["Ann", "Eve"]
+
+
+def test_create_index_errors(db, users):
+    with pytest.raises(ValidationError):
+        db.create_index("users", "city")
+    with pytest.raises(ColumnNotFoundError):
+        db.create_index("users", "missing")
+    with pytest.raises(TableNotFoundError):
+        db.create_index("missing", "city")
+    with pytest.raises(ValidationError):
+        db.create_index("users", "age", "btree")
+
+
+def test_index_commands(run):
+    run("create_table users name:str city:str")
+    rows = ", ".join(f"(\"user{number}\", \"city{number}\")" for number in range(100))
+    run(f"insert into users values {rows}")
+    assert run("create_index users city")["ok"]
+    assert "city (hash)" in run("info users")["output"]
+    assert not run("create_index users city")["ok"]
+    assert "index_lookup" in run("explain select from users where city = \"city7\"")["output"]
+    assert run("drop_index users city")["ok"]
+    assert not run("drop_index users city")["ok"]
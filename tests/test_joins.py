@@ -0,0 +1,126 @@
+import pytest
+
+from src.primitive_db import core, planner
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.indexes import HashIndex
+from src.primitive_db.parser import parse_where_clause
+
+USERS_SCHEMA = {"ID": "int", "name": "str", "city": "str"}
+ORDERS_SCHEMA = {"ID": "int", "user_id": "int", "total": "int"}
+USERS = [{"ID": number, "name": f"user{number}", "city": f"c{number % 5}"} for number in range(1, 501)]
+ORDERS = [
+    {"ID": number, "user_id": None if number % 50 == 0 else number % 600 + 1, "total": number % 13}
+    for number in range(1, 2001)
+]
+
+
+def _sides(users=USERS, orders=ORDERS, order_indexes=None):
+    return (
+        core.JoinSide("users", USERS_SCHEMA, users, "ID", stats=planner.collect_stats(USERS_SCHEMA, users)),
+        core.JoinSide(
+            "orders", ORDERS_SCHEMA, orders, "user_id", order_indexes, planner.collect_stats(ORDERS_SCHEMA, orders)
+        ),
+    )
+
+
+def _expected(where=lambda user, order: True):
+    users = {user["ID"]: user for user in USERS}
+    return sorted(
+        (users[order["user_id"]]["ID"], order["ID"])
+        for order in ORDERS
+        if order["user_id"] in users and where(users[order["user_id"]], order)
+    )
+
+
+def _joined(where=None, **kwargs):
+    rows = core.iter_join(*_sides(**kwargs), parse_where_clause(where) if where else None)
+    return sorted((row["users.ID"], row["orders.ID"]) for row in rows)
+
+
+def test_join_schema():
+    metadata = {"users": USERS_SCHEMA, "orders": ORDERS_SCHEMA}
+    assert list(core.join_schema(metadata, "users", "orders")) == [
+        "users.ID", "users.name", "users.city", "orders.ID", "orders.user_id", "orders.total",
+    ]
+
+
+@pytest.mark.parametrize(
+    "where, check",
+    [
+        (None, lambda user, order: True),
+        ("users.city = \"c1\"", lambda user, order: user["city"] == "c1"),
+        ("orders.total > 10 and users.ID < 100", lambda user, order: order["total"] > 10 and user["ID"] < 100),
+        ("users.ID = 3 or orders.total = 0", lambda user, order: user["ID"] == 3 or order["total"] == 0),
+        ("orders.ID = 7", lambda user, order: order["ID"] == 7),
+    ],
+)
+def test_joins_match_a_nested_loop(where, check):
+    assert _joined(where) == _expected(check)
+    indexes = {"user_id": HashIndex("user_id").build(ORDERS)}
+    assert _joined(where, order_indexes=indexes) == _expected(check)
+    columnar = ColumnarTable.from_records(USERS_SCHEMA, USERS)
+    assert _joined(where, users=columnar) == _expected(check)
+
+
+def test_rows_with_empty_join_keys_match_nothing():
+    orders = [{"ID": 1, "user_id": None, "total": 1}]
+    assert list(core.iter_join(*_sides(orders=orders))) == []
+
+
+def test_planner_picks_the_strategy():
+    plan, result, _ = core.explain_join(*_sides(), parse_where_clause("orders.ID = 7"))
+    assert (plan.strategy, plan.build, result) == (planner.JOIN_INDEX, 0, 1)
+    plan, result, _ = core.explain_join(*_sides(), parse_where_clause("users.city = \"c1\""))
+    assert (plan.strategy, plan.build) == (planner.JOIN_HASH, 0)
+    assert plan.where[0] == parse_where_clause("city = \"c1\"")
+    assert result == len(_expected(lambda user, order: user["city"] == "c1"))
+
+    indexes = {"user_id": HashIndex("user_id").build(ORDERS)}
+    plan, result, _ = core.explain_join(*_sides(order_indexes=indexes), parse_where_clause("users.ID = 7"))
+    assert (plan.strategy, plan.build) == (planner.JOIN_INDEX, 1)
+    assert result == len(_expected(lambda user, order: user["ID"] == 7))
+
+    plans = tuple(planner.QueryPlan(planner.ACCESS_FULL_SCAN, rows, rows, rows, rows, rows) for rows in (10, 5))
+    assert planner.plan_join(plans, [None, None]).build == 1
+
+
+@pytest.fixture
+def shop(run):
+    run("create_table users name:str city:str")
+    run("create_table orders user_id:int total:int paid:bool")
+    run("insert into users values (\"Ann\", \"msk\"), (\"Bob\", \"spb\"), (\"Eve\", \"msk\")")
+    run("insert into orders values (1, 10, true), (1, 20, false), (2, 5, true), (9, 7, true)")
+    return run
+
+
+def test_join_commands(shop):
+    result = shop("select users.name, orders.total from users join orders on users.ID = orders.user_id "
+                  "where orders.paid = true")
+    assert (result["columns"], result["rows"]) == (["users.name", "orders.total"], [["Ann", 10], ["Bob", 5]])
+    result = shop("select users.city, sum(orders.total) from users join orders on orders.user_id = users.ID "
+                  "group by users.city")
+    assert result["rows"] == [["msk", 30], ["spb", 5]]
+    result = shop("select from users join orders on users.ID = orders.user_id where users.ID = 2")
+    assert result["columns"][:4] == ["users.ID", "users.name", "users.city", "orders.ID"]
+    assert result["rows"] == [[2, "Bob", "spb", 3, 2, 5, True]]
+    result = shop("select users.name from users join orders on users.ID = orders.user_id limit 1 offset 1")
+    assert result["rows"] == [["Ann"]]
+    output = shop("explain select from users join orders on users.ID = orders.user_id where users.ID = 2")["output"]
+    assert "Соединение: hash_join" in output
+    assert "Условие для users: ID = 2" in output
+    assert "Фактически строк: результат 1" in output
+
+
+@pytest.mark.parametrize(
+    "command, error",
+    [
+        ("select from users join orders on users.name = orders.total", "имеют разные типы: str и int"),
+        ("select from users join missing on users.ID = missing.x", "Таблица \"missing\" не существует"),
+        ("select from users join orders on users.ID = orders.nope", "Некорректное значение: orders.nope"),
+        ("select name from users join orders on users.ID = orders.user_id", "Некорректное значение: name"),
+    ],
+)
+def test_join_errors(shop, command, error):
+    result = shop(command)
+    assert not result["ok"]
+    assert error in result["output"]
@@ -0,0 +1,136 @@
+import json
+import threading
+
+import pytest
+
+from src.primitive_db import engine, metrics
+
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.enable(False)
+    metrics.reset()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A perf_counter that moves only when told to."""
+    now = [0.0]
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: now[0])
+    return now
+
+
+def test_histogram_percentiles():
+    histogram = metrics.Histogram()
+    assert histogram.percentile(50) is None
+    for milliseconds in range(1, 101):
+        histogram.record(milliseconds / 1000)
+    summary = histogram.summary()
+    assert (summary["count"], summary["min"], summary["max"]) == (100, 0.001, 0.1)
+    assert summary["total"] == pytest.approx(5.05)
+    assert summary["p50"] == pytest.approx(0.05, rel=0.1)
+    assert summary["p99"] == pytest.approx(0.099, rel=0.1)
+    assert summary["p50"] <= summary["p95"] <= summary["p99"] <= summary["max"]
+
+
+def test_disabled_collection_records_nothing():
+    metrics.reset()
+    assert metrics.command("select") is metrics.phase("x") is metrics._NULL_PHASE
+    with metrics.command("select"):
+        metrics.increment("rows")
+    assert metrics.snapshot() == {"enabled": False, "histograms": {}, "counters": {}}
+
+
+def test_nested_phases_are_exclusive(enabled, clock):
+    with metrics.command("select"):
+        clock[0] += 1
+        with metrics.phase(metrics.PHASE_TABLE_LOAD):
+            clock[0] += 2
+            with metrics.phase(metrics.PHASE_PREDICATE):
+                clock[0] += 4
+            clock[0] += 8
+        with metrics.phase(metrics.PHASE_TABLE_LOAD):
+            clock[0] += 16
+    histograms = metrics.snapshot()["histograms"]
+    assert histograms["select"]["total"] == 31
+    assert histograms["select.table_load"]["total"] == 26
+    assert histograms["select.table_load"]["count"] == 1
+    assert histograms["select.predicate"]["total"] == 4
+    # Outside a command a phase is not timed.
+    assert metrics.phase(metrics.PHASE_RENDER) is metrics._NULL_PHASE
+
+
+def test_measured_and_counters(enabled):
+    @metrics.measured(metrics.PHASE_MUTATION)
+    def mutate(value):
+        return value + 1
+
+    with metrics.command("update"):
+        assert mutate(1) == 2
+    metrics.increment("rows", 3)
+    metrics.increment("rows")
+    snapshot = metrics.snapshot()
+    assert set(snapshot["histograms"]) == {"update", "update.mutation"}
+    assert snapshot["counters"] == {"rows": 4}
+
+
+def test_commands_in_threads_are_timed_apart(enabled):
+    barrier = threading.Barrier(2)
+
+    def work(phase_name):
+        with metrics.command("select"):
+            with metrics.phase(phase_name):
+                barrier.wait()
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ("table_load", "render")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    histograms = metrics.snapshot()["histograms"]
+    assert histograms["select"]["count"] == 2
+    assert histograms["select.table_load"]["count"] == histograms["select.render"]["count"] == 1
+
+
+def test_profile():
+    result, report = metrics.profile(sorted, [3, 1, 2])
+    assert result == [1, 2, 3]
+    assert "function calls" in report
+
+
+def test_stats_commands(run, enabled, tmp_path):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+    run("select from users")
+    engine.capture_output(engine.execute_command, "select from users")
+    run("select from missing")
+    output = run("stats")["output"]
+    assert "select.predicate" in output
+    assert "select.render" in output
+    assert "select.errors: 1" in output
+
+    target = tmp_path / "stats.json"
+    assert run(f"stats export {target}")["ok"]
+    exported = json.loads(target.read_text(encoding="utf-8"))
+    assert exported["histograms"]["select"]["count"] == 3
+    assert {"p50", "p95", "p99"} <= set(exported["histograms"]["select"])
+
+    assert run("stats reset")["ok"]
+    assert "Метрик пока нет." in run("stats")["output"]
+    assert run("stats off")["ok"]
+    assert "выключен" in run("stats")["output"]
+    assert run("stats on")["ok"] and metrics.is_enabled()
+    assert not run("stats export")["ok"]
+    assert not run("stats bogus")["ok"]
+    assert not run(f"stats export {tmp_path}")["ok"]
+
+
+def test_profile_command(run):
+    run("create_table users name:str")
+    output = run("profile select from users")["output"]
+    assert "Профиль команды \"select from users\":" in output
+    assert "cumulative" in output
+    assert not run("profile ")["ok"]
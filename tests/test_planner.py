@@ -0,0 +1,97 @@
+import pytest
+
+from src.primitive_db import planner
+from src.primitive_db.core import get_table_stats
+from src.primitive_db.expressions import normalize
+from src.primitive_db.indexes import HashIndex, SortedIndex
+from src.primitive_db.parser import parse_where_clause
+
+RECORDS = [{"ID": number, "age": number % 50, "city": f"c{number % 10}"} for number in range(1, 1001)]
+SCHEMA = {"ID": "int", "age": "int", "city": "str"}
+
+
+@pytest.fixture
+def stats():
+    return planner.collect_stats(SCHEMA, RECORDS)
+
+
+def _plan(where, indexes=None, stats=None, columnar=False):
+    node = normalize(parse_where_clause(where)) if where else None
+    return planner.plan_query(node, RECORDS, indexes, stats, columnar)
+
+
+def test_collect_stats(stats):
+    assert stats["rows"] == 1000
+    assert stats["columns"]["age"] == {"distinct": 50, "min": 0, "max": 49}
+    assert stats["columns"]["city"]["distinct"] == 10
+    assert planner.collect_stats(SCHEMA, iter(RECORDS[:3]))["columns"]["ID"] == {"distinct": 3, "min": 1, "max": 3}
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        ("age = 7", 1 / 50),
+        ("age = 70", 0.0),
+        ("age != 7", 49 / 50),
+        ("age < 10", 10 / 50),
+        ("age between 10 and 19", 10 / 50),
+        ("age in (1, 2, 3)", 3 / 50),
+        ("age = 7 or age = 8", 1 - (49 / 50) ** 2),
+        ("not (age < 10)", 40 / 50),
+    ],
+)
+def test_estimate_selectivity(stats, where, expected):
+    assert planner.estimate_selectivity(normalize(parse_where_clause(where)), stats) == pytest.approx(expected)
+
+
+def test_incremental_stats_only_widen(stats):
+    stats = planner.stats_after_insert(stats, [{"ID": 1001, "age": 99, "city": "c1"}])
+    assert stats["rows"] == 1001
+    assert stats["columns"]["age"] == {"distinct": 51, "min": 0, "max": 99}
+    stats = planner.stats_after_update(stats, {"city": "x"}, 1001)
+    assert stats["columns"]["city"] == {"distinct": 1, "min": "x", "max": "x"}
+    assert planner.stats_after_delete(stats, 1001) == planner.empty_stats()
+
+
+def test_access_paths(stats):
+    indexes = {"age": SortedIndex("age").build(RECORDS), "city": HashIndex("city").build(RECORDS)}
+    assert _plan(None).access == planner.ACCESS_FULL_SCAN
+    assert _plan("age = 7", columnar=True).access == planner.ACCESS_COLUMN_MASK
+    assert _plan("ID = 5").access == planner.ACCESS_ID_LOOKUP
+    assert _plan("ID between 1 and 9 and age > 3").access == planner.ACCESS_ID_RANGE
+
+    plan = _plan("age = 7 and city = \"c7\"", indexes, stats)
+    assert (plan.access, plan.index_kind, plan.column) == (planner.ACCESS_INDEX_LOOKUP, "sorted", "age")
+    assert _plan("city < \"c3\"", indexes, stats).access == planner.ACCESS_FULL_SCAN
+    assert _plan("age >= 0", indexes, stats).access == planner.ACCESS_FULL_SCAN
+    assert _plan("age = 1 or city = \"c1\"", indexes, stats).access == planner.ACCESS_FULL_SCAN
+    assert _plan("age = 7", indexes).result_rows == pytest.approx(1000 * 0.05)
+
+
+def test_analyze_and_explain_commands(run):
+    run("create_table people age:int")
+    run("insert into people values " + ", ".join(f"({number % 20})" for number in range(200)))
+    run("create_index people age sorted")
+    output = run("explain select from people where age = 3")["output"]
+    assert "Доступ: index_lookup" in output
+    assert "Фактически строк: прочитано 10, результат 10" in output
+
+    assert "записей 200" in run("analyze people")["output"]
+    output = run("explain select from people where age between 0 and 18")["output"]
+    assert "Статистика: есть" in output
+    assert "Доступ: full_scan" in output
+    assert "Фактически строк: прочитано 200, результат 190" in output
+    assert not run("analyze")["ok"]
+    assert not run("analyze missing")["ok"]
+    assert not run("explain select from people where salary = 1")["ok"]
+
+
+def test_statistics_follow_changes(db):
+    people = db.create_table("people", ["age:int"])
+    people.insert_many([[number] for number in range(10)])
+    assert db.analyze("people") == 10
+    people.insert([42])
+    people.delete("age < 5")
+    stats = get_table_stats(db.pool.get_metadata(), "people")
+    assert stats["rows"] == 6
+    assert stats["columns"]["age"]["max"] == 42
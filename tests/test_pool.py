@@ -0,0 +1,40 @@
+from src.primitive_db.database import Database
+
+
+def test_tables_are_kept_between_commands(db):
+    db.create_table("users", ["name:str"]).insert(["Ann"])
+    assert db.pool.get_table("users") is db.pool.get_table("users")
+
+
+def test_files_changed_by_another_process_are_reloaded(db):
+    db.create_table("users", ["name:str"]).insert(["Ann"])
+    assert len(db.pool.get_table("users")) == 1
+
+    other = Database(db.path, autocommit=True)
+    other.table("users").insert(["Bob"])
+    other.create_table("groups", ["title:str"])
+
+    assert [record["name"] for record in db.table("users").select()] == ["Ann", "Bob"]
+    assert db.table_names() == ["users", "groups"]
+
+
+def test_tables_over_the_memory_budget_are_evicted(db_path):
+    db = Database(db_path, autocommit=True, memory_budget=1)
+    for name in ("first", "second"):
+        db.create_table(name, ["name:str"]).insert(["Ann"])
+    db.pool.get_table("first")
+    db.pool.get_table("second")
+
+    assert "first" not in db.pool._tables
+    assert db.pool.used_memory == db.pool._tables["second"].size
+    assert [record["name"] for record in db.table("first").select()] == ["Ann"]
+
+
+def test_pending_tables_are_never_evicted(db_path):
+    db = Database(db_path, memory_budget=1)
+    db.create_table("first", ["name:str"]).insert(["Ann"])
+    db.create_table("second", ["name:str"]).insert(["Bob"])
+
+    assert set(db.pool._tables) == {"first", "second"}
+    db.rollback()
+    assert db.table_names() == []
@@ -0,0 +1,71 @@
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.engine import Session, use_session
+
+
+@pytest.fixture
+def users(run):
+    run("create_table users name:str age:int")
+    run("insert into users values (\"Ann\", 30), (\"Bob\", 25)")
+    return run
+
+
+def test_execute_of_a_prepared_select_returns_rows(users):
+    assert users("prepare q as select name from users where age > ?")["ok"]
+    result = users("execute q (26)")
+    assert (result["ok"], result["columns"], result["rows"]) == (True, ["name"], [["Ann"]])
+    assert users("execute q (20)")["rows"] == [["Ann"], ["Bob"]]
+    assert users("prepare c as select count(*) from users where age > ?")["ok"]
+    assert users("execute c (0)")["rows"] == [[2]]
+    columns, rows = engine.select_rows("execute q (26)")
+    assert [record["name"] for record in rows] == ["Ann"]
+
+
+def test_execute_of_prepared_changes(users):
+    users("prepare ins as insert into users values (?, ?)")
+    users("prepare up as update users set age = ? where name = ?")
+    users("prepare del as delete from users where ID = ?")
+    assert users("execute ins (\"Eve\", 41)")["ok"]
+    assert users("execute up (50, \"Eve\")")["ok"]
+    assert users("execute del (1)")["ok"]
+    assert "rows" not in users("execute del (2)")
+    assert users("select name, age from users")["rows"] == [["Eve", 50]]
+
+
+@pytest.mark.parametrize(
+    "command, error",
+    [
+        ("execute q (\"x\")", "Некорректный тип параметра 1. Ожидался int."),
+        ("execute q (true)", "Некорректный тип параметра 1. Ожидался int."),
+        ("execute q (1, 2)", "Ожидалось 1, передано 2."),
+        ("execute q", "Ожидалось 1, передано 0."),
+        ("execute nope (1)", "Подготовленная команда \"nope\" не найдена."),
+        ("prepare bad as select from users where salary = ?", "Некорректное значение: salary"),
+        ("prepare bad as select from missing where ID = ?", "Таблица \"missing\" не существует"),
+    ],
+)
+def test_prepared_statement_errors(users, command, error):
+    users("prepare q as select name from users where age > ?")
+    result = users(command)
+    assert not result["ok"]
+    assert error in result["output"]
+
+
+def test_prepared_statement_follows_schema_changes(users):
+    users("prepare q as select from users where age > ?")
+    assert users("alter_table users add city:str default \"Paris\"")["ok"]
+    assert users("execute q (26)")["columns"] == ["ID", "name", "age", "city"]
+    assert users("alter_table users drop age")["ok"]
+    result = users("execute q (26)")
+    assert not result["ok"]
+    assert "age" in result["output"]
+
+
+def test_prepared_statements_belong_to_their_session(users):
+    with use_session(Session()):
+        assert users("prepare q as select name from users where ID = ?")["ok"]
+        assert users("execute q (1)")["rows"] == [["Ann"]]
+        assert "подготовленных команд 1" in users("cache_stats")["output"]
+    assert not users("execute q (1)")["ok"]
+    assert "подготовленных команд 0" in users("cache_stats")["output"]
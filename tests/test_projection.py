@@ -0,0 +1,84 @@
+import pytest
+
+from src.primitive_db import core
+from src.primitive_db.binary import load_binary_table, save_binary_table
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.errors import ColumnNotFoundError
+from src.primitive_db.parser import parse_where_clause
+
+SCHEMA = {"ID": "int", "name": "str", "age": "int", "bio": "str"}
+RECORDS = [
+    {"ID": number, "name": f"user{number}", "age": 20 + number % 30, "bio": "x" * 200}
+    for number in range(1, 101)
+]
+
+
+@pytest.fixture
+def binary_table(tmp_path):
+    save_binary_table("people", SCHEMA, RECORDS, str(tmp_path))
+    return load_binary_table("people", str(tmp_path))
+
+
+def _tables(binary_table):
+    return {
+        "rows": RECORDS,
+        "columnar": ColumnarTable.from_records(SCHEMA, RECORDS),
+        "binary": binary_table,
+    }
+
+
+@pytest.mark.parametrize("layout", ["rows", "columnar", "binary"])
+def test_select_reads_only_requested_columns(binary_table, layout):
+    table_data = _tables(binary_table)[layout]
+    where = parse_where_clause("age = 25 and ID < 40")
+    rows = [dict(row) for row in core.iter_select(table_data, where, columns=["name"])]
+    assert rows == [{"name": "user5"}, {"name": "user35"}]
+    rows = [dict(row) for row in core.iter_select(table_data, None, columns=["age", "ID"], limit=2, offset=1)]
+    assert rows == [{"age": 22, "ID": 2}, {"age": 23, "ID": 3}]
+
+
+def test_binary_view_decodes_only_needed_fields(binary_table):
+    view = binary_table.with_columns(["name"])
+    assert view.row_class.columns == ("name",)
+    assert dict(view[0]) == {"name": "user1"}
+    assert len(view) == len(binary_table)
+    # The full view is left untouched.
+    assert set(dict(binary_table[0])) == set(SCHEMA)
+
+    binary_table.append({"ID": 101, "name": "new", "age": 1, "bio": ""})
+    assert dict(binary_table.with_columns(["ID", "name"])[-1]) == {"ID": 101, "name": "new"}
+
+
+def test_aggregates_read_only_referenced_columns(binary_table):
+    (row,) = core.aggregate(binary_table, [("max", "age")], parse_where_clause("name = \"user7\""))
+    assert row == {"max(age)": 27}
+
+
+def test_projections_are_cached_apart(run):
+    run("create_table people name:str age:int")
+    run("insert into people values (\"Ann\", 30), (\"Bob\", 25)")
+    assert run("select name from people where age > 26")["rows"] == [["Ann"]]
+    result = run("select age, ID from people where age > 26")
+    assert (result["columns"], result["rows"]) == (["age", "ID"], [[30, 1]])
+
+
+@pytest.mark.parametrize("storage", ["json", "binary", "segmented"])
+def test_projection_command(run, storage):
+    run("create_table people name:str age:int")
+    run("insert into people values (\"Ann\", 30), (\"Bob\", 25)")
+    if storage != "json":
+        assert run(f"convert_table people {storage}")["ok"]
+    result = run("select name from people where age < 28")
+    assert (result["columns"], result["rows"]) == (["name"], [["Bob"]])
+    assert run("select name from people")["rows"] == [["Ann"], ["Bob"]]
+    result = run("select salary from people")
+    assert not result["ok"]
+    assert "salary" in result["output"]
+
+
+def test_database_select_columns(db):
+    people = db.create_table("people", ["name:str", "age:int"])
+    people.insert_many([["Ann", 30], ["Bob", 25]])
+    assert list(people.select("age > 26", columns=["name"])) == [{"name": "Ann"}]
+    with pytest.raises(ColumnNotFoundError):
+        list(people.select(columns=["salary"]))
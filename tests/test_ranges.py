@@ -0,0 +1,91 @@
+import pytest
+
+from src.constants import OP_BETWEEN, OP_GE, OP_GT, OP_LE, OP_LT
+from src.primitive_db.errors import ValidationError
+from src.primitive_db.indexes import SortedIndex, find_id_range, find_position
+from src.primitive_db.rows import row_class
+
+Person = row_class(("ID", "age"))
+AGES = [30, 25, 41, 30, 19, 30, 25]
+
+
+@pytest.fixture
+def records():
+    return [Person(record_id, age) for record_id, age in enumerate(AGES, start=1)]
+
+
+@pytest.fixture
+def index(records):
+    return SortedIndex("age").build(records)
+
+
+def _ids_where(records, test):
+    return sorted(record["ID"] for record in records if test(record["age"]))
+
+
+@pytest.mark.parametrize(
+    "condition, test",
+    [
+        ((OP_LT, 30), lambda age: age < 30),
+        ((OP_LE, 30), lambda age: age <= 30),
+        ((OP_GT, 30), lambda age: age > 30),
+        ((OP_GE, 30), lambda age: age >= 30),
+        ((OP_BETWEEN, (25, 30)), lambda age: 25 <= age <= 30),
+        ((OP_LT, 19), lambda age: False),
+        ((OP_GT, 41), lambda age: False),
+        (30, lambda age: age == 30),
+        (26, lambda age: False),
+    ],
+)
+def test_sorted_index_ranges_include_every_duplicate(records, index, condition, test):
+    assert sorted(index.lookup_condition(condition)) == _ids_where(records, test)
+
+
+def test_sorted_index_keeps_order_through_changes(records, index):
+    index.add(Person(8, 27))
+    index.remove(records[0])
+    assert index.range(25, 30) == [2, 7, 8, 4, 6]
+    assert (index.min(), index.max()) == (19, 41)
+
+
+def test_sorted_index_on_strings():
+    Named = row_class(("ID", "name"))
+    index = SortedIndex("name").build([Named(1, "Eve"), Named(2, "Ann"), Named(3, "Bob"), Named(4, "Ann")])
+    assert index.range("Ann", "Bob") == [2, 4, 3]
+    assert index.range(low="Bob", include_low=False) == [1]
+
+
+@pytest.mark.parametrize(
+    "condition, expected",
+    [
+        ((OP_LT, 3), [0, 1]),
+        ((OP_LE, 3), [0, 1, 2]),
+        ((OP_GT, 5), [5, 6]),
+        ((OP_GE, 5), [4, 5, 6]),
+        ((OP_BETWEEN, (2, 4)), [1, 2, 3]),
+        ((OP_BETWEEN, (5, 2)), []),
+    ],
+)
+def test_id_ranges_are_found_by_binary_search(records, condition, expected):
+    assert find_id_range(records, condition) == expected
+
+
+def test_find_position(records):
+    assert find_position(records, 4) == 3
+    assert find_position(records, 99) == -1
+    assert find_position([], 1) == -1
+
+
+def test_range_selects(db):
+    people = db.create_table("people", ["name:str", "age:int"])
+    people.insert_many([[f"p{age}", age] for age in AGES])
+    db.create_index("people", "age", "sorted")
+    assert [record["age"] for record in people.select("age between 25 and 30")] == [30, 25, 30, 30, 25]
+    assert people.count("age > 30 or age < 20") == 2
+    assert people.count("ID >= 6") == 2
+
+
+def test_sorted_index_needs_an_ordered_type(db):
+    db.create_table("flags", ["on:bool"])
+    with pytest.raises(ValidationError):
+        db.create_index("flags", "on", "sorted")
@@ -0,0 +1,85 @@
+import json
+import sys
+
+import pytest
+
+from src.primitive_db.rows import Row, mapping_reader, row_class, schema_row_class, to_json, value_getter
+from src.primitive_db.utils import load_table_data
+
+COLUMNS = ("ID", "name", "first name")
+
+
+def test_rows_behave_like_mappings():
+    Person = row_class(COLUMNS)
+    row = Person(1, "Ann", "A")
+    assert row_class(tuple(COLUMNS)) is Person
+    assert schema_row_class({"ID": "int", "name": "str", "first name": "str"}) is Person
+    assert (row["name"], row.get("first name"), row.get("age"), row.get("age", 0)) == ("Ann", "A", None, 0)
+    assert list(row) == list(row.keys()) == list(COLUMNS)
+    assert list(row.items()) == [("ID", 1), ("name", "Ann"), ("first name", "A")]
+    assert row.values() == (1, "Ann", "A")
+    assert len(row) == 3 and "name" in row and "age" not in row
+    assert dict(row) == row.to_dict() == {"ID": 1, "name": "Ann", "first name": "A"}
+    assert row == {"ID": 1, "name": "Ann", "first name": "A"}
+    assert row == Person(1, "Ann", "A") and row != Person(2, "Ann", "A")
+    assert repr(row) == repr(row.to_dict())
+    with pytest.raises(KeyError):
+        row["age"]
+    with pytest.raises(TypeError):
+        hash(row)
+
+    row["name"] = "Bob"
+    assert row.f1 == "Bob"
+    with pytest.raises(AttributeError):
+        row.extra = 1
+
+
+def test_single_column_rows():
+    Only = row_class(("ID",))
+    assert Only(5).values() == (5,)
+    assert Only.from_mapping({}).to_dict() == {"ID": None}
+
+
+def test_rows_are_smaller_than_dicts():
+    row = row_class(COLUMNS)(1, "Ann", "A")
+    assert sys.getsizeof(row) < sys.getsizeof(row.to_dict())
+    assert not hasattr(row, "__dict__")
+
+
+def test_mapping_reader_fills_defaults():
+    Person = row_class(("ID", "name", "city"))
+    assert mapping_reader(Person) is Person.from_mapping
+    assert mapping_reader(Person, {"other": 1}) is Person.from_mapping
+    read = mapping_reader(Person, {"city": "Paris"})
+    assert read({"ID": 1, "name": "Ann"}) == {"ID": 1, "name": "Ann", "city": "Paris"}
+    assert read({"ID": 2, "name": "Bob", "city": None}).get("city") is None
+    assert isinstance(read({}), Person)
+
+
+def test_value_getter_reads_slots_of_rows():
+    Person = row_class(("ID", "name"))
+    rows = [Person(1, "Ann"), Person(2, "Bob")]
+    getter = value_getter(rows, "name")
+    assert [getter(row) for row in rows] == ["Ann", "Bob"]
+    assert value_getter(rows, "age")(rows[0]) is None
+    assert value_getter([{"name": "Eve"}], "name")({"name": "Eve"}) == "Eve"
+    assert value_getter([], "name")({}) is None
+
+
+def test_rows_serialize_as_objects():
+    row = row_class(("ID", "name"))(1, "Ann")
+    assert json.dumps([row], default=to_json) == '[{"ID": 1, "name": "Ann"}]'
+    with pytest.raises(TypeError):
+        to_json(object())
+
+
+def test_loaded_records_are_rows(db):
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert_many([["Ann", 30], ["Bob", 25]])
+    schema = db.pool.get_metadata()["users"]
+    records = load_table_data("users", schema, data_dir=db.pool.data_dir)
+    assert {type(record) for record in records} == {schema_row_class(schema)}
+    assert all(type(record) is dict for record in load_table_data("users", data_dir=db.pool.data_dir))
+    assert all(isinstance(record, Row) for record in db.pool.get_table("users"))
+    assert list(users.select("age > 26")) == [{"ID": 1, "name": "Ann", "age": 30}]
+    assert all(type(record) is dict for record in users.select())
@@ -0,0 +1,161 @@
+import json
+import os
+
+import pytest
+
+from src.primitive_db import core, segments
+from src.primitive_db.database import Database
+from src.primitive_db.indexes import find_id_range
+from src.primitive_db.parser import parse_where_clause
+from src.primitive_db.segments import (
+    SegmentedTable,
+    get_segments_dirpath,
+    load_segmented_table,
+    remove_stale_segments,
+    save_segmented_table,
+)
+
+SCHEMA = {"ID": "int", "name": "str", "age": "int"}
+RECORDS = [{"ID": number, "name": f"user{number}", "age": number % 7} for number in range(1, 36)]
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(segments, "SEGMENT_MAX_ROWS", 10)
+
+
+@pytest.fixture
+def saved(tmp_path):
+    """A table of 35 rows saved as 4 segments; returns a fresh lazy view of it."""
+    table = save_segmented_table("people", SCHEMA, RECORDS, str(tmp_path))
+    manifest = table.manifest()
+    return lambda: load_segmented_table("people", SCHEMA, manifest, str(tmp_path))
+
+
+def _loaded(table):
+    return [segment.records is not None for segment in table._segments]
+
+
+def test_records_are_split_by_id_range(saved, tmp_path):
+    table = saved()
+    assert table.segment_count == 4
+    assert [entry["rows"] for entry in table.manifest()] == [10, 10, 10, 5]
+    assert table.manifest()[1]["min"] == {"ID": 11, "name": "user11", "age": 0}
+    assert sorted(os.listdir(get_segments_dirpath("people", str(tmp_path)))) == ["1.json", "2.json", "3.json", "4.json"]
+    assert len(table) == 35
+    assert _loaded(table) == [False] * 4
+
+
+def test_lookups_read_one_segment(saved):
+    table = saved()
+    assert table.position_of(23) == 22
+    assert table.position_of(99) == -1
+    assert table[22]["name"] == "user23"
+    assert _loaded(table) == [False, False, True, False]
+    assert [record["ID"] for record in table[8:12]] == [9, 10, 11, 12]
+    assert table[-1]["ID"] == 35
+    with pytest.raises(IndexError):
+        table[35]
+
+
+def test_id_search_does_not_need_bisect_key(saved, monkeypatch):
+    # bisect only accepts key= from Python 3.10 on; the project supports 3.9.
+    for name in ("bisect_left", "bisect_right"):
+        search = getattr(segments, name)
+        monkeypatch.setattr(segments, name, lambda a, x, search=search: search(a, x))
+    table = saved()
+    assert [table.bisect_id(record_id) for record_id in (1, 11, 12, 35, 36)] == [0, 10, 11, 34, 35]
+    assert [table.bisect_id(record_id, right=True) for record_id in (0, 11, 35)] == [0, 11, 35]
+    assert table.position_of(12) == 11
+    assert find_id_range(table, (">=", 9)) == list(range(8, 35))
+    assert find_id_range(table, ("between", (9, 12))) == [8, 9, 10, 11]
+
+
+def test_scan_skips_segments_by_bounds(saved):
+    table = saved()
+    rows = list(table.scan(parse_where_clause("ID between 12 and 14 and age > 5")))
+    assert [row["ID"] for row in rows] == [13]
+    assert _loaded(table) == [False, True, False, False]
+    assert list(saved().with_columns(["name"]).scan(parse_where_clause("ID = 35"))) == [{"name": "user35"}]
+
+
+def test_parallel_scan_matches_the_serial_one(saved, monkeypatch):
+    where = parse_where_clause("age = 3 or ID > 33")
+    serial = [dict(row) for row in saved().scan(where)]
+    monkeypatch.setattr(segments, "SEGMENT_SCAN_WORKERS", 2)
+    monkeypatch.setitem(segments._state, "executor", None)
+    try:
+        table = saved()
+        assert [dict(row) for row in table.scan(where)] == serial
+        assert _loaded(table) == [False] * 4
+        projected = saved().with_columns(["age", "ID"]).scan(where)
+        assert [dict(row) for row in projected] == [{"age": row["age"], "ID": row["ID"]} for row in serial]
+    finally:
+        segments._state["executor"].shutdown()
+
+
+def test_only_changed_segments_are_written(saved, tmp_path):
+    table = saved()
+    table[12]["age"] = 100
+    table.touch([table[12]])
+    for number in range(36, 42):
+        table.append(table.row_class(number, f"user{number}", 1))
+    assert table.segment_count == 5
+    table = table.without([table[0]])
+    table = save_segmented_table("people", SCHEMA, table, str(tmp_path))
+    manifest = table.manifest()
+    assert [entry["file"] for entry in manifest] == [5, 6, 3, 7, 8]
+    assert manifest[1]["max"]["age"] == 100
+    remove_stale_segments("people", manifest, str(tmp_path))
+    assert sorted(os.listdir(table.dirpath)) == ["3.json", "5.json", "6.json", "7.json", "8.json"]
+
+    reloaded = load_segmented_table("people", SCHEMA, manifest, str(tmp_path))
+    assert [record["ID"] for record in reloaded] == list(range(2, 42))
+    assert reloaded[11]["age"] == 100
+
+
+def test_none_values_drop_the_bounds_of_a_column(tmp_path):
+    records = [{"ID": 1, "name": "a", "age": None}, {"ID": 2, "name": "b", "age": 3}]
+    table = SegmentedTable.from_records("people", SCHEMA, records, str(tmp_path))
+    assert table.manifest()[0]["min"] == {"ID": 1, "name": "a"}
+    assert table.matching_segments(parse_where_clause("age = 100"))
+
+
+def test_old_segments_get_added_column_defaults(saved, tmp_path):
+    schema = {**SCHEMA, "city": "str"}
+    manifest = saved().manifest()
+    table = load_segmented_table("people", schema, manifest, str(tmp_path), {"city": "Paris"})
+    assert table[0] == {"ID": 1, "name": "user1", "age": 1, "city": "Paris"}
+    filepath = os.path.join(table.dirpath, "1.json")
+    with open(filepath, encoding="utf-8") as f:
+        assert json.load(f)["columns"] == list(SCHEMA)
+
+
+def test_segmented_table_through_the_database(db):
+    people = db.create_table("people", ["name:str", "age:int"])
+    people.insert_many([[f"user{number}", number % 7] for number in range(1, 36)])
+    db.convert_table("people", "segmented")
+    people.update({"age": 50}, "ID = 15")
+    people.delete("ID < 3")
+    people.insert(["new", 1])
+    db = Database(db.path, autocommit=True)
+    table_data = db.pool.get_table("people")
+    assert isinstance(table_data, SegmentedTable)
+    assert table_data.segment_count == 4
+    people = db.table("people")
+    assert people.count() == 34
+    assert [record["ID"] for record in people.select("age = 50")] == [15]
+    assert list(core.iter_select(table_data, parse_where_clause("ID = 36"), columns=["name"])) == [{"name": "new"}]
+
+
+def test_segmented_commands(run):
+    run("create_table people name:str age:int")
+    run("insert into people values (\"Ann\", 30), (\"Bob\", 25)")
+    assert run("convert_table people segmented")["ok"]
+    assert "segmented" in run("info people")["output"]
+    assert run("update people set age = 31 where name = \"Ann\"")["ok"]
+    assert run("select name, age from people where age > 26")["rows"] == [["Ann", 31]]
+    assert not run("convert_table people segmented")["ok"]
+    assert not run("convert_table people parquet")["ok"]
+    assert run("convert_table people json")["ok"]
+    assert run("select count(*) from people")["rows"] == [[2]]
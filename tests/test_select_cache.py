@@ -0,0 +1,67 @@
+from src.decorators import create_cacher
+from src.primitive_db import core
+from src.primitive_db.database import Database
+
+
+def test_cacher_evicts_least_recently_used_entries():
+    cache = create_cacher(max_entries=2)
+    cache(("t", 1), lambda: [1])
+    cache(("t", 2), lambda: [2])
+    cache(("t", 1), lambda: [0])
+    cache(("t", 3), lambda: [3])
+
+    assert cache.get(("t", 2)) is None
+    assert cache.get(("t", 1)) == [1]
+    info = cache.info()
+    assert (info["entries"], info["evictions"]) == (2, 1)
+
+
+def test_cacher_is_bounded_by_rows_and_skips_oversized_values():
+    cache = create_cacher(max_rows=3)
+    cache.put(("t", 1), [1, 2])
+    cache.put(("t", 2), [1, 2, 3, 4])
+    assert cache.get(("t", 2)) is None
+    cache.put(("t", 3), [1, 2])
+    assert cache.get(("t", 1)) is None
+    assert cache.info()["rows"] == 2
+
+
+def test_cacher_invalidates_a_group():
+    cache = create_cacher()
+    cache.put(("a", 1), [1])
+    cache.put(("a", 2), [2])
+    cache.put(("b", 1), [3])
+    cache.invalidate("a")
+    assert cache.info()["entries"] == 1
+    assert cache.get(("b", 1)) == [3]
+
+
+def test_selects_are_served_from_the_cache_until_the_table_changes(db):
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert_many([["Ann", 30], ["Bob", 25]])
+    hits = core.get_select_cache_info()["hits"]
+
+    assert [record["name"] for record in users.select("age > 20")] == ["Ann", "Bob"]
+    assert [record["name"] for record in users.select("age > 20")] == ["Ann", "Bob"]
+    assert core.get_select_cache_info()["hits"] == hits + 1
+
+    users.update({"age": 19}, "name = \"Bob\"")
+    assert [record["name"] for record in users.select("age > 20")] == ["Ann"]
+    assert core.get_select_cache_info()["hits"] == hits + 1
+
+
+def test_same_table_names_of_two_databases_never_share_results(tmp_path):
+    first = Database(str(tmp_path / "first"), autocommit=True)
+    second = Database(str(tmp_path / "second"), autocommit=True)
+    first.create_table("users", ["name:str"]).insert(["Ann"])
+    second.create_table("users", ["name:str"]).insert(["Bob"])
+    assert [record["name"] for record in first.table("users").select("ID = 1")] == ["Ann"]
+    assert [record["name"] for record in second.table("users").select("ID = 1")] == ["Bob"]
+
+
+def test_cache_stats_command(run):
+    run("create_table users name:str")
+    run("insert into users values (\"Ann\")")
+    run("select from users where name = \"Ann\"")
+    run("select from users where name = \"Ann\"")
+    assert "Попаданий:" in run("cache_stats")["output"]
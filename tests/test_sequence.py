@@ -0,0 +1,40 @@
+import pytest
+
+from src.primitive_db import core
+from src.primitive_db.database import Database
+from src.primitive_db.errors import ValidationError
+
+
+def test_ids_of_deleted_records_are_never_reused(db):
+    users = db.create_table("users", ["name:str"])
+    assert users.insert_many([["Ann"], ["Bob"], ["Eve"]]) == [1, 2, 3]
+    users.delete("ID >= 2")
+    assert users.insert(["Kim"]) == 4
+
+
+def test_sequence_is_kept_in_metadata(db):
+    users = db.create_table("users", ["name:str"])
+    users.insert_many([["Ann"], ["Bob"]])
+    users.delete(None)
+    db.close()
+
+    db = Database(db.path, autocommit=True)
+    assert db.get_metadata()["__tables_info__"]["users"]["sequence"] == 2
+    assert db.table("users").insert(["Kim"]) == 3
+
+
+def test_missing_sequence_is_recovered_from_data():
+    metadata = core.create_table({}, "users", ["name:str"])
+    table_data = [{"ID": 7, "name": "Ann"}, {"ID": 3, "name": "Bob"}]
+    metadata["__tables_info__"]["users"].pop("sequence", None)
+    assert core.next_id(metadata, "users", table_data, 2) == 8
+    assert metadata["__tables_info__"]["users"]["sequence"] == 9
+
+
+def test_failed_insert_does_not_advance_the_sequence(db):
+    users = db.create_table("users", ["name:str"])
+    users.insert(["Ann"])
+    for values in (["Bob", "extra"], [42]):
+        with pytest.raises(ValidationError):
+            users.insert(values)
+    assert users.insert(["Eve"]) == 2
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from src.decorators import get_error_count, report_error
+from src.primitive_db import server as server_module
+from src.primitive_db.client import DatabaseClient
+from src.primitive_db.engine import capture_output
+from src.primitive_db.server import DatabaseServer, ReadWriteLock
+
+
+@pytest.fixture
+def server(run):
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(DatabaseServer(port=0).start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def client(server):
+    with DatabaseClient(port=server.port) as client:
+        yield client
+
+
+def test_reads_and_writes(client):
+    assert client.execute("create_table users name:str age:int")["ok"]
+    assert client.execute("insert into users values (\"Ann\", 30), (\"Bob\", 25)")["ok"]
+    assert client.select("select name from users where age > 26") == [{"name": "Ann"}]
+    response = client.execute("select from missing")
+    assert not response["ok"]
+    assert "не существует" in response["output"]
+    assert not client.execute("begin")["ok"]
+
+
+def test_file_commands_are_refused(client, tmp_path):
+    client.execute("create_table users name:str")
+    source = tmp_path / "users.csv"
+    source.write_text("name\nAnn\n", encoding="utf-8")
+    commands = [
+        f"select from users into {tmp_path / 'out.csv'}",
+        f"import users from {source}",
+        f"stats export {tmp_path / 'stats.json'}",
+        f"profile select from users into {tmp_path / 'out.jsonl'}",
+    ]
+    for command in commands:
+        response = client.execute(command)
+        assert not response["ok"], command
+        assert "запрещен" in response["output"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["users.csv"]
+    assert client.select("select from users") == []
+
+
+def test_reads_run_off_the_event_loop_side_by_side(client, server, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    execute_request = server_module.execute_request
+
+    def slow_execute_request(command, session=None):
+        if command == "list_tables":
+            started.set()
+            release.wait(5)
+        return execute_request(command, session)
+
+    monkeypatch.setattr(server_module, "execute_request", slow_execute_request)
+    client.execute("create_table users name:str")
+    blocked = threading.Thread(target=client.execute, args=("list_tables",))
+    blocked.start()
+    assert started.wait(5)
+    # The event loop still answers, and another read runs next to the blocked one.
+    with DatabaseClient(port=server.port, timeout=5) as other:
+        assert other.execute("select from users")["ok"]
+    release.set()
+    blocked.join()
+
+
+def test_prepared_statements_are_kept_per_connection(client, server):
+    client.execute("create_table users name:str")
+    client.execute("insert into users values (\"Ann\")")
+    assert client.execute("prepare q as select name from users where ID = ?")["ok"]
+    response = client.execute("execute q (1)")
+    assert (response["columns"], response["rows"]) == (["name"], [["Ann"]])
+    with DatabaseClient(port=server.port, timeout=5) as other:
+        response = other.execute("execute q (1)")
+        assert not response["ok"]
+        assert "не найдена" in response["output"]
+        assert other.execute("prepare q as insert into users values (?)")["ok"]
+        assert other.execute("execute q (\"Bob\")")["ok"]
+    assert client.execute("execute q (2)")["rows"] == [["Bob"]]
+
+
+def test_parallel_clients_see_every_write(client):
+    client.execute("create_table users number:int")
+    errors = []
+
+    def work(offset):
+        try:
+            for number in range(offset, offset + 20):
+                assert client.execute(f"insert into users values ({number})")["ok"]
+                assert client.execute("select count(*) from users")["ok"]
+        except AssertionError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in (0, 100, 200, 300)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert client.select("select count(*) from users") == [{"count(*)": 80}]
+
+
+def test_bad_requests(server):
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+        stream = sock.makefile("rb")
+        sock.sendall(b'{"id": 1}\nnot json\n{"id": 2, "command": 5}\n')
+        responses = [json.loads(stream.readline()) for _ in range(3)]
+    assert [response["ok"] for response in responses] == [False, False, False]
+    assert all("некорректный запрос" in response["output"] for response in responses)
+
+
+def test_read_write_lock_excludes_writers():
+    lock = ReadWriteLock()
+    events = []
+
+    def write():
+        with lock.writing():
+            events.append("write")
+
+    with lock.reading():
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer.join(0.1)
+        events.append("read done")
+    writer.join()
+    assert events == ["read done", "write"]
+
+
+def test_output_and_errors_are_kept_per_thread():
+    results = {}
+    barrier = threading.Barrier(2)
+
+    def command(name):
+        barrier.wait()
+        for _ in range(50):
+            print(name)
+        report_error(f"{name} failed")
+        return get_error_count()
+
+    def work(name):
+        results[name] = capture_output(command, name)
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["a"] == (1, "a\n" * 50 + "a failed\n")
+    assert results["b"] == (1, "b\n" * 50 + "b failed\n")
@@ -0,0 +1,68 @@
+import csv
+import json
+
+from src.constants import SELECT_PAGE_SIZE
+from src.primitive_db import core, engine
+from src.primitive_db.parser import parse_where_clause
+
+
+class _CountingTable(list):
+    """A record list that counts how many records were read by iteration."""
+
+    read = 0
+
+    def __iter__(self):
+        for record in super().__iter__():
+            self.read += 1
+            yield record
+
+
+def test_reading_stops_after_limit():
+    table = _CountingTable({"ID": number, "age": number % 10} for number in range(1, 1001))
+    rows = list(core.iter_select(table, parse_where_clause("age = 3"), limit=2, offset=1))
+    assert [row["ID"] for row in rows] == [13, 23]
+    assert table.read == 23
+
+
+def test_limit_and_offset_through_the_database(db):
+    numbers = db.create_table("numbers", ["value:int"])
+    numbers.insert_many([[value] for value in range(10)])
+    assert [row["value"] for row in numbers.select(limit=3, offset=4)] == [4, 5, 6]
+    assert [row["value"] for row in numbers.select("value >= 5", limit=10, offset=3)] == [8, 9]
+    assert list(numbers.select(limit=0)) == []
+
+
+def test_limit_offset_command(run):
+    run("create_table numbers value:int")
+    run("insert into numbers values " + ", ".join(f"({value})" for value in range(10)))
+    assert run("select value from numbers where value > 2 limit 2 offset 1")["rows"] == [[4], [5]]
+    assert not run("select from numbers limit -1")["ok"]
+
+
+def test_results_are_printed_page_by_page(run, capsys):
+    run("create_table numbers value:int")
+    run("insert into numbers values " + ", ".join(f"({value})" for value in range(SELECT_PAGE_SIZE + 5)))
+    assert engine.execute_command("select from numbers")
+    output = capsys.readouterr().out
+    assert output.count("| value |") == 1
+    assert output.count(f"| {SELECT_PAGE_SIZE + 5} |") == 1
+
+
+def test_select_into_files(run, tmp_path, capsys):
+    run("create_table people name:str age:int")
+    run("insert into people values (\"Ann\", 30), (\"Bob\", 25)")
+    csv_path, jsonl_path = tmp_path / "out.csv", tmp_path / "out.jsonl"
+
+    assert engine.execute_command(f"select name from people where age > 20 into {csv_path}")
+    assert engine.execute_command(f"select from people limit 1 into {jsonl_path}")
+    assert "Выгружено записей: 2" in capsys.readouterr().out
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        assert list(csv.reader(f)) == [["name"], ["Ann"], ["Bob"]]
+    with open(jsonl_path, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [{"ID": 1, "name": "Ann", "age": 30}]
+
+
+def test_select_into_errors(run, tmp_path):
+    run("create_table people name:str")
+    assert not engine.execute_command(f"select from people into {tmp_path / 'out.txt'}")
+    assert not engine.execute_command(f"select from people into {tmp_path / 'missing' / 'out.csv'}")
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+from src.primitive_db import utils
+from src.primitive_db.database import Database
+from src.primitive_db.errors import TableNotFoundError
+from src.primitive_db.utils import get_table_filepath, get_table_log_filepath, load_table_data
+
+
+def _log_lines(db, table_name):
+    with open(get_table_log_filepath(table_name, db.pool.data_dir), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def _reopen(db):
+    db.close()
+    return Database(db.path, autocommit=True)
+
+
+def test_changes_are_appended_to_the_log(db):
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert(["Ann", 30])
+    users.insert(["Bob", 25])
+    users.update({"age": 31}, "name = \"Ann\"")
+    users.delete("name = \"Bob\"")
+
+    entries = _log_lines(db, "users")
+    assert [entry["op"] for entry in entries] == ["insert", "insert", "update", "delete"]
+    assert entries[2]["row"] == {"ID": 1, "name": "Ann", "age": 31}
+    assert entries[3] == {"op": "delete", "id": 2}
+    assert not os.path.exists(get_table_filepath("users", db.pool.data_dir))
+
+
+def test_log_is_replayed_on_load(db):
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert_many([["Ann", 30], ["Bob", 25], ["Eve", 41]])
+    users.update({"age": 26}, "name = \"Bob\"")
+    users.delete("ID = 1")
+
+    db = _reopen(db)
+    assert list(db.table("users").select()) == [
+        {"ID": 2, "name": "Bob", "age": 26},
+        {"ID": 3, "name": "Eve", "age": 41},
+    ]
+
+
+def test_compact_folds_the_log_into_the_snapshot(db):
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert_many([["Ann", 30], ["Bob", 25]])
+    users.delete("ID = 2")
+
+    assert db.compact("users") == 1
+    assert not os.path.exists(get_table_log_filepath("users", db.pool.data_dir))
+    with open(get_table_filepath("users", db.pool.data_dir), encoding="utf-8") as f:
+        assert json.load(f) == [{"ID": 1, "name": "Ann", "age": 30}]
+    assert list(_reopen(db).table("users").select()) == [{"ID": 1, "name": "Ann", "age": 30}]
+
+
+def test_long_log_is_compacted_automatically(db, monkeypatch):
+    monkeypatch.setattr(utils, "LOG_COMPACTION_MIN_ENTRIES", 4)
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert(["Ann", 30])
+    for age in range(31, 34):
+        users.update({"age": age}, "ID = 1")
+
+    assert not os.path.exists(get_table_log_filepath("users", db.pool.data_dir))
+    assert list(_reopen(db).table("users").select()) == [{"ID": 1, "name": "Ann", "age": 33}]
+
+
+def test_torn_last_line_is_ignored(db):
+    users = db.create_table("users", ["name:str", "age:int"])
+    users.insert_many([["Ann", 30], ["Bob", 25]])
+    with open(get_table_log_filepath("users", db.pool.data_dir), "a", encoding="utf-8") as f:
+        f.write('{"op": "insert", "row": {"ID": 3, "na')
+
+    records = load_table_data("users", data_dir=db.pool.data_dir)
+    assert [record["ID"] for record in records] == [1, 2]
+
+
+def test_compact_of_missing_table_fails(db):
+    with pytest.raises(TableNotFoundError):
+        db.compact("missing")
@@ -0,0 +1,134 @@
+import os
+import shutil
+
+import pytest
+
+from src.primitive_db import pool as pool_module
+from src.primitive_db import utils
+from src.primitive_db.database import Database
+from src.primitive_db.errors import TransactionError
+from src.primitive_db.utils import get_table_log_filepath, load_table_data
+
+
+def _reopen(db):
+    db.close()
+    return Database(db.path, autocommit=True)
+
+
+def test_commit_and_rollback(db):
+    users = db.create_table("users", ["name:str"])
+    db.begin()
+    users.insert(["Ann"])
+    db.rollback()
+    assert users.count() == 0
+
+    db.begin()
+    users.insert_many([["Bob"], ["Eve"]])
+    users.update({"name": "Kim"}, "name = \"Bob\"")
+    assert db.commit() == (1, 3)
+    assert not os.path.exists(db.pool.commit_log_filepath)
+    assert [record["name"] for record in _reopen(db).table("users").select()] == ["Kim", "Eve"]
+
+
+def test_storage_commands_are_refused_inside_a_transaction(db):
+    db.create_table("users", ["name:str"])
+    db.begin()
+    with pytest.raises(TransactionError):
+        db.compact("users")
+    db.rollback()
+
+
+def test_complete_write_ahead_log_is_replayed(db, tmp_path, monkeypatch):
+    users = db.create_table("users", ["name:str"])
+    users.insert(["Ann"])
+    before = tmp_path / "before"
+    shutil.copytree(db.path, before)
+    monkeypatch.setattr(pool_module, "remove_commit_log", lambda filepath: None)
+    db.begin()
+    users.insert(["Bob"])
+    db.commit()
+    monkeypatch.undo()
+
+    # A crash right after the log was written: the table files still hold the old state.
+    shutil.copy(db.pool.commit_log_filepath, before)
+    db = Database(str(before), autocommit=True)
+    assert [record["name"] for record in db.table("users").select()] == ["Ann"]
+    assert db.pool.recover() is True
+    assert not os.path.exists(db.pool.commit_log_filepath)
+    assert [record["name"] for record in db.table("users").select()] == ["Ann", "Bob"]
+
+
+def test_torn_write_ahead_log_is_discarded(db):
+    db.create_table("users", ["name:str"]).insert(["Ann"])
+    with open(db.pool.commit_log_filepath, "w", encoding="utf-8") as f:
+        f.write('{"metadata": {}}\n{"table": "users", "entries": [')
+    db = _reopen(db)
+    assert db.pool.recover() is False
+    assert not os.path.exists(db.pool.commit_log_filepath)
+    assert [record["name"] for record in db.table("users").select()] == ["Ann"]
+
+
+@pytest.mark.parametrize("tail", ['{"op": "insert", "row": {"ID": 3, "na', '{"op": "delete", "id": 1}'])
+def test_torn_table_log_tail_is_truncated_before_appending(db, tail):
+    users = db.create_table("users", ["name:str"])
+    users.insert_many([["Ann"], ["Bob"]])
+    log_filepath = get_table_log_filepath("users", db.pool.data_dir)
+    with open(log_filepath, "a", encoding="utf-8") as f:
+        f.write(tail)
+    utils._log_lengths.clear()
+
+    db = _reopen(db)
+    db.table("users").insert(["Eve"])
+    with open(log_filepath, encoding="utf-8") as f:
+        assert all(line.endswith("}\n") for line in f)
+    assert [record["ID"] for record in load_table_data("users", data_dir=db.pool.data_dir)] == [1, 2, 3]
+
+
+def test_appending_repairs_a_torn_log_without_loading_it(tmp_path):
+    utils.append_table_log("users", [utils.make_delete_entry(1)], str(tmp_path))
+    log_filepath = get_table_log_filepath("users", str(tmp_path))
+    with open(log_filepath, "a", encoding="utf-8") as f:
+        f.write('{"op": "del')
+    utils._log_lengths.clear()
+
+    utils.append_table_log("users", [utils.make_delete_entry(2)], str(tmp_path))
+    with open(log_filepath, encoding="utf-8") as f:
+        assert f.read() == '{"op": "delete", "id": 1}\n{"op": "delete", "id": 2}\n'
+
+
+def test_atomic_writes_are_fsynced(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd) or real_fsync(fd))
+    utils.write_atomic(str(tmp_path / "t.json"), "[]")
+    assert len(synced) == (2 if os.name != "nt" else 1)
+    assert (tmp_path / "t.json").read_text(encoding="utf-8") == "[]"
+    assert not (tmp_path / "t.json.tmp").exists()
+
+
+def test_commit_syncs_table_files_before_removing_the_log(db, monkeypatch):
+    users = db.create_table("users", ["name:str"])
+    users.insert(["Ann"])
+    events = []
+    monkeypatch.setattr(pool_module, "fsync_file", lambda filepath: events.append(("sync", filepath)))
+    monkeypatch.setattr(pool_module, "fsync_directory", lambda dirpath: events.append(("sync", dirpath)))
+    real_remove = pool_module.remove_commit_log
+    monkeypatch.setattr(pool_module, "remove_commit_log", lambda filepath: events.append(("remove", filepath)))
+    db.begin()
+    users.insert(["Bob"])
+    db.commit()
+    real_remove(db.pool.commit_log_filepath)
+
+    log_filepath = get_table_log_filepath("users", db.pool.data_dir)
+    assert events.index(("sync", log_filepath)) < events.index(("remove", db.pool.commit_log_filepath))
+    assert events.index(("sync", db.pool.data_dir)) < events.index(("remove", db.pool.commit_log_filepath))
+
+
+def test_transaction_commands(run):
+    run("create_table users name:str")
+    assert run("begin")["ok"]
+    run("insert into users values (\"Ann\")")
+    assert not run("compact users")["ok"]
+    assert run("rollback")["ok"]
+    assert run("select from users")["rows"] == []
+    assert not run("commit")["ok"]